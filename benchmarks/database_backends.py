@@ -0,0 +1,99 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import textwrap
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import generate_citations, generate_correction_database
+from utils.correction_db import rss_bytes
+from utils.generate_db import save
+
+
+# Formatos comparados: arquivo gerado por generate_db e backend informado ao JournalStandardizer
+BACKENDS = ['pickle', 'lazy', 'mmap', 'sqlite']
+
+
+def run_backend(path_db, backend, citations_data, cache_size):
+    """
+    Carrega a base de correção em um processo novo e normaliza as referências citadas com o casamento exato.
+
+    :param path_db: arquivo da base de correção
+    :param backend: backend informado ao JournalStandardizer
+    :param citations_data: registros das referências citadas a periódicos (ver benchmarks.synthetic.generate_citations)
+    :param cache_size: tamanho dos caches de casamento do JournalStandardizer
+    :return: tupla (tempo de carga em segundos, tempo por referência citada em segundos, RSS em bytes)
+    """
+    from utils.field_processor import preprocess_journal_title
+    from utils.journal_standardizer import JournalStandardizer
+    from xylose.scielodocument import Citation
+
+    citations = [Citation(data) for data in citations_data]
+    titles = [preprocess_journal_title(c.source, True, True) for c in citations]
+    rss_before = rss_bytes()
+
+    started_at = time.perf_counter()
+    jstd = JournalStandardizer(path_db, use_exact=True, cache_size=cache_size, database_backend=backend)
+    load_time = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    for cit, title in zip(citations, titles):
+        jstd.standardize_journal(cit, title, 'exact')
+    query_time = (time.perf_counter() - started_at) / len(citations)
+
+    return load_time, query_time, rss_bytes() - rss_before
+
+
+def main():
+    usage = "compare throughput and memory of the correction database backends"
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '-s', '--size',
+        type=int,
+        default=50000,
+        help='number of ISSN-Ls of the synthetic correction database'
+    )
+
+    parser.add_argument(
+        '-q', '--queries',
+        type=int,
+        default=20000,
+        help='number of synthetic cited references; the journal ones are standardized by each backend'
+    )
+
+    parser.add_argument(
+        '-k', '--cache_size',
+        type=int,
+        default=0,
+        help='size of the JournalStandardizer match caches (0 measures the backends alone)'
+    )
+
+    args = parser.parse_args()
+
+    db = generate_correction_database(args.size)
+    citations_data = [c.data for c in generate_citations(db, args.queries) if c.publication_type == 'article']
+
+    # Cada backend é medido em um processo criado por spawn, que não herda a memória deste processo
+    context = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory() as dir_db:
+        print('%8s %10s %10s %12s %10s %10s' % ('backend', 'file (MB)', 'load (s)', 'us/cit', 'cit/s', 'RSS (MB)'))
+
+        for backend in BACKENDS:
+            path_db = os.path.join(dir_db, 'bc-%s.bin' % backend)
+            save(db, path_db, backend)
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                load_time, query_time, rss = executor.submit(
+                    run_backend, path_db, backend, citations_data, args.cache_size).result()
+
+            print('%8s %10.1f %10.2f %12.1f %10.0f %10.1f' % (backend, os.path.getsize(path_db) / 2 ** 20, load_time,
+                                                              query_time * 1e6, 1 / query_time, rss / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import random
+import re
+import textwrap
+import time
+
+from itertools import accumulate
+
+from utils.journal_matcher import MIN_CHARS_LENGTH, MIN_WORDS_COUNT
+from utils.journal_standardizer import JournalStandardizer
+from utils.title_index import FUZZY_ENGINES, TitlePrefixIndex, fuzzy_pattern
+
+
+LETTERS = 'ABCDEFGHIJLMNOPQRSTUVXZ'
+VOWELS = 'AEIOU'
+
+
+def generate_vocabulary(rnd, size):
+    """
+    Gera um vocabulário de palavras pronunciáveis, alternando consoantes e vogais.
+
+    :param rnd: gerador de números aleatórios
+    :param size: quantidade de palavras
+    :return: lista de palavras
+    """
+    vocabulary = set()
+    while len(vocabulary) < size:
+        length = rnd.randint(2, 12)
+        vocabulary.add(''.join(rnd.choice(VOWELS if i % 2 else LETTERS) for i in range(length)))
+    return sorted(vocabulary)
+
+
+def generate_title_to_issnl(size, core_size=10000, vocabulary_size=20000, seed=0):
+    """
+    Gera uma base title-to-issnl sintética, com palavras sorteadas de um vocabulário com distribuição de Zipf.
+    Os core_size primeiros títulos são os procurados pelas consultas; os demais iniciam com palavras de outro
+    vocabulário e apenas aumentam o tamanho da base.
+
+    :param size: quantidade de títulos
+    :param core_size: quantidade de títulos procurados pelas consultas
+    :param vocabulary_size: quantidade de palavras do vocabulário
+    :param seed: semente do gerador de números aleatórios
+    :return: tupla (dicionário title-to-issnl, dicionário title-to-issnl dos títulos procurados)
+    """
+    rnd = random.Random(seed)
+
+    vocabulary = generate_vocabulary(rnd, vocabulary_size)
+    rnd.shuffle(vocabulary)
+    weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    filler_vocabulary = [w.lower() for w in generate_vocabulary(rnd, vocabulary_size // 10)]
+
+    core = {}
+    while len(core) < min(size, core_size):
+        title = ' '.join(rnd.choices(vocabulary, cum_weights=weights, k=rnd.randint(2, 6)))
+        core[title] = {'%08d' % rnd.randint(0, 99999999)}
+
+    title_to_issnl = dict(core)
+    while len(title_to_issnl) < size:
+        words = [rnd.choice(filler_vocabulary)] + rnd.choices(vocabulary, cum_weights=weights, k=rnd.randint(1, 5))
+        title_to_issnl[' '.join(words)] = {'%08d' % rnd.randint(0, 99999999)}
+
+    return title_to_issnl, core
+
+
+def generate_queries(title_to_issnl, size, seed=0):
+    """
+    Gera títulos citados a partir de títulos oficiais, abreviando suas palavras.
+
+    :param title_to_issnl: base title-to-issnl
+    :param size: quantidade de títulos citados
+    :param seed: semente do gerador de números aleatórios
+    :return: lista de títulos citados
+    """
+    rnd = random.Random(seed)
+    titles = sorted(title_to_issnl.keys())
+
+    queries = []
+    while len(queries) < size:
+        words = [w[:rnd.randint(min(3, len(w)), len(w))] for w in rnd.choice(titles).split(' ')]
+        query = ' '.join(words)
+        if len(query) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
+            queries.append(query)
+
+    return queries
+
+
+def match_fuzzy_full_scan(title_to_issnl, journal_title):
+    """
+    Casamento aproximado percorrendo todas as chaves de title-to-issnl (implementação anterior ao índice de prefixos).
+    """
+    matches = set()
+
+    words = journal_title.split(' ')
+
+    if len(journal_title) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
+        pattern = r'[\w|\s]*'.join([word for word in words]) + r'[\w|\s]*'
+        title_pattern = re.compile(pattern, re.UNICODE)
+
+        for official_title in [ot for ot in title_to_issnl.keys() if ot.startswith(words[0])]:
+            if title_pattern.fullmatch(official_title):
+                matches = matches.union(title_to_issnl[official_title])
+    return matches
+
+
+def match_regex(title_index, words):
+    """
+    Verifica os candidatos com a expressão regular do casamento aproximado, compilada a cada consulta.
+    """
+    title_pattern = fuzzy_pattern(words)
+    return [t for t in title_index.startswith(words[0]) if title_pattern.fullmatch(t)]
+
+
+def match_matcher(title_index, words):
+    """
+    Verifica os candidatos com o casamento de palavras ordenadas do índice, sem expressões regulares.
+    """
+    return title_index.match(words)
+
+
+def measure(func, queries):
+    start = time.perf_counter()
+    results = [func(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main():
+    usage = "compare fuzzy journal title matching engines against the full key scan"
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '-s', '--sizes',
+        default='10000,50000,100000,400000',
+        help='comma-separated sizes of the synthetic title-to-issnl base'
+    )
+
+    parser.add_argument(
+        '-q', '--queries',
+        type=int,
+        default=200,
+        help='number of cited titles matched for each size'
+    )
+
+    parser.add_argument(
+        '-c', '--core_size',
+        type=int,
+        default=10000,
+        help='number of titles searched by the queries; the remaining titles only enlarge the base'
+    )
+
+    args = parser.parse_args()
+
+    engines = sorted(FUZZY_ENGINES)
+    print('%10s %14s' % ('titles', 'scan (us/cit)') + ''.join(' %14s' % (e + ' (us/cit)') for e in engines))
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        title_to_issnl, core = generate_title_to_issnl(size, args.core_size)
+        queries = generate_queries(core, args.queries)
+
+        scan_time, scan_results = measure(lambda q: match_fuzzy_full_scan(title_to_issnl, q), queries)
+
+        line = '%10d %14.1f' % (size, scan_time * 1e6)
+        for engine in engines:
+            jstd = JournalStandardizer(None, fuzzy_engine=engine)
+            jstd.db = {'title-to-issnl': title_to_issnl}
+            jstd._title_index = FUZZY_ENGINES[engine](title_to_issnl)
+
+            engine_time, engine_results = measure(jstd.match_fuzzy, queries)
+            if engine_results != scan_results:
+                raise ValueError('Results of the %s engine differ from full scan results' % engine)
+
+            line += ' %14.1f' % (engine_time * 1e6)
+
+        print(line)
+
+    print()
+    print('%10s %14s %14s %8s' % ('titles', 'regex (us/cit)', 'matcher (us/cit)', 'speedup'))
+
+    for size in [int(s) for s in args.sizes.split(',')]:
+        title_to_issnl, core = generate_title_to_issnl(size, args.core_size)
+        queries = [q.split(' ') for q in generate_queries(core, args.queries)]
+        title_index = TitlePrefixIndex(title_to_issnl)
+
+        regex_time, regex_results = measure(lambda words: match_regex(title_index, words), queries)
+        matcher_time, matcher_results = measure(lambda words: match_matcher(title_index, words), queries)
+        if matcher_results != regex_results:
+            raise ValueError('Results of the ordered words matcher differ from regex results')
+
+        print('%10d %14.1f %16.1f %7.1fx' % (size, regex_time * 1e6, matcher_time * 1e6, regex_time / matcher_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_citations, generate_correction_database
+from benchmarks.title_preprocessing import check_equivalence, print_mismatches
+from utils.citation_utils import clean_author_name
+from utils.field_processor import (
+    preprocess_default,
+    preprocess_journal_title,
+    preprocess_publication_date,
+    preprocess_volume
+)
+from utils.generate_db import DB_FORMATS, save
+
+
+# Casos medidos, na ordem de execução
+CASES = [
+    'preprocess_journal_title',
+    'preprocess_default',
+    'preprocess_publication_date',
+    'preprocess_volume',
+    'clean_author_name',
+    'match_exact',
+    'match_fuzzy',
+    'infer_volume',
+    'extract_issn_year_volume_keys',
+    'validate_match',
+    'standardize'
+]
+
+# Quantidade de textos aleatórios em que os pré-processamentos de títulos são comparados com as implementações
+# anteriores (ver benchmarks.title_preprocessing) antes de medir preprocess_journal_title
+EQUIVALENCE_CHECKS = 10000
+
+# Métricas comparadas com o baseline: nome, sentido em que a métrica melhora (1, se valores maiores são melhores) e
+# diferença absoluta abaixo da qual uma piora é tratada como ruído (picos de memória de poucos KB variam entre execuções)
+COMPARED_METRICS = [('ops-per-second', 1, 0.0), ('peak-memory-kb', -1, 16.0)]
+
+
+def build_inputs(jstd, citations):
+    """
+    Prepara as entradas de cada caso a partir das referências citadas sintéticas.
+
+    :param jstd: JournalStandardizer
+    :param citations: referências citadas geradas por benchmarks.synthetic.generate_citations
+    :return: dicionário caso -> tupla (função medida, lista de tuplas de argumentos)
+    """
+    from utils.standardizer import Standardizer
+
+    standardizer = Standardizer(jstd)
+    articles = [c for c in citations if c.publication_type == 'article']
+    titles = [preprocess_journal_title(c.source, discard_invalid_chars=True, toggle_upper=True) for c in articles]
+
+    # Entradas da inferência e da validação: referências citadas cujo título casa exatamente com mais de um ISSN-L ou,
+    # sem casamento exato, de modo fuzzy com algum ISSN-L, como em Standardizer._standardize_journal
+    validated = []
+    for c, title in zip(articles, titles):
+        matches = jstd.match_exact(title)
+        if len(matches) == 1:
+            continue
+        if not matches:
+            matches = jstd.match_fuzzy(title)
+
+        issns = jstd.get_issns(matches) if matches else set()
+        if issns:
+            validated.append((c, issns))
+
+    keys = [jstd.extract_issn_year_volume_keys(c, issns)[0] for c, issns in validated]
+
+    return {
+        'preprocess_journal_title': (preprocess_journal_title, [(c.source, True, True) for c in articles]),
+        'preprocess_default': (preprocess_default, [(c.title(),) for c in citations]),
+        'preprocess_publication_date': (preprocess_publication_date, [(c.publication_date or '',) for c in citations]),
+        'preprocess_volume': (preprocess_volume, [(c.volume,) for c in articles if c.volume]),
+        'clean_author_name': (clean_author_name, [(a.get('surname', ''), a.get('given_names', ''))
+                                                  for c in citations for a in c.authors or [] if a]),
+        'match_exact': (jstd.match_exact, [(t,) for t in titles]),
+        'match_fuzzy': (jstd.match_fuzzy, [(t,) for t in titles]),
+        'infer_volume': (jstd.infer_volume, [(i, c.publication_date[:4]) for c, issns in validated
+                                             if c.publication_date for i in sorted(issns)]),
+        'extract_issn_year_volume_keys': (jstd.extract_issn_year_volume_keys, validated),
+        'validate_match': (jstd.validate_match, [(k,) for k in keys if k]),
+        'standardize': (standardizer.standardize, [(c, 'scl') for c in citations])
+    }
+
+
+def run_once(func, inputs):
+    """
+    Executa func sobre cada tupla de argumentos, medindo a latência de cada chamada.
+
+    :return: lista de latências em nanossegundos
+    """
+    timer = time.perf_counter_ns
+    latencies = []
+    append = latencies.append
+    for args in inputs:
+        started_at = timer()
+        func(*args)
+        append(timer() - started_at)
+    return latencies
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def measure(func, inputs, repeat=3):
+    """
+    Mede um caso: vazão e latências da execução mais rápida entre repeat execuções e pico de memória alocada
+    (tracemalloc) em uma execução adicional, separada para que o rastreamento não afete os tempos.
+
+    :param func: função medida
+    :param inputs: lista de tuplas de argumentos
+    :param repeat: quantidade de execuções cronometradas
+    :return: dicionário de métricas
+    """
+    best = None
+    for i in range(repeat):
+        latencies = run_once(func, inputs)
+        if best is None or sum(latencies) < sum(best):
+            best = latencies
+
+    tracemalloc.start()
+    for args in inputs:
+        func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    best.sort()
+    total = sum(best)
+    return {'operations': len(best),
+            'ops-per-second': round(len(best) / total * 1e9, 1) if total else 0.0,
+            'p50-us': round(percentile(best, 50) / 1e3, 3),
+            'p99-us': round(percentile(best, 99) / 1e3, 3),
+            'peak-memory-kb': round(peak / 1024, 1)}
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """
+    Compara os resultados com um baseline gravado por uma execução anterior.
+
+    :param results: métricas de cada caso
+    :param baseline: métricas de cada caso no baseline
+    :param tolerance: piora relativa tolerada em cada métrica
+    :return: lista de regressões (caso, métrica, valor atual, valor do baseline)
+    """
+    regressions = []
+    for case, metrics in results.items():
+        for metric, direction, min_difference in COMPARED_METRICS:
+            reference = baseline.get(case, {}).get(metric)
+            if not reference:
+                continue
+            difference = (metrics[metric] - reference) * direction
+            if difference < -tolerance * reference and -difference > min_difference:
+                regressions.append((case, metric, metrics[metric], reference))
+    return regressions
+
+
+def main():
+    usage = "measure the normalization and matching hot paths on synthetic SciELO-like data"
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '-s', '--size',
+        type=int,
+        default=10000,
+        help='number of ISSN-Ls of the synthetic correction database'
+    )
+
+    parser.add_argument(
+        '-n', '--citations',
+        type=int,
+        default=20000,
+        help='number of synthetic cited references'
+    )
+
+    parser.add_argument(
+        '-f', '--db_format',
+        default='lazy',
+        choices=DB_FORMATS
+    )
+
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=3,
+        help='number of timed runs of each case (the fastest one is reported)'
+    )
+
+    parser.add_argument(
+        '-c', '--cases',
+        nargs='+',
+        default=CASES,
+        choices=CASES
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        default=None,
+        help='JSON file where the results are written (it can be used as a baseline by later runs)'
+    )
+
+    parser.add_argument(
+        '-b', '--baseline',
+        default=None,
+        help='JSON file written by a previous run; the exit status is 1 if any case regressed'
+    )
+
+    parser.add_argument(
+        '-t', '--tolerance',
+        type=float,
+        default=0.1,
+        help='relative worsening of ops/s and peak memory tolerated before reporting a regression (peak memory '
+             'increases up to 16 KB are always tolerated)'
+    )
+
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0
+    )
+
+    args = parser.parse_args()
+
+    # Um pré-processamento que diverge da implementação anterior não é medido: o comando termina com status 1
+    if 'preprocess_journal_title' in args.cases:
+        mismatches = check_equivalence(EQUIVALENCE_CHECKS, args.seed)
+        print_mismatches(mismatches)
+        if mismatches:
+            sys.exit(1)
+
+    from utils.journal_standardizer import JournalStandardizer
+
+    db = generate_correction_database(args.size, seed=args.seed)
+    citations = generate_citations(db, args.citations, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as dir_db:
+        path_db = os.path.join(dir_db, 'bc-benchmark.bin')
+        save(db, path_db, args.db_format)
+        del db
+
+        # Sem caches de casamento, para que cada consulta percorra as bases e os índices
+        jstd = JournalStandardizer(path_db, use_exact=True, use_fuzzy=True, cache_size=0,
+                                   database_backend=args.db_format)
+        jstd.title_index
+
+        inputs = build_inputs(jstd, citations)
+
+        results = {}
+        for case in [c for c in CASES if c in args.cases]:
+            func, case_inputs = inputs[case]
+            results[case] = measure(func, case_inputs, args.repeat)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    print('%30s %10s %12s %10s %10s %12s %10s' % ('case', 'ops', 'ops/s', 'p50 (us)', 'p99 (us)', 'peak (KB)', 'baseline'))
+    for case, m in results.items():
+        reference = baseline.get(case, {}).get('ops-per-second')
+        change = '%+9.1f%%' % ((m['ops-per-second'] / reference - 1) * 100) if reference else ''
+        print('%30s %10d %12.0f %10.2f %10.2f %12.1f %10s' % (case, m['operations'], m['ops-per-second'], m['p50-us'],
+                                                             m['p99-us'], m['peak-memory-kb'], change))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'parameters': vars(args),
+                       'results': results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for case, metric, value, reference in regressions:
+            print('REGRESSION %s %s: %s (baseline %s)' % (case, metric, value, reference))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import random
+import time
+
+from itertools import accumulate
+
+from benchmarks.match_fuzzy import generate_title_to_issnl, generate_vocabulary
+from utils.packed_keys import PackedKeySet
+from utils.volume_table import build_inferred_keys
+
+
+YEARS = range(1980, 2021)
+
+# Prefixos, sufixos e trechos acrescentados aos títulos de periódicos citados, como encontrados nas referências do SciELO
+TITLE_NOISE = ['(Online)', '(Impresso)', '(Print)', '(São Paulo)', '&amp;', '[Internet]', 'Rev.', 'Revista', 'Ciência']
+
+ACCENTS = str.maketrans('AEIOUC', 'ÁÉÍÓÚÇ')
+
+LANGUAGES = ['pt', 'pt', 'en', 'en', 'en', 'es']
+
+
+def zipf_weights(size):
+    """
+    Obtém os pesos acumulados de uma distribuição de Zipf, usados por random.choices.
+
+    :param size: quantidade de itens
+    :return: lista de pesos acumulados
+    """
+    return list(accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+def abbreviate(title: str):
+    """
+    Abrevia as palavras de um título com mais de cinco letras, mantendo as quatro primeiras.
+
+    :param title: título
+    :return: título abreviado
+    """
+    return ' '.join(w[:4] if len(w) > 5 else w for w in title.split(' '))
+
+
+def generate_issn(rnd):
+    if rnd.random() < 0.1:
+        return '%07dX' % rnd.randint(0, 9999999)
+    return '%08d' % rnd.randint(0, 99999999)
+
+
+def generate_correction_database(size, shared_ratio=0.2, coverage=0.7, seed=0):
+    """
+    Gera bases de correção sintéticas, com a estrutura das geradas por utils.generate_db a partir do SciELO.
+
+    Cada ISSN-L tem um ou dois ISSNs, um título principal e um título abreviado (ambos em title-to-issnl) e uma equação de
+    volume linear a partir de um ano inicial. A base ISSN-ANO-VOLUME contém uma fração coverage dos anos e volumes de
+    cada ISSN; a de regressão linear contém os volumes dados pelas equações em todos os anos, e a de regressão linear com
+    volume flexibilizado, os volumes vizinhos. Uma fração shared_ratio dos títulos é associada também a outro ISSN-L,
+    para que as consultas passem pela validação com ano e volume.
+
+    :param size: quantidade de ISSN-Ls
+    :param shared_ratio: fração de títulos associados a dois ISSN-Ls
+    :param coverage: fração dos anos e volumes de cada ISSN presentes na base ISSN-ANO-VOLUME
+    :param seed: semente do gerador de números aleatórios
+    :return: dicionário de bases de correção
+    """
+    rnd = random.Random(seed)
+    titles, _ = generate_title_to_issnl(size, core_size=size, seed=seed)
+
+    issnl_to_data = {}
+    issn_to_issnl = {}
+    title_to_issnl = {}
+    issn_to_equation = {}
+    issn_year_volume = []
+    issn_year_volume_lr = []
+    issn_year_volume_lr_ml1 = []
+
+    for title in titles:
+        issns = [generate_issn(rnd) for i in range(rnd.choice([1, 1, 2]))]
+        issnl = issns[0]
+        abbrev_title = abbreviate(title)
+
+        issnl_to_data[issnl] = {'main-title': [title],
+                                'main-abbrev-title': [abbrev_title],
+                                'issns': issns,
+                                'alternative-titles': []}
+        # dict.fromkeys, e não set, para que a ordem de title-to-issnl (e dos sorteios) não dependa do hash das strings
+        for t in dict.fromkeys((title, abbrev_title)):
+            title_to_issnl.setdefault(t, set()).add(issnl)
+
+        first_year = rnd.choice(YEARS)
+        first_volume = rnd.randint(1, 30)
+        for issn in issns:
+            issn_to_issnl[issn] = issnl
+            issn_to_equation[issn] = (float(first_volume - first_year), 1.0, round(rnd.uniform(0.8, 1.0), 4))
+
+            for year in range(first_year, YEARS[-1] + 1):
+                volume = year - first_year + first_volume
+                issn_year_volume_lr.append('%s-%d-%d' % (issn, year, volume))
+                issn_year_volume_lr_ml1.extend('%s-%d-%d' % (issn, year, v) for v in (volume - 1, volume + 1) if v > 0)
+                if rnd.random() < coverage:
+                    issn_year_volume.append('%s-%d-%d' % (issn, year, volume))
+
+    issnls = sorted(issnl_to_data)
+    for matched_issnls in title_to_issnl.values():
+        if rnd.random() < shared_ratio:
+            matched_issnls.add(rnd.choice(issnls))
+
+    db = {
+        'issnl-to-data': issnl_to_data,
+        'issn-to-issnl': issn_to_issnl,
+        'title-to-issnl': title_to_issnl,
+        'issn-year-volume': PackedKeySet(issn_year_volume),
+        'title-year-volume': set(),
+        'issn-year-volume-lr': PackedKeySet(issn_year_volume_lr),
+        'issn-year-volume-lr-ml1': PackedKeySet(issn_year_volume_lr_ml1),
+        'issn-to-equation': issn_to_equation,
+        'version': 'synthetic-%d-%d' % (size, seed),
+        'creation-date': time.strftime('%Y-%m-%d')
+    }
+    db['issn-year-volume-inferred'] = build_inferred_keys(issn_to_equation, db['issn-year-volume-lr'])
+
+    return db
+
+
+def cited_journal_title(rnd, title: str, abbrev_title: str):
+    """
+    Gera um título de periódico citado a partir do título oficial: em caixa mista, eventualmente abreviado (com ou sem
+    pontos), acentuado, com palavras truncadas ou com trechos acrescentados.
+
+    :param rnd: gerador de números aleatórios
+    :param title: título oficial
+    :param abbrev_title: título abreviado oficial
+    :return: título citado
+    """
+    r = rnd.random()
+    if r < 0.4:
+        words = title.title().split(' ')
+    elif r < 0.8:
+        words = [w + '.' if len(w) == 4 and rnd.random() < 0.5 else w for w in abbrev_title.title().split(' ')]
+    else:
+        # Palavras truncadas, encontradas apenas pelo casamento fuzzy
+        words = [w[:rnd.randint(min(3, len(w)), len(w))] for w in title.title().split(' ')]
+
+    if rnd.random() < 0.1:
+        words = [w.translate(ACCENTS) for w in words]
+    if rnd.random() < 0.1:
+        words.append(rnd.choice(TITLE_NOISE))
+    return ' '.join(words)
+
+
+def generate_citations(db: dict, size, document_size=30, seed=0):
+    """
+    Gera referências citadas sintéticas, no formato ISIS dos registros do SciELO lidos por xylose (campos v10, v12, v14,
+    v18, v30, v31, v32, v62, v65, v66 e v880). Cerca de 75% são artigos, 15% livros, 5% capítulos de livros e 5% outros
+    tipos de documentos. Periódicos, autores, editoras e locais de publicação se repetem com distribuição de Zipf.
+    Nos artigos, o volume citado é correto em 60% dos casos, ausente em 30% (e inferido) e incorreto nos demais.
+
+    :param db: bases de correção geradas por generate_correction_database
+    :param size: quantidade de referências citadas
+    :param document_size: quantidade de referências citadas por documento citante
+    :param seed: semente do gerador de números aleatórios
+    :return: lista de referências citadas (xylose.scielodocument.Citation)
+    """
+    from xylose.scielodocument import Citation
+
+    rnd = random.Random(seed)
+
+    journals = sorted(db['issnl-to-data'].items())
+    rnd.shuffle(journals)
+    journal_weights = zipf_weights(len(journals))
+
+    surnames = [w.title() for w in generate_vocabulary(rnd, 5000)]
+    rnd.shuffle(surnames)
+    surname_weights = zipf_weights(len(surnames))
+    given_names = [w.title() for w in generate_vocabulary(rnd, 500)]
+
+    words = [w.lower() for w in generate_vocabulary(rnd, 3000)]
+    publishers = ['Editora ' + w.title() for w in words[:200]] + ['Hucitec', 'Fiocruz', 'EDUSP', 'Springer', 'Elsevier']
+    rnd.shuffle(publishers)
+    publisher_weights = zipf_weights(len(publishers))
+    addresses = ['São Paulo', 'Rio de Janeiro', 'Brasília', 'Porto Alegre', 'Belo Horizonte', 'Lisboa', 'México',
+                 'Buenos Aires', 'New York', 'London', 'Bogotá', 'Santiago']
+
+    def authors(tag):
+        return {tag: [{'s': rnd.choices(surnames, cum_weights=surname_weights)[0], 'n': rnd.choice(given_names)
+                       if rnd.random() < 0.5 else rnd.choice(given_names)[0] + '.'} for i in range(rnd.randint(1, 6))]}
+
+    def words_title():
+        text = ' '.join(rnd.choices(words, k=rnd.randint(3, 12))).capitalize()
+        return {'_': text, 'l': rnd.choice(LANGUAGES)}
+
+    citations = []
+    for n in range(size):
+        pid = 'S%04d-%04d%04d%07d' % (rnd.randint(0, 9999), rnd.randint(0, 9999), rnd.choice(YEARS), n // document_size)
+        data = {'v880': [{'_': '%s%05d' % (pid, n % document_size + 1)}]}
+        year = rnd.choice(YEARS)
+        first_page = rnd.randint(1, 900)
+
+        r = rnd.random()
+        if r < 0.75:
+            issnl, attrs = rnd.choices(journals, cum_weights=journal_weights)[0]
+            title = cited_journal_title(rnd, attrs['main-title'][0], attrs['main-abbrev-title'][0])
+
+            equation = db['issn-to-equation'][issnl]
+            year = max(year, int(-equation[0]) + 1)
+            volume = round(equation[0] + equation[1] * year)
+
+            data.update({'v30': [{'_': title}], 'v12': [words_title()], 'v65': [{'_': '%d0000' % year}]})
+            data.update(authors('v10'))
+
+            r = rnd.random()
+            if r < 0.6:
+                data['v31'] = [{'_': str(volume)}]
+            elif r < 0.7:
+                data['v31'] = [{'_': str(rnd.randint(1, 200))}]
+            if rnd.random() < 0.8:
+                data['v32'] = [{'_': str(rnd.randint(1, 12))}]
+            if rnd.random() < 0.9:
+                data['v14'] = [{'_': '%d-%d' % (first_page, first_page + rnd.randint(1, 20))}]
+
+        elif r < 0.95:
+            data.update({'v18': [words_title()], 'v65': [{'_': '%d0000' % year}]})
+            data.update(authors('v10'))
+            if r >= 0.9:
+                data.update({'v12': [words_title()], 'v14': [{'_': '%d-%d' % (first_page, first_page + 30)}]})
+                data.update(authors('v17'))
+            if rnd.random() < 0.8:
+                data['v62'] = [{'_': rnd.choices(publishers, cum_weights=publisher_weights)[0]}]
+            if rnd.random() < 0.8:
+                data['v66'] = [{'_': rnd.choice(addresses)}]
+
+        else:
+            data.update({'v37': [{'_': 'http://www.example.org/%d' % n}], 'v65': [{'_': '%d0000' % year}]})
+            data.update(authors('v10'))
+
+        citations.append(Citation(data))
+
+    return citations
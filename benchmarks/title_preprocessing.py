@@ -0,0 +1,227 @@
+import argparse
+import html
+import random
+import re
+import sys
+import textwrap
+import time
+
+from benchmarks.match_fuzzy import generate_title_to_issnl
+from utils import field_processor, string_processor
+from utils.string_processor import alpha_num_space, remove_accents, remove_double_spaces, remove_invalid_chars
+
+
+# Trechos sorteados na geração de textos aleatórios: palavras especiais e seus fragmentos, entidades HTML, parênteses,
+# acentos, caracteres de compatibilidade, caracteres de controle e espaços não ASCII
+FRAGMENTS = (
+    field_processor.SPECIAL_WORDS + string_processor.special_words +
+    ['IMPRESS', 'ONLI', 'NE', 'CD', 'ROM', 'PRI', 'NT', 'ELE', 'TRONIC', 'O', 'ED'] +
+    ['&amp;', '&eacute;', '&#233;', '&lt;', '&#40;', '&#41;', '&nbsp;', '&', '&#x2013;'] +
+    ['(', ')', '((', '))', '( ', ' )', '(Online)', '(Print)', 'x(y)z'] +
+    list('áÉçñÃöøÿØ') + ['ﬁ', '²', 'Ａ', 'ß', 'Æ', 'µ', 'Ω', 'İ', 'ǅ', '一'] +
+    ['\x00', '\x0b', '\x1f', '\x7f', '\t', '\n', '\r', '\x1c', ' ', ' ', '​'] +
+    list('-.,;:/@&|_*#+"\'') + list('0123456789') + ['a', 'Z', 'rev', 'Bras', ' ', '  ']
+)
+
+
+def reference_string_processor(text, use_remove_invalid_chars=False):
+    """
+    Implementação anterior de utils.string_processor.preprocess_journal_title, usada como referência.
+    """
+    text = html.unescape(text)
+
+    if use_remove_invalid_chars:
+        text = remove_invalid_chars(text)
+
+    parenthesis_search = re.search(string_processor.parenthesis_pattern, text)
+    while parenthesis_search is not None:
+        text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
+        parenthesis_search = re.search(string_processor.parenthesis_pattern, text)
+
+    for sw in string_processor.special_words:
+        text = text.replace(sw, '')
+    return remove_double_spaces(alpha_num_space(remove_accents(text), include_special_chars=True)).upper()
+
+
+def reference_field_processor(text, discard_invalid_chars=False, toggle_upper=False):
+    """
+    Implementação anterior de utils.field_processor.preprocess_journal_title, usada como referência.
+    """
+    text = html.unescape(text)
+
+    if discard_invalid_chars:
+        text = remove_invalid_chars(text)
+
+    parenthesis_search = re.search(field_processor.PATTERN_PARENTHESIS, text)
+    while parenthesis_search is not None:
+        text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
+        parenthesis_search = re.search(field_processor.PATTERN_PARENTHESIS, text)
+
+    for sw in field_processor.SPECIAL_WORDS:
+        text = text.replace(sw, '')
+    cleaned_text = remove_double_spaces(alpha_num_space(remove_accents(text), include_special_chars=True))
+
+    if toggle_upper:
+        return cleaned_text.upper()
+
+    return cleaned_text.lower()
+
+
+# Pares (nome, implementação atual, implementação de referência) comparados
+VARIANTS = [
+    ('string_processor',
+     lambda t: string_processor.preprocess_journal_title(t),
+     lambda t: reference_string_processor(t)),
+    ('string_processor invalid chars',
+     lambda t: string_processor.preprocess_journal_title(t, use_remove_invalid_chars=True),
+     lambda t: reference_string_processor(t, use_remove_invalid_chars=True)),
+    ('field_processor lower',
+     lambda t: field_processor.preprocess_journal_title(t),
+     lambda t: reference_field_processor(t)),
+    ('field_processor upper invalid chars',
+     lambda t: field_processor.preprocess_journal_title(t, discard_invalid_chars=True, toggle_upper=True),
+     lambda t: reference_field_processor(t, discard_invalid_chars=True, toggle_upper=True)),
+]
+
+
+def generate_text(rnd):
+    """
+    Gera um texto aleatório a partir de FRAGMENTS e de caracteres Unicode sorteados.
+
+    :param rnd: gerador de números aleatórios
+    :return: texto
+    """
+    parts = []
+    for i in range(rnd.randint(0, 12)):
+        if rnd.random() < 0.1:
+            parts.append(chr(rnd.randint(0, 0x2FFF)))
+        else:
+            parts.append(rnd.choice(FRAGMENTS))
+    return ''.join(parts)
+
+
+def check_equivalence(size, seed=0):
+    """
+    Compara as implementações atual e de referência em textos aleatórios.
+
+    :param size: quantidade de textos aleatórios
+    :param seed: semente do gerador de números aleatórios
+    :return: lista de divergências (variante, texto, resultado atual, resultado de referência)
+    """
+    rnd = random.Random(seed)
+
+    mismatches = []
+    for i in range(size):
+        text = generate_text(rnd)
+        for name, current, reference in VARIANTS:
+            expected = reference(text)
+            result = current(text)
+            if result != expected:
+                mismatches.append((name, text, result, expected))
+    return mismatches
+
+
+def print_mismatches(mismatches, limit=10):
+    """
+    Exibe as primeiras divergências encontradas por check_equivalence.
+
+    :param mismatches: lista de divergências
+    :param limit: quantidade máxima de divergências exibidas
+    """
+    for name, text, result, expected in mismatches[:limit]:
+        print('MISMATCH %s: %r -> %r (expected %r)' % (name, text, result, expected))
+
+
+def generate_corpus(size, seed=0):
+    """
+    Gera títulos de periódicos citados a partir dos títulos sintéticos de benchmarks.match_fuzzy, acrescidos de
+    abreviações, acentos, entidades HTML e indicações de suporte entre parênteses.
+
+    :param size: quantidade de títulos
+    :param seed: semente do gerador de números aleatórios
+    :return: lista de títulos
+    """
+    rnd = random.Random(seed)
+    title_to_issnl, _ = generate_title_to_issnl(size, core_size=size, seed=seed)
+
+    corpus = []
+    for title in title_to_issnl:
+        words = title.title().split()
+        if rnd.random() < 0.3:
+            words = [w[:4] + '.' if len(w) > 5 else w for w in words]
+        if rnd.random() < 0.2:
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(['Revista', 'Rev.', 'Ciência', 'São Paulo', 'Saúde']))
+        if rnd.random() < 0.05:
+            words.append(rnd.choice(['&amp;', '&eacute;tudes']))
+        if rnd.random() < 0.1:
+            words.append(rnd.choice(['(Online)', '(Impresso)', '(Print)', 'ONLINE', '(São Paulo)']))
+        corpus.append(' '.join(words))
+    return corpus
+
+
+def measure(func, corpus):
+    started_at = time.perf_counter()
+    for title in corpus:
+        func(title)
+    return (time.perf_counter() - started_at) / len(corpus)
+
+
+def main():
+    usage = "compare the journal title preprocessing against the previous implementation"
+
+    parser = argparse.ArgumentParser(textwrap.dedent(usage))
+
+    parser.add_argument(
+        '-i', '--titles',
+        default=None,
+        help='file containing one cited journal title per line (a synthetic corpus is generated by default)'
+    )
+
+    parser.add_argument(
+        '-s', '--size',
+        type=int,
+        default=100000,
+        help='number of synthetic titles'
+    )
+
+    parser.add_argument(
+        '-c', '--checks',
+        type=int,
+        default=100000,
+        help='number of random texts compared against the previous implementation (the exit status is 1 if any of '
+             'them, or any title of the corpus, differs)'
+    )
+
+    args = parser.parse_args()
+
+    # Implementações divergentes não são medidas: o comando termina com status 1
+    mismatches = check_equivalence(args.checks)
+    print_mismatches(mismatches)
+    print('%d random texts compared, %d mismatches' % (args.checks, len(mismatches)))
+    if mismatches:
+        sys.exit(1)
+
+    if args.titles:
+        with open(args.titles) as f:
+            corpus = [line.rstrip('\n') for line in f]
+    else:
+        corpus = generate_corpus(args.size)
+
+    corpus_mismatches = False
+
+    print('%36s %12s %12s %8s' % ('variant', 'old (us)', 'new (us)', 'speedup'))
+    for name, current, reference in VARIANTS:
+        if any(current(t) != reference(t) for t in corpus):
+            print('MISMATCH %s on the corpus' % name)
+            corpus_mismatches = True
+
+        old_time = measure(reference, corpus)
+        new_time = measure(current, corpus)
+        print('%36s %12.2f %12.2f %7.1fx' % (name, old_time * 1e6, new_time * 1e6, old_time / new_time))
+
+    if corpus_mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,42 @@
 import json
 import logging
 import os
-import pickle
-import re
 import time
 
 from datetime import datetime
-from pymongo import errors, MongoClient, uri_parser
+from pymongo import errors, MongoClient, UpdateOne, uri_parser
+from utils.journal_matcher import (
+    APPROXIMATE_MAX_DISTANCE,
+    FUZZY_ENGINE,
+    JOURNAL_CACHE_SIZE,
+    JournalMatcher,
+    MIN_CHARS_LENGTH,
+    MIN_WORDS_COUNT,
+    STATUS_NOT_NORMALIZED,
+    STATUS_EXACT,
+    STATUS_EXACT_VALIDATED,
+    STATUS_EXACT_VALIDATED_LR,
+    STATUS_EXACT_VALIDATED_LR_ML1,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    STATUS_FUZZY_VALIDATED,
+    STATUS_FUZZY_VALIDATED_LR,
+    STATUS_FUZZY_VALIDATED_LR_ML1,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    STATUS_APPROXIMATE_VALIDATED,
+    STATUS_APPROXIMATE_VALIDATED_LR,
+    STATUS_APPROXIMATE_VALIDATED_LR_ML1,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    VOLUME_IS_ORIGINAL,
+    VOLUME_IS_INFERRED,
+    VOLUME_NOT_USED,
+)
+from utils.packed_keys import split_key
 from utils.string_processor import preprocess_journal_title
 from xylose.scielodocument import Citation
 
@@ -14,30 +44,8 @@ from xylose.scielodocument import Citation
 DIR_DATA = os.environ.get('DIR_DATA', '/opt/data')
 MONGO_STDCITS_COLLECTION = os.environ.get('MONGO_STDCITS_COLLECTION', 'standardized')
 
-MIN_CHARS_LENGTH = 6
-MIN_WORDS_COUNT = 2
 
-STATUS_NOT_NORMALIZED = 0
-STATUS_EXACT = 1
-STATUS_EXACT_VALIDATED = 2
-STATUS_EXACT_VALIDATED_LR = 3
-STATUS_EXACT_VALIDATED_LR_ML1 = 4
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED = 5
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR = 6
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1 = 7
-STATUS_FUZZY_VALIDATED = 8
-STATUS_FUZZY_VALIDATED_LR = 9
-STATUS_FUZZY_VALIDATED_LR_ML1 = 10
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED = 11
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR = 12
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1 = 13
-
-VOLUME_IS_ORIGINAL = 0
-VOLUME_IS_INFERRED = 1
-VOLUME_NOT_USED = -1
-
-
-class JournalStandardizer:
+class JournalStandardizer(JournalMatcher):
 
     logging.basicConfig(level=logging.INFO)
 
@@ -45,11 +53,30 @@ class JournalStandardizer:
                  path_db,
                  use_exact=False,
                  use_fuzzy=False,
-                 mongo_uri_std_cits=None):
+                 mongo_uri_std_cits=None,
+                 fuzzy_engine=FUZZY_ENGINE,
+                 cache_size=JOURNAL_CACHE_SIZE,
+                 use_approximate=False,
+                 max_distance=APPROXIMATE_MAX_DISTANCE,
+                 hot_reload=False,
+                 database_backend='auto'):
+
+        self.open_persistence(mongo_uri_std_cits)
+
+        if path_db:
+            logging.info('Loading %s' % path_db)
 
-        self.use_exact = use_exact
-        self.use_fuzzy = use_fuzzy
+        super().__init__(path_db, use_exact, use_fuzzy, fuzzy_engine, cache_size, use_approximate, max_distance,
+                         hot_reload, database_backend)
 
+    def open_persistence(self, mongo_uri_std_cits=None):
+        """
+        Define onde as referências citadas normalizadas são persistidas: na coleção MongoDB, se a string de conexão for
+        informada, ou em um arquivo JSON em DIR_DATA. Pode ser chamado novamente depois da criação dos processos de
+        utils.parallel.ForkPool, para que o cliente MongoDB não seja herdado por eles.
+
+        :param mongo_uri_std_cits: string de conexão com a coleção de referências citadas normalizadas
+        """
         if mongo_uri_std_cits:
             try:
                 self.persist_mode = 'mongo'
@@ -70,10 +97,6 @@ class JournalStandardizer:
             file_name_results = 'std-results-' + str(time.time()) + '.json'
             self.path_results = os.path.join(DIR_DATA, file_name_results)
 
-        if path_db:
-            logging.info('Loading %s' % path_db)
-            self.db = self.load_database(path_db)
-
     def add_hifen_issn(self, issn: str):
         """
         Insere hífen no ISSN.
@@ -84,28 +107,15 @@ class JournalStandardizer:
         if issn:
             return issn[:4] + '-' + issn[4:]
 
-    def load_database(self, path_db: str):
-        """
-        Carrega na memória o arquivo binário das bases de correção e validação.
-
-        :param path_db: caminho do arquivo binário
-        :return: base carregada em formato de dicionário
-        """
-        try:
-            with open(path_db, 'rb') as f:
-                return pickle.load(f)
-        except FileNotFoundError:
-            logging.error('File {0} does not exist'.format(path_db))
-
-    def extract_issnl_from_valid_match(self, valid_match: str):
+    def extract_issnl_from_valid_match(self, valid_match):
         """
         Extrai ISSN-L a partir de uma chave ISSN-ANO-VOLUME.
         Caso o ISSN não exista no dicionário issn-to-issnl, considera o próprio ISSN como ISSN-L.
 
-        :param valid_match: chave validada no formato ISSN-ANO-VOLUME
+        :param valid_match: chave validada no formato ISSN-ANO-VOLUME, empacotada ou em string
         :return: ISSN-L
         """
-        issn, year, volume = valid_match.split('-')
+        issn, year, volume = split_key(valid_match)
 
         issnl = self.db['issn-to-issnl'].get(issn, '')
 
@@ -114,38 +124,6 @@ class JournalStandardizer:
 
         return issnl
 
-    def extract_issn_year_volume_keys(self, cit: Citation, issns: set):
-        """
-        Extrai chaves ISSN-YEAR-VOLUME para uma referência citada e lista de ISSNs.
-
-        :param cit: referência citada
-        :param issns: set de possíveis ISSNs
-        :return: set de chaves ISSN-ANO-VOLUME
-        """
-        keys = set()
-
-        cit_year = cit.publication_date
-
-        if cit_year:
-            if len(cit_year) > 4:
-                cit_year = cit_year[:4]
-
-            if len(cit_year) == 4 and cit_year.isdigit():
-                cit_vol = cit.volume
-
-                if cit_vol and cit_vol.isdigit():
-                    for i in issns:
-                        keys.add('-'.join([i, cit_year, cit_vol]))
-                    return keys, VOLUME_IS_ORIGINAL
-                else:
-                    for i in issns:
-                        cit_vol_inferred = self.infer_volume(i, cit_year)
-                        if cit_vol_inferred:
-                            keys.add('-'.join([i, cit_year, cit_vol_inferred]))
-                    return keys, VOLUME_IS_INFERRED
-
-        return keys, VOLUME_NOT_USED
-
     def get_issns(self, matched_issnls: set):
         """
         Obtém todos os ISSNs associados a um set de ISSN-Ls.
@@ -168,7 +146,7 @@ class JournalStandardizer:
         """
         Obtém o status com base no modo de casamento, de volume utilizado e de base de validação utilizada.
 
-        :param match_mode: modo de casamento ['exact', 'fuzzy']
+        :param match_mode: modo de casamento ['exact', 'fuzzy', 'approximate']
         :param mount_mode: modo de obtenção da chave de validação ['VOLUME_IS_ORIGINAL', VOLUME_IS_INFERRED']
         :param db_used: base de validação utilizada ['lr', 'lr-ml1', 'default']
         :return: código de status conforme método utilizado
@@ -181,13 +159,20 @@ class JournalStandardizer:
                     return STATUS_EXACT_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_EXACT_VALIDATED
-            else:
+            elif match_mode == 'fuzzy':
                 if db_used == 'lr':
                     return STATUS_FUZZY_VALIDATED_LR
                 elif db_used == 'lr-ml1':
                     return STATUS_FUZZY_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_FUZZY_VALIDATED
+            elif match_mode == 'approximate':
+                if db_used == 'lr':
+                    return STATUS_APPROXIMATE_VALIDATED_LR
+                elif db_used == 'lr-ml1':
+                    return STATUS_APPROXIMATE_VALIDATED_LR_ML1
+                elif db_used == 'default':
+                    return STATUS_APPROXIMATE_VALIDATED
         elif mount_mode == VOLUME_IS_INFERRED:
             if match_mode == 'exact':
                 if db_used == 'lr':
@@ -196,62 +181,20 @@ class JournalStandardizer:
                     return STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_EXACT_VOLUME_INFERRED_VALIDATED
-            else:
+            elif match_mode == 'fuzzy':
                 if db_used == 'lr':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR
                 elif db_used == 'lr-ml1':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED
-
-    def infer_volume(self, issn: str, year: str):
-        """
-        Infere o volume de um periódico a partir de issn-to-equation.
-
-        :param issn: issn para o qual o volume será inferido
-        :return: str do volume inferido arredondado para valor inteiro (se volume inferido for maior que 0)
-        """
-        equation = self.db['issn-to-equation'].get(issn)
-
-        if equation:
-            a, b, r2 = equation
-            volume = a + (b * int(year))
-
-            if volume > 0:
-                return str(round(volume))
-
-    def match_exact(self, journal_title: str):
-        """
-        Procura journal_title de forma exata no dicionário title-to-issnl.
-
-        :param journal_title: título do periódico citado
-        :return: set de ISSN-Ls associados de modo exato ao título do periódico citado
-        """
-        return self.db['title-to-issnl'].get(journal_title, set())
-
-    def match_fuzzy(self, journal_title: str):
-        """
-        Procura journal_title de forma aproximada no dicionário title-to-issnl.
-
-        :param journal_title: título do periódico citado
-        :return: set de ISSN-Ls associados de modo aproximado ao título do periódico citado
-        """
-        matches = set()
-
-        words = journal_title.split(' ')
-
-        # Para a comparação ser possível, é preciso que o título tenha pelo menos MIN_CHARS_LENGTH letras e seja
-        # formado por pelo menos MIN_WORDS_COUNT palavras.
-        if len(journal_title) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
-            # O título oficial deve iniciar com a primeira palavra do título procurado
-            pattern = r'[\w|\s]*'.join([word for word in words]) + '[\w|\s]*'
-            title_pattern = re.compile(pattern, re.UNICODE)
-
-            # O título oficial deve iniciar com a primeira palavra do título procurado
-            for official_title in [ot for ot in self.db['title-to-issnl'].keys() if ot.startswith(words[0])]:
-                if title_pattern.fullmatch(official_title):
-                    matches = matches.union(self.db['title-to-issnl'][official_title])
-        return matches
+            elif match_mode == 'approximate':
+                if db_used == 'lr':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR
+                elif db_used == 'lr-ml1':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR_ML1
+                elif db_used == 'default':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED
 
     def mount_id(self, cit: Citation, collection: str):
         """
@@ -302,7 +245,8 @@ class JournalStandardizer:
                 'official-abbreviated-journal-title': attrs['main-abbrev-title'],
                 'alternative-journal-titles': attrs['alternative-titles'],
                 'status': status,
-                'update-date': datetime.now().strftime('%Y-%m-%d')
+                'update-date': datetime.now().strftime('%Y-%m-%d'),
+                'database-version': self.db.get('version')
                 }
 
         return data
@@ -319,11 +263,9 @@ class JournalStandardizer:
                 f.write('\n')
 
         elif self.persist_mode == 'mongo':
-            for v in std_citations.values():
-                self.standardizer.update_one(
-                    filter={'_id': v['_id']},
-                    update={'$set': v},
-                    upsert=True)
+            # Uma única escrita em lote, não ordenada, em vez de uma ida ao servidor por referência citada
+            self.standardizer.bulk_write([UpdateOne({'_id': v['_id']}, {'$set': v}, upsert=True)
+                                          for v in std_citations.values()], ordered=False)
 
     def get_citation_mongo_status(self, cit_id: str):
         """
@@ -338,6 +280,22 @@ class JournalStandardizer:
                 return cit_standardized.get('status', STATUS_NOT_NORMALIZED)
         return STATUS_NOT_NORMALIZED
 
+    def get_citations_mongo_status(self, document):
+        """
+        Obtém, em uma única consulta, o status atual de normalização das referências citadas (artigos) de um documento.
+
+        :param document: Article cujas referências citadas serão consultadas
+        :return: dicionário id da referência citada -> status atual de normalização (apenas das já persistidas)
+        """
+        if self.persist_mode != 'mongo' or not document.citations:
+            return {}
+
+        cit_ids = [self.mount_id(cit, document.collection_acronym)
+                   for cit in document.citations if cit.publication_type == 'article']
+
+        return {c['_id']: c.get('status', STATUS_NOT_NORMALIZED)
+                for c in self.standardizer.find({'_id': {'$in': cit_ids}}, {'status': 1})}
+
     def validate_match(self, keys, use_lr=False, use_lr_ml1=False):
         """
         Valida chaves ISSN-ANO-VOLUME nas bases de validação
@@ -366,23 +324,43 @@ class JournalStandardizer:
         Processo auxiliar que realiza casamento de um título de periódico citado e valida casamentos, se houver
         mais de um. O processo de validação consiste em desambiguar os possíveis ISSN-Ls associados a um periódico
         citado usando dados de ano e volume da referência citada.
+        O resultado depende apenas do título limpo, do modo de casamento, do ano e do volume citados, e é memorizado no
+        cache de validação a partir dessa chave.
 
         :param cit: referência citada
-        :param mode: mode de execução de casamento ['exact', 'fuzzy']
+        :param mode: mode de execução de casamento ['exact', 'fuzzy', 'approximate']
         :param cleaned_cit_journal_title: título limpo do periódico citado
         :return: dicionário composto por dados normalizados
         """
-        if mode == 'fuzzy':
-            matches = self.match_fuzzy(cleaned_cit_journal_title)
-        else:
-            matches = self.match_exact(cleaned_cit_journal_title)
+        cache_key = (cleaned_cit_journal_title, mode, (cit.publication_date or '')[:4], cit.volume)
+
+        result = self.validation_cache.get(cache_key)
+        if result is None:
+            result = self._match_and_validate(cit, cleaned_cit_journal_title, mode)
+            self.validation_cache.put(cache_key, result)
+
+        status, key, issn_l = result
+        if status != STATUS_NOT_NORMALIZED:
+            return self.mount_standardized_citation_data(status, key, issn_l)
+
+    def _match_and_validate(self, cit, cleaned_cit_journal_title, mode='exact'):
+        """
+        Casa o título de periódico citado e, se houver mais de um casamento ou se o casamento for aproximado, valida os
+        ISSN-Ls casados com o ano e o volume da referência citada.
+
+        :param cit: referência citada
+        :param cleaned_cit_journal_title: título limpo do periódico citado
+        :param mode: mode de execução de casamento ['exact', 'fuzzy', 'approximate']
+        :return: tupla (status, chave ISSN-ANO-VOLUME validada, ISSN-L)
+        """
+        matches = self.get_matches(cleaned_cit_journal_title, mode)
 
         # Verifica se houve casamento com apenas com um ISSN-L e se é casamento exato
         if len(matches) == 1 and mode == 'exact':
-            return self.mount_standardized_citation_data(status=STATUS_EXACT, issn_l=matches.pop())
+            return STATUS_EXACT, None, next(iter(matches))
 
         # Verifica se houve casamento com mais de um ISSN-L ou se é casamento aproximado e houve apenas um casamento
-        elif len(matches) > 1 or (mode == 'fuzzy' and len(matches)) == 1:
+        elif len(matches) > 1 or (mode != 'exact' and len(matches) == 1):
             # Carrega todos os ISSNs possiveis associados aos ISSN-Ls casados
             possible_issns = self.get_issns(matches)
 
@@ -396,7 +374,7 @@ class JournalStandardizer:
 
                     if len(cit_valid_matches) == 1:
                         status = self.get_status(mode, mount_mode, 'default')
-                        return self.mount_standardized_citation_data(status, cit_valid_matches.pop())
+                        return status, cit_valid_matches.pop(), None
 
                     elif len(cit_valid_matches) == 0:
                         # Valida chaves na base de regressão linear
@@ -404,7 +382,7 @@ class JournalStandardizer:
 
                         if len(cit_valid_matches) == 1:
                             status = self.get_status(mode, mount_mode, 'lr')
-                            return self.mount_standardized_citation_data(status, cit_valid_matches.pop())
+                            return status, cit_valid_matches.pop(), None
 
                         elif len(cit_valid_matches) == 0:
                             # Valida chaves na base de regressão linear com volume flexibilizado
@@ -412,22 +390,41 @@ class JournalStandardizer:
 
                             if len(cit_valid_matches) == 1:
                                 status = self.get_status(mode, mount_mode, 'lr-ml1')
-                                return self.mount_standardized_citation_data(status, cit_valid_matches.pop())
+                                return status, cit_valid_matches.pop(), None
+
+        return STATUS_NOT_NORMALIZED, None, None
 
     def standardize(self, document):
         """
         Normaliza referências citadas de um artigo.
-        Atua de duas formas: exata e aproximada.
+        Atua de três formas: exata, aproximada e tolerante a erros de digitação.
         Persiste resultados em arquivo JSON ou em MongoDB.
 
         :param document: Article dos quais as referências citadas serão normalizadas
         """
+        std_citations = self.standardize_document(document, self.get_citations_mongo_status(document))
+
+        if std_citations:
+            self.save_standardized_citations(std_citations)
+
+    def standardize_document(self, document, current_status: dict):
+        """
+        Normaliza referências citadas de um artigo, sem persistir os resultados nem consultar o MongoDB, para que possa
+        ser executado em processos criados por fork (ver utils.parallel).
+        Referências citadas já normalizadas, segundo current_status, são ignoradas.
+
+        :param document: Article dos quais as referências citadas serão normalizadas
+        :param current_status: status atual de normalização das referências citadas, obtido por get_citations_mongo_status
+        :return: dicionário de referências citadas normalizadas
+        """
         std_citations = {}
 
         if document.citations:
             for c, cit in enumerate([dc for dc in document.citations if dc.publication_type == 'article']):
+                self.maybe_swap()
+
                 cit_id = self.mount_id(cit, document.collection_acronym)
-                cit_current_status = self.get_citation_mongo_status(cit_id)
+                cit_current_status = current_status.get(cit_id, STATUS_NOT_NORMALIZED)
 
                 if cit_current_status == STATUS_NOT_NORMALIZED:
                     cleaned_cit_journal_title = preprocess_journal_title(cit.source)
@@ -449,12 +446,20 @@ class JournalStandardizer:
                                     std_citations[cit_id] = fuzzy_match_result
                                     cit_current_status = fuzzy_match_result['status']
 
-                        if cit_current_status == STATUS_NOT_NORMALIZED and (self.use_exact or self.use_fuzzy):
+                        if self.use_approximate:
+                            if cit_current_status == STATUS_NOT_NORMALIZED:
+                                approximate_match_result = self._standardize(cit, cleaned_cit_journal_title, mode='approximate')
+                                if approximate_match_result:
+                                    approximate_match_result.update({'_id': cit_id, 'cited-journal-title': cleaned_cit_journal_title})
+                                    std_citations[cit_id] = approximate_match_result
+                                    cit_current_status = approximate_match_result['status']
+
+                        if cit_current_status == STATUS_NOT_NORMALIZED and (self.use_exact or self.use_fuzzy or self.use_approximate):
                             unmatch_result = {'_id': cit_id,
                                               'cited-journal-title': cleaned_cit_journal_title,
                                               'status': STATUS_NOT_NORMALIZED,
-                                              'update-date': datetime.now().strftime('%Y-%m-%d')}
+                                              'update-date': datetime.now().strftime('%Y-%m-%d'),
+                                              'database-version': self.db.get('version')}
                             std_citations[cit_id] = unmatch_result
 
-        if std_citations:
-            self.save_standardized_citations(std_citations)
+        return std_citations
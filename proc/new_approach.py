@@ -2,40 +2,320 @@ import argparse
 import logging
 import os
 import sys
+import time
 sys.path.append('..')
 
+from collections import deque
 from datetime import datetime, timedelta
-from pymongo import MongoClient, uri_parser
-from requests import ReadTimeout
-from utils.journal_standardizer import JournalStandardizer
-from utils.standardizer import Standardizer
-from xylose.scielodocument import Article
+from pymongo import MongoClient, ReplaceOne, uri_parser
+from pymongo.errors import AutoReconnect, CursorNotFound, PyMongoError
+from pymongo.write_concern import WriteConcern
+from utils.checkpoint import Checkpoint, CHECKPOINT_INTERVAL, FileCheckpointStore, MongoCheckpointStore, Watermark
+from utils.journal_standardizer import APPROXIMATE_MAX_DISTANCE, FUZZY_ENGINE, JournalStandardizer
+from utils.parallel import chunks, ForkPool, STANDARDIZE_WORKERS
+from utils.partition import PARTITION_KEYS, parse_partition, partition_filter
+from utils.pipeline import Pipeline, PIPELINE_QUEUE_SIZE, PIPELINE_STATS_INTERVAL
+from utils.raw_citation import ARTICLE_META_PROJECTION, document_citations, document_collection, document_pid
+from utils.standardizer import STANDARDIZER_MEMO_MAX_MB, STANDARDIZER_MEMO_SIZE, Standardizer
 
 
 LOGGING_LEVEL = os.environ.get('LOGGING_LEVEL', 'INFO')
 JOURNAL_STANDARDIZER_PATH = os.environ.get('JOURNAL_STANDARDIZER_PATH', '/opt/data/bc-v1.bin')
 MONGO_STD_CITATIONS_PERSIT_BUCKET_SIZE = int(os.environ.get('MONGO_DB_STD_CITATIONS_PERSIT_BUCKET_SIZE', '500'))
+MONGO_STD_CITATIONS_WRITE_CONCERN = os.environ.get('MONGO_STD_CITATIONS_WRITE_CONCERN', '1')
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '10'))
+STANDARDIZE_DOCUMENTS_BATCH_SIZE = int(os.environ.get('STANDARDIZE_DOCUMENTS_BATCH_SIZE', '500'))
 MONGO_URI_STD_CITATIONS = os.environ.get('MONGO_DB_STD_CITATIONS', 'mongodb://127.0.0.1:27017/scielo_search.std_citations')
 MONGO_URI_ARTICLE_META = os.environ.get('MONGO_URI_ARTICLE_META', 'mongodb://127.0.0.1:27017/articlemeta.articles')
+MONGO_CURSOR_RETRIES = int(os.environ.get('MONGO_CURSOR_RETRIES', '5'))
+CHECKPOINT_LOCATION = os.environ.get('CHECKPOINT_LOCATION', '')
+PARTITION = os.environ.get('PARTITION', '1/1')
+PARTITION_KEY = os.environ.get('PARTITION_KEY', 'date')
 
+# Clientes MongoDB reutilizados durante toda a execução, um por string de conexão
+MONGO_CLIENTS = {}
 
-def mongo_collection(mongo_uri):
+
+def mongo_client(mongo_uri):
+    """
+    Obtém o cliente MongoDB de uma string de conexão, criado na primeira chamada e reutilizado durante toda a execução
+    (cada cliente mantém um pool de conexões).
+
+    :param mongo_uri: string de conexão
+    :return: MongoClient
+    """
+    client = MONGO_CLIENTS.get(mongo_uri)
+    if client is None:
+        client = MongoClient(mongo_uri, maxPoolSize=MONGO_MAX_POOL_SIZE)
+        MONGO_CLIENTS[mongo_uri] = client
+    return client
+
+
+def parse_write_concern(w: str):
+    """
+    Converte o valor de w informado em texto ('0', '1', 'majority', ...) para o formato de WriteConcern.
+
+    :param w: quantidade de nós que devem confirmar a escrita ou nome de um modo de confirmação
+    :return: WriteConcern
+    """
+    return WriteConcern(w=int(w) if w.isdigit() else w)
+
+
+def mongo_collection(mongo_uri, write_concern=None):
     puri = uri_parser.parse_uri(mongo_uri)
 
     database = puri['database']
     collection = puri['collection']
 
-    return MongoClient(MONGO_URI_ARTICLE_META).get_database(database).get_collection(collection)
+    options = {'write_concern': parse_write_concern(write_concern)} if write_concern else {}
+    return mongo_client(mongo_uri).get_database(database).get_collection(collection, **options)
+
+
+def window_query(from_date: datetime, until_date: datetime, position=None, partition=None):
+    """
+    Cria a consulta dos documentos processados na janela de datas, a partir de uma posição, se informada.
+
+    :param from_date: data inicial da janela
+    :param until_date: data final da janela
+    :param position: tupla (processing_date, _id) do último documento já tratado; são consultados apenas os seguintes, na
+    ordem de processing_date e _id
+    :param partition: filtro de uma partição da janela (ver utils.partition.partition_filter)
+    :return: consulta MongoDB
+    """
+    query = {'$and': [{'processing_date': {'$gte': from_date}},
+                      {'processing_date': {'$lte': until_date}}]}
+
+    if partition:
+        query['$and'].append(partition)
+
+    if position:
+        processing_date, document_id = position
+        query['$and'].append({'$or': [{'processing_date': {'$gt': processing_date}},
+                                      {'processing_date': processing_date, '_id': {'$gt': document_id}}]})
+    return query
+
+
+def read_documents(article_meta, from_date: datetime, until_date: datetime, position=None, partition=None):
+    """
+    Lê os documentos da janela de datas na ordem de processing_date e _id, apenas com os campos usados na normalização
+    (ver utils.raw_citation.ARTICLE_META_PROJECTION). Se o cursor for perdido (queda de conexão ou
+    cursor expirado no servidor), ele é reaberto a partir do último documento lido, até MONGO_CURSOR_RETRIES vezes
+    seguidas.
+
+    :param article_meta: coleção de documentos do ArticleMeta
+    :param from_date: data inicial da janela
+    :param until_date: data final da janela
+    :param position: tupla (processing_date, _id) a partir da qual a leitura é retomada
+    :param partition: filtro de uma partição da janela
+    :return: gerador de documentos (dicionários)
+    """
+    retries = 0
+    while True:
+        documents = article_meta.find(window_query(from_date, until_date, position, partition),
+                                      ARTICLE_META_PROJECTION,
+                                      sort=[('processing_date', 1), ('_id', 1)],
+                                      no_cursor_timeout=True)
+        try:
+            for doc in documents:
+                position = doc['processing_date'], doc['_id']
+                retries = 0
+                yield doc
+            return
+
+        except (AutoReconnect, CursorNotFound) as e:
+            retries += 1
+            if retries > MONGO_CURSOR_RETRIES:
+                raise
+            logging.warning('Reopening ArticleMeta cursor after %s (attempt %d of %d)' % (e, retries, MONGO_CURSOR_RETRIES))
+            time.sleep(2 ** retries)
+
+        finally:
+            documents.close()
+
+
+def log_progress(documents, label: str, total: int, interval=PIPELINE_STATS_INTERVAL):
+    """
+    Registra no log, a cada interval segundos e ao final, a quantidade de documentos lidos e a vazão da leitura.
+
+    :param documents: iterável de documentos
+    :param label: identificação da partição nas mensagens
+    :param total: quantidade de documentos esperados
+    :param interval: intervalo, em segundos, entre registros
+    :return: gerador dos mesmos documentos
+    """
+    started_at = logged_at = time.perf_counter()
+    read = 0
+
+    def log():
+        elapsed = time.perf_counter() - started_at
+        logging.info('%s: read %d of %d documents (%.1f%%) in %.1f s (%.1f documents/s)'
+                     % (label, read, total, read / total * 100 if total else 100.0, elapsed,
+                        read / elapsed if elapsed else 0))
+
+    for doc in documents:
+        read += 1
+        yield doc
+
+        if time.perf_counter() - logged_at >= interval:
+            log()
+            logged_at = time.perf_counter()
+    log()
+
+
+def numbered_batches(batches):
+    """
+    Numera os lotes de documentos na ordem de leitura e associa a cada um a posição de seu último documento, usadas para
+    registrar o avanço da execução nos checkpoints.
+
+    :param batches: iterável de lotes de documentos (dicionários)
+    :return: gerador de tuplas (número do lote, (processing_date, _id) do último documento, lote)
+    """
+    for batch_number, batch in enumerate(batches):
+        yield batch_number, (batch[-1]['processing_date'], batch[-1]['_id']), batch
+
+
+def open_checkpoint(location: str, key: str):
+    """
+    Cria o checkpoint de uma execução, gravado em uma coleção MongoDB (se location for uma string de conexão) ou em um
+    arquivo local.
+
+    :param location: string de conexão com a coleção de checkpoints ou caminho do arquivo de checkpoints
+    :param key: chave da execução
+    :return: Checkpoint
+    """
+    if location.startswith('mongodb://') or location.startswith('mongodb+srv://'):
+        store = MongoCheckpointStore(mongo_collection(location))
+    else:
+        store = FileCheckpointStore(location)
+    return Checkpoint(store, key, CHECKPOINT_INTERVAL)
+
+
+def persist_data(std_citations: list, mongo_uri_std_citations, write_concern=MONGO_STD_CITATIONS_WRITE_CONCERN):
+    """
+    Persiste um bucket de referências citadas normalizadas em uma única escrita em lote, não ordenada, que substitui os
+    registros existentes ou os insere.
+
+    :param std_citations: referências citadas normalizadas
+    :param mongo_uri_std_citations: string de conexão com a coleção de referências citadas normalizadas
+    :param write_concern: valor de w do write concern da escrita
+    :return: tempo da escrita em segundos
+    """
+    mc_std_cits = mongo_collection(mongo_uri_std_citations, write_concern)
+
+    started_at = time.perf_counter()
+    mc_std_cits.bulk_write([ReplaceOne({'_id': s['_id']}, s, upsert=True) for s in std_citations], ordered=False)
+    elapsed = time.perf_counter() - started_at
+
+    logging.info('Persisted %d rows in %.1f ms (%.0f rows/s)' % (len(std_citations), elapsed * 1e3,
+                                                                 len(std_citations) / elapsed if elapsed else 0))
+    return elapsed
+
+
+class StdCitationsWriter:
+    """
+    Acumula referências citadas normalizadas e as persiste em buckets de bucket_size linhas (ver persist_data).
+
+    Um lote de documentos é concluído quando todas as suas referências citadas normalizadas foram persistidas; a posição
+    do último documento dos lotes concluídos consecutivos (ver utils.checkpoint.Watermark) é gravada periodicamente no
+    checkpoint, se informado.
+    """
+
+    def __init__(self, mongo_uri_std_citations, bucket_size=MONGO_STD_CITATIONS_PERSIT_BUCKET_SIZE,
+                 write_concern=MONGO_STD_CITATIONS_WRITE_CONCERN, checkpoint=None, position=None):
+        self.mongo_uri_std_citations = mongo_uri_std_citations
+        self.bucket_size = bucket_size
+        self.write_concern = write_concern
+
+        self.std_citations = []
+        self.received = 0
+        self.persisted = 0
+        self.persist_time = 0.0
+
+        self.checkpoint = checkpoint
+        self.watermark = Watermark(position)
+
+        # Lotes recebidos e ainda não concluídos: número, posição e total de linhas recebidas até o fim do lote
+        self.pending_batches = deque()
+
+    def _persist(self, std_citations: list):
+        self.persist_time += persist_data(std_citations, self.mongo_uri_std_citations, self.write_concern)
+        self.persisted += len(std_citations)
+
+    def _complete_batches(self):
+        advanced = False
+        while self.pending_batches and self.pending_batches[0][2] <= self.persisted:
+            batch_number, position, _ = self.pending_batches.popleft()
+            advanced = self.watermark.complete(batch_number, position) or advanced
+
+        if advanced and self.checkpoint:
+            self.checkpoint.save(self.watermark.position)
+
+    def write(self, result: tuple):
+        batch_number, position, std_citations = result
+
+        self.std_citations.extend(std_citations)
+        self.received += len(std_citations)
+        self.pending_batches.append((batch_number, position, self.received))
+
+        while len(self.std_citations) >= self.bucket_size:
+            self._persist(self.std_citations[:self.bucket_size])
+            self.std_citations = self.std_citations[self.bucket_size:]
+
+        self._complete_batches()
+
+    def close(self):
+        if self.std_citations:
+            self._persist(self.std_citations)
+            self.std_citations = []
+
+        self._complete_batches()
 
+    def save_checkpoint(self):
+        if self.checkpoint:
+            self.checkpoint.save(self.watermark.position, force=True)
 
-def persist_data(std_citations: list, mongo_uri_std_citations):
-    logging.info('Persisting %d rows' % len(std_citations))
-    mc_std_cits = mongo_collection(mongo_uri_std_citations)
 
-    for s in std_citations:
-        mc_std_cits.update({'_id': s['_id']},
-                           s,
-                           upsert=True)
+def standardize_documents(standardizer: Standardizer, documents: list):
+    """
+    Normaliza as referências citadas de um lote de documentos, em lote por coleção, para que valores repetidos entre
+    documentos (títulos de periódicos, anos, volumes, editoras) sejam tratados uma única vez.
+
+    :param standardizer: Standardizer
+    :param documents: lista de documentos do ArticleMeta (dicionários)
+    :return: lista de referências citadas normalizadas
+    """
+    collection_citations = {}
+    for doc in documents:
+        logging.debug('Standardizing %s' % document_pid(doc))
+
+        citations = document_citations(doc)
+        if citations:
+            collection_citations.setdefault(document_collection(doc), []).extend(citations)
+
+    std_citations = []
+    for collection, citations in collection_citations.items():
+        for cit_std in standardizer.standardize_many(citations, collection):
+            if len(cit_std.keys()) > 2:
+                std_citations.append(cit_std)
+
+    return std_citations
+
+
+def standardize_raw_documents(standardizer: Standardizer):
+    """
+    Cria a função que normaliza um lote de documentos lidos do ArticleMeta, aplicada pelos processos de
+    utils.parallel.ForkPool. As referências citadas são lidas diretamente dos registros dos documentos (ver
+    utils.raw_citation.RawCitation) pelo próprio processo que os normaliza.
+
+    :param standardizer: Standardizer
+    :return: função que recebe uma tupla (número do lote, posição, lista de documentos), como as de numbered_batches, e
+    retorna a tupla (número do lote, posição, lista de referências citadas normalizadas)
+    """
+    def standardize(numbered_batch):
+        batch_number, position, raw_documents = numbered_batch
+        return batch_number, position, standardize_documents(standardizer, raw_documents)
+
+    return standardize
 
 
 def main():
@@ -79,11 +359,132 @@ def main():
         default=False
     )
 
+    parser.add_argument(
+        '-a', '--approximate',
+        dest='use_approximate',
+        action='store_true',
+        default=False
+    )
+
+    parser.add_argument(
+        '--max_distance',
+        type=int,
+        default=APPROXIMATE_MAX_DISTANCE,
+        choices=[1, 2]
+    )
+
+    parser.add_argument(
+        '--fuzzy_engine',
+        default=FUZZY_ENGINE,
+        choices=['prefix', 'token']
+    )
+
+    parser.add_argument(
+        '--database_backend',
+        default='auto',
+        choices=['auto', 'pickle', 'lazy', 'mmap', 'sqlite']
+    )
+
+    parser.add_argument(
+        '--hot_reload',
+        dest='hot_reload',
+        action='store_true',
+        default=False
+    )
+
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=STANDARDIZE_DOCUMENTS_BATCH_SIZE,
+        help='number of documents whose cited references are standardized together'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=STANDARDIZE_WORKERS,
+        help='number of processes, forked after loading the correction database, that standardize batches of documents'
+    )
+
+    parser.add_argument(
+        '--unordered',
+        dest='unordered',
+        action='store_true',
+        default=False,
+        help='persist the results of each batch as soon as it is ready, instead of in the order of the documents'
+    )
+
+    parser.add_argument(
+        '--memo_size',
+        type=int,
+        default=STANDARDIZER_MEMO_SIZE,
+        help='number of normalized values memoized per field (titles, publishers, authors); 0 disables the memoization'
+    )
+
+    parser.add_argument(
+        '--memo_max_mb',
+        type=float,
+        default=STANDARDIZER_MEMO_MAX_MB,
+        help='estimated memory ceiling, in MB, shared by the memoized fields'
+    )
+
     parser.add_argument(
         '--mongo_uri_std_citations',
         default=MONGO_URI_STD_CITATIONS
     )
 
+    parser.add_argument(
+        '--bucket_size',
+        type=int,
+        default=MONGO_STD_CITATIONS_PERSIT_BUCKET_SIZE,
+        help='number of standardized cited references persisted in each bulk write'
+    )
+
+    parser.add_argument(
+        '--write_concern',
+        default=MONGO_STD_CITATIONS_WRITE_CONCERN,
+        help='write concern (w) of the bulk writes: a number of nodes or a mode such as majority'
+    )
+
+    parser.add_argument(
+        '--queue_size',
+        type=int,
+        default=PIPELINE_QUEUE_SIZE,
+        help='number of document batches, and of standardized batches, buffered between the read, standardize and '
+             'write stages'
+    )
+
+    parser.add_argument(
+        '--partition',
+        type=parse_partition,
+        default=PARTITION,
+        help='process only the partition i of N partitions of the date window (i/N, such as 2/4), so that N processes, '
+             'on one or several hosts, share the window'
+    )
+
+    parser.add_argument(
+        '--partition_by',
+        default=PARTITION_KEY,
+        choices=PARTITION_KEYS,
+        help='split the date window into equal processing_date sub-ranges (date), _id ranges with about the same number '
+             'of documents (id) or groups of collections (collection)'
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        default=CHECKPOINT_LOCATION,
+        help='file, or MongoDB connection string of a collection, where the position of the last persisted document is '
+             'periodically saved'
+    )
+
+    parser.add_argument(
+        '--resume',
+        dest='resume',
+        action='store_true',
+        default=False,
+        help='restart from the position saved in the checkpoint of a previous run with the same dates'
+    )
+
     parser.add_argument(
         '--logging_level',
         default=LOGGING_LEVEL
@@ -91,49 +492,98 @@ def main():
 
     params = parser.parse_args()
 
+    # Os processos do pool herdariam o recarregador e carregariam, cada um, sua própria cópia da nova base
+    if params.hot_reload and params.workers > 1:
+        parser.error('--hot_reload cannot be used with --workers greater than 1')
+
+    if params.resume and not params.checkpoint:
+        parser.error('--resume requires --checkpoint (or CHECKPOINT_LOCATION)')
+
     logging.basicConfig(level=params.logging_level,
                         format='[%(asctime)s] %(levelname)s %(message)s',
                         datefmt='%d/%b/%Y %H:%M:%S')
 
-    article_meta = mongo_collection(MONGO_URI_ARTICLE_META)
-
     logging.info('Creating JournalStandardizer')
     jstd = JournalStandardizer(params.journal_standardizer_path,
                                use_exact=params.use_exact,
-                               use_fuzzy=params.use_fuzzy)
-    standardizer = Standardizer(jstd)
+                               use_fuzzy=params.use_fuzzy,
+                               fuzzy_engine=params.fuzzy_engine,
+                               use_approximate=params.use_approximate,
+                               max_distance=params.max_distance,
+                               hot_reload=params.hot_reload,
+                               database_backend=params.database_backend)
+    standardizer = Standardizer(jstd, memo_size=params.memo_size, memo_max_mb=params.memo_max_mb)
 
     logging.info('Standardizing articles\' cited references for published articles between %s and %s'
                  % (params.from_date, params.until_date))
 
-    std_citations = []
-
     from_date = datetime.strptime(params.from_date, '%Y-%m-%d')
     until_date = datetime.strptime(params.until_date, '%Y-%m-%d')
 
-    try:
-        for j in article_meta.find({'$and': [{'processing_date': {'$gte': from_date}},
-                                             {'processing_date': {'$lte': until_date}}]},
-                                   no_cursor_timeout=True):
-            doc = Article(j)
-
-            logging.debug('Standardizing %s' % doc.publisher_id)
-
-            if doc.citations:
-                for c in doc.citations:
-                    cit_std = standardizer.standardize(c, doc.collection_acronym)
-                    if len(cit_std.keys()) > 2:
-                        std_citations.append(cit_std)
-
-            if len(std_citations) >= MONGO_STD_CITATIONS_PERSIT_BUCKET_SIZE:
-                persist_data(std_citations, params.mongo_uri_std_citations)
-                std_citations = []
-
-        if len(std_citations) > 0:
-            persist_data(std_citations, params.mongo_uri_std_citations)
-
-    except ReadTimeout:
-        pass
+    # As bases são carregadas antes do fork, para que sejam compartilhadas pelos processos do pool
+    if params.workers > 1:
+        jstd.preload()
+
+    partition_index, partition_count = params.partition
+    partition_label = 'Partition %d/%d' % params.partition
+
+    checkpoint_key = 'new_approach %s %s' % (params.from_date, params.until_date)
+    if partition_count > 1:
+        checkpoint_key += ' %d/%d %s' % (partition_index, partition_count, params.partition_by)
+
+    # Os processos do pool são criados antes dos clientes MongoDB (do ArticleMeta, do checkpoint e da escrita) e das
+    # threads de leitura e de escrita do pipeline: um processo criado por fork herdaria as conexões e as threads de
+    # monitoramento dos clientes, além de travas que pertenciam a outras threads
+    with ForkPool(standardize_raw_documents(standardizer), params.workers) as pool:
+        article_meta = mongo_collection(MONGO_URI_ARTICLE_META)
+
+        checkpoint, position = None, None
+        if params.checkpoint:
+            checkpoint = open_checkpoint(params.checkpoint, checkpoint_key)
+            if params.resume:
+                position = checkpoint.load()
+                if position is None:
+                    parser.error('there is no checkpoint for %s to %s in %s'
+                                 % (params.from_date, params.until_date, params.checkpoint))
+                logging.info('Resuming after processing_date %s, _id %s' % position)
+
+        writer = StdCitationsWriter(params.mongo_uri_std_citations, params.bucket_size, params.write_concern,
+                                    checkpoint, position)
+
+        # Leitura do ArticleMeta, normalização e persistência são executadas em paralelo, ligadas por filas limitadas
+        pipeline = Pipeline(params.queue_size)
+
+        started_at = time.perf_counter()
+        try:
+            # Os limites da partição são obtidos da janela inteira, para que não mudem quando a execução é retomada
+            partition = partition_filter(article_meta, window_query(from_date, until_date), from_date, until_date,
+                                         partition_index, partition_count, params.partition_by)
+            total = article_meta.count_documents(window_query(from_date, until_date, position, partition))
+            logging.info('%s (by %s): %d documents to standardize' % (partition_label, params.partition_by, total))
+
+            documents = log_progress(read_documents(article_meta, from_date, until_date, position, partition),
+                                     partition_label, total)
+
+            pipeline.run(numbered_batches(chunks(documents, params.batch_size)),
+                         lambda batches: pool.map(batches, not params.unordered),
+                         writer.write,
+                         writer.close)
+
+        except PyMongoError as e:
+            logging.error('Interrupted by %s' % e)
+            if checkpoint:
+                logging.error('Run again with --resume to restart after the last persisted document')
+            sys.exit(1)
+
+        finally:
+            writer.save_checkpoint()
+
+    elapsed = time.perf_counter() - started_at
+    logging.info('%s: persisted %d rows in %.1f s (%.1f rows/s, %.1f s writing)'
+                 % (partition_label, writer.persisted, elapsed, writer.persisted / elapsed if elapsed else 0,
+                    writer.persist_time))
+    logging.info('Journal caches %s' % jstd.cache_stats())
+    logging.info('Memoized fields %s' % standardizer.memo_stats())
 
 
 if __name__ == '__main__':
@@ -5,13 +5,15 @@ import textwrap
 
 from articlemeta.client import RestfulClient
 from datetime import datetime
-from model.old_standardizer import JournalStandardizer
+from model.old_standardizer import APPROXIMATE_MAX_DISTANCE, FUZZY_ENGINE, JournalStandardizer
 from time import time
+from utils.parallel import chunks, ForkPool, STANDARDIZE_WORKERS
 
 
 DIR_DATA = os.environ.get('DIR_DATA', '/opt/data')
 MONGO_DATABASE_NAME = os.environ.get('MONGO_DATABASE_NAME', 'citations')
 MONGO_COLLECTION_NAME = os.environ.get('MONGO_COLLECTION_NAME', 'standardized')
+NORMALIZE_BATCH_SIZE = int(os.environ.get('NORMALIZE_BATCH_SIZE', '20'))
 
 
 def format_date(date: datetime):
@@ -20,7 +22,7 @@ def format_date(date: datetime):
     return date.strftime('%Y-%m-%d')
 
 
-def get_execution_mode(use_exact, use_fuzzy):
+def get_execution_mode(use_exact, use_fuzzy, use_approximate=False):
     info = []
 
     if use_exact:
@@ -33,9 +35,32 @@ def get_execution_mode(use_exact, use_fuzzy):
     else:
         info.append('Fuzzy is off')
 
+    if use_approximate:
+        info.append('Approximate is on')
+    else:
+        info.append('Approximate is off')
+
     return ' - '.join(info)
 
 
+def normalize_batch(sz: JournalStandardizer):
+    """
+    Cria a função que normaliza um lote de documentos, aplicada pelos processos de utils.parallel.ForkPool.
+
+    :param sz: JournalStandardizer
+    :return: função que recebe uma lista de tuplas (documento, status atual das referências citadas) e retorna a lista
+    de dicionários de referências citadas normalizadas de cada documento
+    """
+    def normalize(batch):
+        std_citations_list = []
+        for document, current_status in batch:
+            logging.info('Normalizing cited references in %s ' % document.publisher_id)
+            std_citations_list.append(sz.standardize_document(document, current_status))
+        return std_citations_list
+
+    return normalize
+
+
 def main():
     usage = "normalize cited references"
 
@@ -93,6 +118,29 @@ def main():
         help='use fuzzy match techniques'
     )
 
+    parser.add_argument(
+        '--fuzzy_engine',
+        default=FUZZY_ENGINE,
+        choices=['prefix', 'token'],
+        help='index used to find the official titles compared in fuzzy match'
+    )
+
+    parser.add_argument(
+        '-a', '--approximate',
+        default=False,
+        dest='use_approximate',
+        action='store_true',
+        help='use typo-tolerant match techniques'
+    )
+
+    parser.add_argument(
+        '--max_distance',
+        type=int,
+        default=APPROXIMATE_MAX_DISTANCE,
+        choices=[1, 2],
+        help='maximum number of edits between cited and official journal titles in typo-tolerant match'
+    )
+
     parser.add_argument(
         '-x', '--use_exact',
         default=False,
@@ -101,6 +149,42 @@ def main():
         help='use exact match techniques'
     )
 
+    parser.add_argument(
+        '--database_backend',
+        default='auto',
+        choices=['auto', 'pickle', 'lazy', 'mmap', 'sqlite'],
+        help='format of the correction database file (auto detects it; sqlite keeps the bases on disk for low-memory workers)'
+    )
+
+    parser.add_argument(
+        '--hot_reload',
+        default=False,
+        dest='hot_reload',
+        action='store_true',
+        help='reload the correction database when its file changes or on SIGHUP, without restarting'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=STANDARDIZE_WORKERS,
+        help='number of processes, forked after loading the correction database, that normalize batches of documents'
+    )
+
+    parser.add_argument(
+        '--batch_size',
+        type=int,
+        default=NORMALIZE_BATCH_SIZE,
+        help='number of documents sent to a worker at once'
+    )
+
+    parser.add_argument(
+        '--unordered',
+        default=False,
+        action='store_true',
+        help='persist the results of each batch as soon as it is ready, instead of in the order of the documents'
+    )
+
     parser.add_argument(
         '--mongo_uri',
         default=None,
@@ -110,19 +194,29 @@ def main():
 
     args = parser.parse_args()
 
+    # Os processos do pool herdariam o recarregador e carregariam, cada um, sua própria cópia da nova base
+    if args.hot_reload and args.workers > 1:
+        parser.error('--hot_reload cannot be used with --workers greater than 1')
+
     try:
 
         sz = JournalStandardizer(
             path_db=args.db,
             use_exact=args.use_exact,
             use_fuzzy=args.use_fuzzy,
-            mongo_uri_std_cits=args.mongo_uri_std_cits
+            fuzzy_engine=args.fuzzy_engine,
+            use_approximate=args.use_approximate,
+            max_distance=args.max_distance,
+            hot_reload=args.hot_reload,
+            database_backend=args.database_backend
         )
 
         art_meta = RestfulClient()
 
         if args.pid:
             logging.info('Running in one PID mode')
+            sz.open_persistence(args.mongo_uri_std_cits)
+
             document = art_meta.document(collection=args.col, code=args.pid)
 
             if document:
@@ -131,19 +225,35 @@ def main():
 
         else:
             logging.info('Running in many PIDs mode')
-            logging.info(get_execution_mode(sz.use_exact, sz.use_fuzzy))
+            logging.info(get_execution_mode(sz.use_exact, sz.use_fuzzy, sz.use_approximate))
 
             start_time = time()
 
-            if sz.use_exact or sz.use_fuzzy:
-                for document in art_meta.documents(collection=args.col,
+            if sz.use_exact or sz.use_fuzzy or sz.use_approximate:
+                # As bases são carregadas antes do fork, para que sejam compartilhadas pelos processos do pool
+                if args.workers > 1:
+                    sz.preload()
+
+                # O cliente MongoDB da persistência é criado depois dos processos do pool, para que não seja herdado
+                with ForkPool(normalize_batch(sz), args.workers) as pool:
+                    sz.open_persistence(args.mongo_uri_std_cits)
+
+                    documents = art_meta.documents(collection=args.col,
                                                    from_date=format_date(args.from_date),
-                                                   until_date=format_date(args.until_date)):
-                    logging.info('Normalizing cited references in %s ' % document.publisher_id)
-                    sz.standardize(document)
+                                                   until_date=format_date(args.until_date))
+
+                    # Os status atuais são consultados pelo processo principal, e os processos do pool apenas normalizam
+                    batches = ([(d, sz.get_citations_mongo_status(d)) for d in batch]
+                               for batch in chunks(documents, args.batch_size))
+
+                    for std_citations_list in pool.map(batches, not args.unordered):
+                        for std_citations in std_citations_list:
+                            if std_citations:
+                                sz.save_standardized_citations(std_citations)
 
             end_time = time()
             logging.info('Duration {0} seconds.'.format(end_time - start_time))
+            logging.info('Journal caches {0}'.format(sz.cache_stats()))
 
     except KeyboardInterrupt:
         print("Interrupt by user")
@@ -0,0 +1,112 @@
+import hashlib
+import math
+import os
+
+from utils.packed_keys import PackedKeySet
+
+
+BLOOM_FALSE_POSITIVE_RATE = float(os.environ.get('BLOOM_FALSE_POSITIVE_RATE', '0.01'))
+
+# Sufixo do nome das bases que guardam o filtro de Bloom de uma base de validação
+BLOOM_SUFFIX = '-bloom'
+
+MASK_64 = (1 << 64) - 1
+
+
+def bloom_name(name: str):
+    """
+    Obtém o nome da base que guarda o filtro de Bloom de uma base de validação.
+
+    :param name: nome da base de validação
+    :return: nome da base do filtro
+    """
+    return name + BLOOM_SUFFIX
+
+
+def stable_hash(key):
+    """
+    Calcula um hash de 64 bits que não depende do processo (ao contrário de hash(), que é aleatorizado para strings).
+
+    :param key: chave empacotada (int) ou chave ISSN-ANO-VOLUME (str)
+    :return: inteiro de 64 bits
+    """
+    if isinstance(key, int):
+        # splitmix64
+        x = (key + 0x9E3779B97F4A7C15) & MASK_64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK_64
+        return x ^ (x >> 31)
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom de chaves ISSN-ANO-VOLUME, no formato retornado por make_key.
+    Responde False apenas para chaves certamente ausentes; True indica que a chave pode estar presente.
+    As posições de cada chave são obtidas por hash duplo a partir de stable_hash.
+    """
+
+    def __init__(self, num_bits: int, num_hashes: int, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+        """
+        Cria um filtro vazio dimensionado para uma quantidade de chaves e uma taxa de falsos positivos.
+
+        :param capacity: quantidade de chaves
+        :param false_positive_rate: taxa de falsos positivos esperada
+        :return: BloomFilter
+        """
+        num_bits = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / max(capacity, 1) * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key):
+        h = stable_hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        h = stable_hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+
+        bits, num_bits = self.bits, self.num_bits
+        for i in range(self.num_hashes):
+            p = (h1 + i * h2) % num_bits
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __getstate__(self):
+        return self.num_bits, self.num_hashes, bytes(self.bits)
+
+    def __setstate__(self, state):
+        self.num_bits, self.num_hashes, bits = state
+        self.bits = bytearray(bits)
+
+
+def build_bloom_filter(base, false_positive_rate=BLOOM_FALSE_POSITIVE_RATE):
+    """
+    Constrói o filtro de Bloom de uma base de validação ISSN-ANO-VOLUME.
+
+    :param base: PackedKeySet ou set de chaves ISSN-ANO-VOLUME em formato de string
+    :param false_positive_rate: taxa de falsos positivos esperada
+    :return: BloomFilter
+    """
+    if not isinstance(base, PackedKeySet):
+        base = PackedKeySet(base)
+
+    bloom = BloomFilter.for_capacity(len(base), false_positive_rate)
+    for k in base.packed:
+        bloom.add(k)
+    for k in base.fallback:
+        bloom.add(k)
+    return bloom
@@ -0,0 +1,112 @@
+import sys
+
+from collections import OrderedDict
+
+
+# Memória estimada, em bytes, ocupada por um item no OrderedDict, além da chave e do valor
+ENTRY_OVERHEAD_BYTES = 104
+
+
+def approximate_size(obj):
+    """
+    Estima a memória ocupada por um objeto, incluindo os elementos de tuplas, listas, sets e dicionários (em um nível).
+
+    :param obj: objeto
+    :return: tamanho estimado em bytes
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        size += sum(sys.getsizeof(i) for i in obj)
+    elif isinstance(obj, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    return size
+
+
+class LRUCache:
+    """
+    Cache de tamanho limitado que descarta o item usado há mais tempo (least recently used).
+    Contabiliza acertos, faltas e descartes. Com maxsize igual a zero, nenhum item é guardado.
+    Se max_bytes for informado, os itens também são descartados enquanto a memória estimada das chaves e dos valores
+    guardados (ver approximate_size) exceder max_bytes.
+    """
+
+    def __init__(self, maxsize: int, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.data = OrderedDict()
+
+        self.bytes = 0
+        self.sizes = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def get(self, key, default=None):
+        """
+        Obtém o valor associado a key, marcando-o como usado recentemente.
+
+        :param key: chave procurada
+        :param default: valor retornado caso key não esteja no cache
+        :return: valor associado a key ou default
+        """
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Guarda value associado a key, descartando o item usado há mais tempo se o cache estiver cheio.
+
+        :param key: chave
+        :param value: valor
+        """
+        if self.maxsize <= 0:
+            return
+
+        self.data[key] = value
+        self.data.move_to_end(key)
+
+        if self.max_bytes is not None:
+            size = approximate_size(key) + approximate_size(value) + ENTRY_OVERHEAD_BYTES
+            self.bytes += size - self.sizes.get(key, 0)
+            self.sizes[key] = size
+
+        while len(self.data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            evicted_key, _ = self.data.popitem(last=False)
+            if self.max_bytes is not None:
+                self.bytes -= self.sizes.pop(evicted_key)
+            self.evictions += 1
+
+    def clear(self):
+        self.data.clear()
+        self.sizes.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """
+        Obtém os contadores do cache.
+
+        :return: dicionário com tamanho, tamanho máximo, acertos, faltas, descartes e taxa de acertos (e memória estimada
+        e máxima, se max_bytes for informado)
+        """
+        lookups = self.hits + self.misses
+        stats = {'size': len(self.data),
+                 'maxsize': self.maxsize,
+                 'hits': self.hits,
+                 'misses': self.misses,
+                 'evictions': self.evictions,
+                 'hit-ratio': self.hits / lookups if lookups else 0.0}
+
+        if self.max_bytes is not None:
+            stats.update({'bytes': self.bytes, 'max-bytes': self.max_bytes})
+        return stats
@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+
+from bson import json_util
+from datetime import datetime
+
+
+CHECKPOINT_INTERVAL = float(os.environ.get('CHECKPOINT_INTERVAL', '60'))
+
+# Leitura das datas gravadas em JSON sem fuso horário, como as lidas do MongoDB
+JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+
+class FileCheckpointStore:
+    """
+    Checkpoints gravados em um arquivo JSON local, um por chave de execução. O arquivo é substituído atomicamente a cada
+    gravação, para que uma interrupção durante a escrita não o corrompa.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json_util.loads(f.read(), json_options=JSON_OPTIONS)
+
+    def load(self, key: str):
+        return self._read().get(key)
+
+    def save(self, key: str, state: dict):
+        states = self._read()
+        states[key] = state
+
+        path_tmp = self.path + '.tmp'
+        with open(path_tmp, 'w') as f:
+            f.write(json_util.dumps(states))
+        os.replace(path_tmp, self.path)
+
+
+class MongoCheckpointStore:
+    """
+    Checkpoints gravados em uma coleção MongoDB, um documento por chave de execução.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self, key: str):
+        state = self.collection.find_one({'_id': key})
+        if state:
+            state.pop('_id')
+        return state
+
+    def save(self, key: str, state: dict):
+        self.collection.replace_one({'_id': key}, state, upsert=True)
+
+
+class Watermark:
+    """
+    Posição (processing_date, _id) do último documento lido tal que ele e todos os documentos anteriores, na ordem do
+    cursor, já tiveram suas referências citadas persistidas. Os lotes de documentos são numerados na ordem de leitura e
+    podem ser concluídos fora de ordem; a posição avança apenas sobre lotes concluídos consecutivos.
+    """
+
+    def __init__(self, position=None):
+        self.position = position
+        self.next_batch = 0
+        self.completed = {}
+
+    def complete(self, batch_number: int, position):
+        """
+        Registra a conclusão de um lote.
+
+        :param batch_number: número do lote, na ordem de leitura
+        :param position: posição (processing_date, _id) do último documento do lote
+        :return: True se a posição avançou
+        """
+        self.completed[batch_number] = position
+
+        advanced = False
+        while self.next_batch in self.completed:
+            self.position = self.completed.pop(self.next_batch)
+            self.next_batch += 1
+            advanced = True
+        return advanced
+
+
+class Checkpoint:
+    """
+    Grava periodicamente a marca d'água de uma execução, identificada por key, em um armazenamento de checkpoints.
+    """
+
+    def __init__(self, store, key: str, interval=CHECKPOINT_INTERVAL):
+        self.store = store
+        self.key = key
+        self.interval = interval
+        self.saved_at = time.perf_counter()
+        self.saved_position = None
+
+    def load(self):
+        """
+        Obtém a posição gravada no último checkpoint.
+
+        :return: tupla (processing_date, _id) ou None, se não houver checkpoint
+        """
+        state = self.store.load(self.key)
+        if state:
+            return state['processing_date'], state['document_id']
+
+    def save(self, position, force=False):
+        """
+        Grava a posição, se ela mudou desde a última gravação e se passaram interval segundos (ou se force for True).
+
+        :param position: tupla (processing_date, _id)
+        :param force: grava independentemente do intervalo
+        """
+        if position is None or position == self.saved_position:
+            return
+        if not force and time.perf_counter() - self.saved_at < self.interval:
+            return
+
+        processing_date, document_id = position
+        self.store.save(self.key, {'processing_date': processing_date,
+                                   'document_id': document_id,
+                                   'update-date': datetime.now()})
+        self.saved_at = time.perf_counter()
+        self.saved_position = position
+
+        logging.info('Checkpoint %s: processing_date %s, _id %s' % (self.key, processing_date, document_id))
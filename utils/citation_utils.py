@@ -11,21 +11,25 @@ def clean_author(author):
     c_author = ''
 
     if author:
-        initial = ''
-        lastname = ''
+        c_author = clean_author_name(author.get('surname', ''), author.get('given_names', ''))
 
-        fa_surname = preprocess_default(author.get('surname', ''))
-        fa_givennames = preprocess_default(author.get('given_names', ''))
+    return c_author.lower()
 
-        if fa_surname:
-            lastname = fa_surname.split(' ')[-1]
 
-        if fa_givennames:
-            initial = fa_givennames[0]
+def clean_author_name(surname, given_names):
+    initial = ''
+    lastname = ''
 
-        c_author = ' '.join([initial, lastname]).strip()
+    fa_surname = preprocess_default(surname)
+    fa_givennames = preprocess_default(given_names)
 
-    return c_author.lower()
+    if fa_surname:
+        lastname = fa_surname.split(' ')[-1]
+
+    if fa_givennames:
+        initial = fa_givennames[0]
+
+    return ' '.join([initial, lastname]).strip()
 
 
 def clean_end_page(first_page: str, end_page: str):
@@ -0,0 +1,499 @@
+import json
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import time
+
+from array import array
+from bisect import bisect_left
+from utils.packed_keys import key_to_str, make_key, pack_validation_bases, PackedKeySet
+from utils.sqlite_db import SQLITE_DB_MAGIC, SqliteDatabase, SqlitePackedTable, SqliteTable
+
+
+# Assinatura dos arquivos de bases de correção mapeáveis em memória
+MAPPED_DB_MAGIC = b'BCMMAP01'
+
+# Assinatura dos arquivos de bases de correção serializadas com pickle base a base (carga sob demanda)
+LAZY_DB_MAGIC = b'BCLAZY01'
+
+# Metadados persistidos no cabeçalho do arquivo
+METADATA_KEYS = ['version', 'creation-date', 'parent-version']
+
+
+def rss_bytes():
+    """
+    Obtém a memória residente (RSS) do processo atual.
+
+    :return: RSS em bytes (0, caso /proc não esteja disponível)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def log_load(name: str, started_at: float, rss_before: int):
+    """
+    Registra o tempo e a memória residente atribuíveis à carga de uma base ou à construção de um índice.
+
+    :param name: nome da base ou do índice
+    :param started_at: instante de início da carga
+    :param rss_before: RSS antes da carga, em bytes
+    """
+    logging.info('Loaded %s in %.2fs (RSS %+.1f MB)' % (name, time.time() - started_at, (rss_bytes() - rss_before) / 2 ** 20))
+
+
+def _write_header(f, header: dict):
+    """
+    Escreve o cabeçalho JSON ao final do arquivo e registra sua posição logo após a assinatura.
+
+    :param f: arquivo binário aberto para escrita, posicionado após as bases
+    :param header: cabeçalho
+    """
+    header_position = f.tell()
+    f.write(json.dumps(header).encode('utf-8'))
+
+    f.seek(len(MAPPED_DB_MAGIC))
+    f.write(struct.pack('<Q', header_position))
+
+
+def _read_header(f):
+    """
+    Lê o cabeçalho JSON de um arquivo de bases de correção.
+
+    :param f: arquivo binário aberto para leitura (ou mmap)
+    :return: cabeçalho
+    """
+    f.seek(len(MAPPED_DB_MAGIC))
+    header_position = struct.unpack('<Q', f.read(8))[0]
+    f.seek(header_position)
+    return json.loads(f.read().decode('utf-8'))
+
+
+def _write_offsets(f, offsets):
+    """
+    Escreve um array de deslocamentos de 64 bits, alinhado em 8 bytes.
+
+    :param f: arquivo binário aberto para escrita
+    :param offsets: lista de deslocamentos
+    :return: posição do array no arquivo
+    """
+    f.write(b'\0' * (-f.tell() % 8))
+    position = f.tell()
+    array('Q', offsets).tofile(f)
+    return position
+
+
+def _write_blob(f, chunks):
+    """
+    Escreve uma sequência de trechos de bytes de forma contígua.
+
+    :param f: arquivo binário aberto para escrita
+    :param chunks: trechos de bytes
+    :return: tupla (posição do bloco no arquivo, deslocamentos de início de cada trecho e do fim do bloco)
+    """
+    position = f.tell()
+    offsets = [0]
+    for c in chunks:
+        f.write(c)
+        offsets.append(offsets[-1] + len(c))
+    return position, offsets
+
+
+def write_mapped_table(f, base):
+    """
+    Escreve uma base como tabela ordenada de chaves (e valores, se a base for um dicionário).
+
+    :param f: arquivo binário aberto para escrita
+    :param base: dicionário ou set cujas chaves são strings, ou PackedKeySet
+    :return: metadados da tabela (tipo, quantidade de itens e posições dos blocos no arquivo)
+    """
+    if isinstance(base, PackedKeySet):
+        f.write(b'\0' * (-f.tell() % 8))
+        meta = {'kind': 'packed', 'count': len(base.packed), 'packed': f.tell()}
+        base.packed.tofile(f)
+        meta['fallback'] = write_mapped_table(f, base.fallback)
+        return meta
+
+    keys = sorted(base)
+    meta = {'kind': 'map' if isinstance(base, dict) else 'set', 'count': len(keys)}
+
+    meta['keys'], key_offsets = _write_blob(f, [k.encode('utf-8') for k in keys])
+    meta['key_offsets'] = _write_offsets(f, key_offsets)
+
+    if meta['kind'] == 'map':
+        meta['values'], value_offsets = _write_blob(f, [pickle.dumps(base[k]) for k in keys])
+        meta['value_offsets'] = _write_offsets(f, value_offsets)
+
+    return meta
+
+
+def write_mapped_database(db_data: dict, path_db: str):
+    """
+    Persiste as bases de correção em formato mapeável em memória.
+
+    O arquivo é composto pela assinatura MAPPED_DB_MAGIC, pela posição do cabeçalho (inteiro de 64 bits), pelas tabelas
+    e, ao final, pelo cabeçalho em JSON, que contém os metadados das bases e as posições de cada tabela. Cada tabela
+    guarda as chaves ordenadas e contíguas, um array com os deslocamentos de cada chave e, no caso de dicionários, os
+    valores serializados com pickle e seus deslocamentos.
+
+    :param db_data: dicionário de bases de correção
+    :param path_db: nome do arquivo a ser persistido
+    """
+    header = {k: db_data[k] for k in METADATA_KEYS if k in db_data}
+    header['tables'] = {}
+
+    with open(path_db, 'wb') as f:
+        f.write(MAPPED_DB_MAGIC)
+        f.write(struct.pack('<Q', 0))
+
+        for name, base in db_data.items():
+            if name not in METADATA_KEYS:
+                header['tables'][name] = write_mapped_table(f, base)
+
+        _write_header(f, header)
+
+
+class PickledBase:
+    """
+    Base de correção já serializada com pickle, copiada sem ser desserializada ao persistir no formato de carga sob
+    demanda.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def load(self):
+        return pickle.loads(self.data)
+
+
+def write_lazy_database(db_data: dict, path_db: str):
+    """
+    Persiste as bases de correção serializando cada base separadamente com pickle, para que sejam carregadas sob
+    demanda.
+
+    O arquivo é composto pela assinatura LAZY_DB_MAGIC, pela posição do cabeçalho (inteiro de 64 bits), pelas bases
+    serializadas e, ao final, pelo cabeçalho em JSON, que contém os metadados e a posição e o tamanho de cada base.
+
+    :param db_data: dicionário de bases de correção (bases em PickledBase são copiadas como estão)
+    :param path_db: nome do arquivo a ser persistido
+    """
+    header = {k: db_data[k] for k in METADATA_KEYS if k in db_data}
+    header['bases'] = {}
+
+    with open(path_db, 'wb') as f:
+        f.write(LAZY_DB_MAGIC)
+        f.write(struct.pack('<Q', 0))
+
+        for name, base in db_data.items():
+            if name not in METADATA_KEYS:
+                position = f.tell()
+                if isinstance(base, PickledBase):
+                    f.write(base.data)
+                else:
+                    pickle.dump(base, f, protocol=pickle.HIGHEST_PROTOCOL)
+                header['bases'][name] = [position, f.tell() - position]
+
+        _write_header(f, header)
+
+
+def write_lazy_database_from_sections(metadata: dict, sections: list, path_db: str):
+    """
+    Persiste as bases de correção no formato de carga sob demanda a partir de bases já serializadas com pickle em
+    arquivos separados, copiando-as sem desserializá-las.
+
+    :param metadata: metadados (versão, data de criação e versão de origem)
+    :param sections: lista de pares (nome da base, caminho do arquivo com a base serializada)
+    :param path_db: nome do arquivo a ser persistido
+    """
+    header = {k: metadata[k] for k in METADATA_KEYS if k in metadata}
+    header['bases'] = {}
+
+    with open(path_db, 'wb') as f:
+        f.write(LAZY_DB_MAGIC)
+        f.write(struct.pack('<Q', 0))
+
+        for name, path_section in sections:
+            position = f.tell()
+            with open(path_section, 'rb') as fs:
+                shutil.copyfileobj(fs, f)
+            header['bases'][name] = [position, f.tell() - position]
+
+        _write_header(f, header)
+
+
+class MappedTable:
+    """
+    Base de correção lida diretamente das páginas mapeadas do arquivo.
+    As chaves são localizadas por busca binária e os valores são desserializados a cada consulta.
+    """
+
+    def __init__(self, mapped_file, meta: dict):
+        self.mapped_file = mapped_file
+        self.kind = meta['kind']
+        self.count = meta['count']
+
+        buffer = memoryview(mapped_file)
+
+        self.keys_position = meta['keys']
+        self.key_offsets = buffer[meta['key_offsets']:meta['key_offsets'] + 8 * (self.count + 1)].cast('Q')
+
+        if self.kind == 'map':
+            self.values_position = meta['values']
+            self.value_offsets = buffer[meta['value_offsets']:meta['value_offsets'] + 8 * (self.count + 1)].cast('Q')
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, i: int):
+        return self.mapped_file[self.keys_position + self.key_offsets[i]:self.keys_position + self.key_offsets[i + 1]]
+
+    def _value(self, i: int):
+        start = self.values_position + self.value_offsets[i]
+        end = self.values_position + self.value_offsets[i + 1]
+        return pickle.loads(self.mapped_file[start:end])
+
+    def find(self, key: str):
+        """
+        Localiza uma chave por busca binária.
+
+        :param key: chave procurada
+        :return: posição da chave na tabela ou -1, caso não exista
+        """
+        encoded_key = key.encode('utf-8')
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < encoded_key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.count and self._key(low) == encoded_key:
+            return low
+        return -1
+
+    def __contains__(self, key):
+        if isinstance(key, int):
+            key = key_to_str(key)
+        return isinstance(key, str) and self.find(key) >= 0
+
+    def __getitem__(self, key):
+        i = self.find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value(i)
+
+    def get(self, key, default=None):
+        i = self.find(key)
+        if i < 0:
+            return default
+        return self._value(i)
+
+    def keys(self):
+        for i in range(self.count):
+            yield self._key(i).decode('utf-8')
+
+    def __iter__(self):
+        return self.keys()
+
+    def items(self):
+        for i in range(self.count):
+            yield self._key(i).decode('utf-8'), self._value(i)
+
+
+class MappedPackedTable:
+    """
+    Base de validação ISSN-ANO-VOLUME empacotada (ver utils.packed_keys), lida diretamente das páginas mapeadas.
+    """
+
+    def __init__(self, mapped_file, meta: dict):
+        self.packed = memoryview(mapped_file)[meta['packed']:meta['packed'] + 8 * meta['count']].cast('q')
+        self.fallback = MappedTable(mapped_file, meta['fallback'])
+
+    def __len__(self):
+        return len(self.packed) + len(self.fallback)
+
+    def __contains__(self, key):
+        if isinstance(key, int):
+            i = bisect_left(self.packed, key)
+            return i < len(self.packed) and self.packed[i] == key
+
+        packed_key = make_key(*key.split('-', 2)) if key.count('-') == 2 else key
+        if isinstance(packed_key, int):
+            return packed_key in self
+
+        return key in self.fallback
+
+    def __iter__(self):
+        for k in self.packed:
+            yield key_to_str(k)
+        yield from self.fallback
+
+
+class MappedDatabase:
+    """
+    Bases de correção mapeadas em memória (mmap).
+    As páginas do arquivo são carregadas sob demanda pelo sistema operacional e compartilhadas entre processos.
+    """
+
+    def __init__(self, path_db: str):
+        with open(path_db, 'rb') as f:
+            self.mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.header = _read_header(self.mapped_file)
+
+        self.tables = {}
+
+    def __contains__(self, name):
+        return name in self.header['tables'] or name in self.header
+
+    def __getitem__(self, name):
+        if name not in self.header['tables']:
+            return self.header[name]
+
+        if name not in self.tables:
+            meta = self.header['tables'][name]
+            if meta['kind'] == 'packed':
+                self.tables[name] = MappedPackedTable(self.mapped_file, meta)
+            else:
+                self.tables[name] = MappedTable(self.mapped_file, meta)
+        return self.tables[name]
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def keys(self):
+        return [k for k in self.header if k != 'tables'] + list(self.header['tables'])
+
+
+class LazyDatabase:
+    """
+    Bases de correção desserializadas sob demanda, no primeiro acesso a cada base.
+    """
+
+    def __init__(self, path_db: str):
+        self.path_db = path_db
+
+        with open(path_db, 'rb') as f:
+            self.header = _read_header(f)
+
+        self.bases = {}
+
+    def __contains__(self, name):
+        return name in self.header['bases'] or name in self.header
+
+    def __getitem__(self, name):
+        if name not in self.header['bases']:
+            return self.header[name]
+
+        if name not in self.bases:
+            started_at, rss_before = time.time(), rss_bytes()
+
+            position, size = self.header['bases'][name]
+            with open(self.path_db, 'rb') as f:
+                f.seek(position)
+                self.bases[name] = pack_validation_bases({name: pickle.loads(f.read(size))})[name]
+
+            log_load(name, started_at, rss_before)
+        return self.bases[name]
+
+    def pickled(self, name):
+        """
+        Obtém uma base ainda serializada, sem desserializá-la.
+
+        :param name: nome da base
+        :return: PickledBase
+        """
+        position, size = self.header['bases'][name]
+        with open(self.path_db, 'rb') as f:
+            f.seek(position)
+            return PickledBase(f.read(size))
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def keys(self):
+        return [k for k in self.header if k != 'bases'] + list(self.header['bases'])
+
+
+def materialize(base):
+    """
+    Converte uma base de correção em objetos Python modificáveis (dicionário, set ou PackedKeySet).
+
+    :param base: base de correção, possivelmente mapeada em memória ou ainda serializada
+    :return: base modificável
+    """
+    if isinstance(base, PickledBase):
+        return base.load()
+    elif isinstance(base, MappedPackedTable):
+        return PackedKeySet.from_sorted(array('q', base.packed), set(base.fallback))
+    elif isinstance(base, MappedTable):
+        if base.kind == 'map':
+            return dict(base.items())
+        return set(base.keys())
+    elif isinstance(base, SqlitePackedTable):
+        return PackedKeySet.from_sorted(array('q', base.packed_keys()), set(base.fallback_keys()))
+    elif isinstance(base, SqliteTable):
+        if base.kind == 'set':
+            return set(base.keys())
+        return dict(base.items())
+    return base
+
+
+def get_database_format(path_db: str):
+    """
+    Identifica o formato de um arquivo de bases de correção a partir de sua assinatura.
+
+    :param path_db: caminho do arquivo
+    :return: formato do arquivo ['mmap', 'lazy', 'sqlite', 'pickle']
+    """
+    with open(path_db, 'rb') as f:
+        magic = f.read(len(SQLITE_DB_MAGIC))
+
+    if magic.startswith(MAPPED_DB_MAGIC):
+        return 'mmap'
+    elif magic.startswith(LAZY_DB_MAGIC):
+        return 'lazy'
+    elif magic == SQLITE_DB_MAGIC:
+        return 'sqlite'
+    return 'pickle'
+
+
+def open_database(path_db: str, db_format='auto'):
+    """
+    Abre um arquivo de bases de correção, conforme o formato: mapeando-o em memória, preparando a carga sob demanda de
+    cada base, conectando-se ao arquivo SQLite ou desserializando-o integralmente com pickle.
+    Bases de validação ISSN-ANO-VOLUME de arquivos pickle antigos (sets de strings) são convertidas para PackedKeySet.
+
+    :param path_db: caminho do arquivo
+    :param db_format: formato esperado do arquivo ['auto', 'pickle', 'lazy', 'mmap', 'sqlite']; auto o identifica
+    :return: bases de correção (MappedDatabase, LazyDatabase, SqliteDatabase ou dicionário)
+    """
+    file_format = get_database_format(path_db)
+
+    if db_format != 'auto' and db_format != file_format:
+        raise ValueError('File %s is in the %s format, not %s' % (path_db, file_format, db_format))
+
+    if file_format == 'mmap':
+        return MappedDatabase(path_db)
+    elif file_format == 'lazy':
+        return LazyDatabase(path_db)
+    elif file_format == 'sqlite':
+        return SqliteDatabase(path_db)
+
+    started_at, rss_before = time.time(), rss_bytes()
+    with open(path_db, 'rb') as f:
+        db = pack_validation_bases(pickle.load(f))
+    log_load('all bases', started_at, rss_before)
+
+    return db
@@ -0,0 +1,130 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+from utils.correction_db import LazyDatabase
+
+
+RELOAD_CHECK_INTERVAL = float(os.environ.get('RELOAD_CHECK_INTERVAL', '10'))
+
+
+def file_signature(path: str):
+    """
+    Obtém uma assinatura do arquivo que muda quando ele é reescrito ou substituído.
+
+    :param path: caminho do arquivo
+    :return: tupla (inode, tamanho, data de modificação em ns) ou None, caso o arquivo não exista
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def loaded_bases(db):
+    """
+    Obtém os nomes das bases já carregadas em memória.
+
+    :param db: bases de correção
+    :return: lista de nomes de bases
+    """
+    if isinstance(db, LazyDatabase):
+        return list(db.bases)
+    return []
+
+
+class DatabaseReloader:
+    """
+    Carrega uma nova versão da base de correção em segundo plano, sem interromper a normalização.
+
+    A carga é solicitada por sinal (SIGHUP) ou pela alteração do arquivo, verificada a cada check_interval segundos
+    em poll. A nova versão é preparada em uma thread pela função prepare e entregue por poll, que deve ser chamada
+    entre referências citadas para que a troca ocorra em um ponto seguro.
+    """
+
+    def __init__(self, path_db: str, prepare, watch=True, check_interval=RELOAD_CHECK_INTERVAL):
+        self.path_db = path_db
+        self.prepare = prepare
+        self.watch = watch
+        self.check_interval = check_interval
+
+        self.signature = file_signature(path_db)
+        self.last_seen_signature = self.signature
+        self.last_check = time.time()
+
+        self.requested = False
+        self.pending = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def install_signal_handler(self, signum=signal.SIGHUP):
+        """
+        Solicita a carga de uma nova versão quando o processo receber o sinal signum.
+
+        :param signum: número do sinal
+        """
+        signal.signal(signum, self._handle_signal)
+
+    def _handle_signal(self, signum, frame):
+        logging.info('Received signal %d, reloading %s' % (signum, self.path_db))
+        self.requested = True
+
+    def request(self):
+        """
+        Inicia a carga da versão atual do arquivo em segundo plano, caso não haja outra carga em andamento.
+        """
+        self.requested = False
+
+        if self.thread and self.thread.is_alive():
+            return
+
+        self.signature = file_signature(self.path_db)
+        self.thread = threading.Thread(target=self._load, name='database-reloader', daemon=True)
+        self.thread.start()
+
+    def _load(self):
+        started_at = time.time()
+        try:
+            state = self.prepare(self.path_db)
+        except Exception as e:
+            logging.error('Error reloading %s: %s' % (self.path_db, e))
+            return
+
+        with self.lock:
+            self.pending = state
+        logging.info('Reloaded %s in %.2fs' % (self.path_db, time.time() - started_at))
+
+    def _changed(self):
+        """
+        Verifica se o arquivo foi alterado desde a última carga e se permaneceu inalterado desde a última verificação,
+        evitando carregar um arquivo ainda em escrita.
+        """
+        now = time.time()
+        if now - self.last_check < self.check_interval:
+            return False
+        self.last_check = now
+
+        signature = file_signature(self.path_db)
+        stable = signature == self.last_seen_signature
+        self.last_seen_signature = signature
+
+        return signature is not None and stable and signature != self.signature
+
+    def poll(self):
+        """
+        Inicia uma carga solicitada ou decorrente de alteração do arquivo e entrega a versão já preparada, se houver.
+
+        :return: estado preparado por prepare ou None
+        """
+        if self.requested or (self.watch and self._changed()):
+            self.request()
+
+        if self.pending is None:
+            return
+
+        with self.lock:
+            state, self.pending = self.pending, None
+        return state
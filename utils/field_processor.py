@@ -1,7 +1,13 @@
-import html
 import re
 
-from utils.string_processor import remove_double_spaces, alpha_num_space, remove_accents, remove_invalid_chars
+from utils.string_processor import (
+    remove_double_spaces,
+    alpha_num_space,
+    remove_accents,
+    apply_distinct,
+    translate_journal_title,
+    make_alpha_num_space_table
+)
 
 
 PATTERN_PARENTHESIS = re.compile(r'[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*\([-a-zA-ZÀ-ÖØ-öø-ÿ|\W|0-9]*\)[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*', re.UNICODE)
@@ -10,6 +16,10 @@ PATTERN_YEAR = re.compile(r'\d{4}')
 PATTERN_ISSUE = re.compile(r'\d+')
 PATTERN_VOLUME = re.compile(r'\d+')
 SPECIAL_WORDS = ['IMPRESSO', 'IMPRESS', 'PRINTED', 'ONLINE', 'CDROM', 'PRINT', 'ELECTRONIC', 'ELETRONICO']
+PATTERN_SPECIAL_WORDS = re.compile('|'.join(SPECIAL_WORDS))
+
+TABLE_JOURNAL_TITLE_UPPER = make_alpha_num_space_table(include_special_chars=True, case='upper')
+TABLE_JOURNAL_TITLE_LOWER = make_alpha_num_space_table(include_special_chars=True, case='lower')
 
 
 def preprocess_publication_date(text):
@@ -65,21 +75,61 @@ def preprocess_doi(text):
 
 
 def preprocess_journal_title(text, discard_invalid_chars=False, toggle_upper=False):
-    text = html.unescape(text)
+    table = TABLE_JOURNAL_TITLE_UPPER if toggle_upper else TABLE_JOURNAL_TITLE_LOWER
+    return translate_journal_title(text, SPECIAL_WORDS, PATTERN_SPECIAL_WORDS, table, discard_invalid_chars, PATTERN_PARENTHESIS)
+
+
+def preprocess_publication_date_batch(texts):
+    """
+    Aplica preprocess_publication_date uma vez a cada valor distinto de uma lista.
+    :param texts: lista de datas de publicação
+    :return: lista de anos, alinhada com texts
+    """
+    return apply_distinct(preprocess_publication_date, texts)
+
+
+def preprocess_default_batch(texts):
+    """
+    Aplica preprocess_default uma vez a cada valor distinto de uma lista.
+    :param texts: lista de strings a serem tratadas
+    :return: lista de strings tratadas, alinhada com texts
+    """
+    return apply_distinct(preprocess_default, texts)
+
 
-    if discard_invalid_chars:
-        text = remove_invalid_chars(text)
+def preprocess_issue_batch(texts):
+    """
+    Aplica preprocess_issue uma vez a cada valor distinto de uma lista.
+    :param texts: lista de números
+    :return: lista de números tratados, alinhada com texts
+    """
+    return apply_distinct(preprocess_issue, texts)
+
+
+def preprocess_volume_batch(texts):
+    """
+    Aplica preprocess_volume uma vez a cada valor distinto de uma lista.
+    :param texts: lista de volumes
+    :return: lista de volumes tratados, alinhada com texts
+    """
+    return apply_distinct(preprocess_volume, texts)
 
-    parenthesis_search = re.search(PATTERN_PARENTHESIS, text)
-    while parenthesis_search is not None:
-        text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
-        parenthesis_search = re.search(PATTERN_PARENTHESIS, text)
 
-    for sw in SPECIAL_WORDS:
-        text = text.replace(sw, '')
-    cleaned_text = remove_double_spaces(alpha_num_space(remove_accents(text), include_special_chars=True))
+def preprocess_doi_batch(texts):
+    """
+    Aplica preprocess_doi uma vez a cada valor distinto de uma lista.
+    :param texts: lista de caracteres que representam códigos DOI
+    :return: lista de códigos DOI tratados, alinhada com texts
+    """
+    return apply_distinct(preprocess_doi, texts)
 
-    if toggle_upper:
-        return cleaned_text.upper()
 
-    return cleaned_text.lower()
+def preprocess_journal_title_batch(texts, discard_invalid_chars=False, toggle_upper=False):
+    """
+    Aplica preprocess_journal_title uma vez a cada título distinto de uma lista.
+    :param texts: lista de títulos de periódicos
+    :param discard_invalid_chars: booleano que indica se caracteres inválidos devem ser removidos
+    :param toggle_upper: booleano que indica se o título tratado deve estar em caixa alta (ou, caso contrário, baixa)
+    :return: lista de títulos tratados, alinhada com texts
+    """
+    return apply_distinct(preprocess_journal_title, texts, discard_invalid_chars, toggle_upper)
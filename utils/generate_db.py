@@ -1,10 +1,42 @@
 import argparse
 import csv
 import logging
+import os
 import pickle
+import shutil
+import tempfile
 import textwrap
+import time
 
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from utils.bloom_filter import bloom_name, build_bloom_filter
+from utils.correction_db import (LazyDatabase, materialize, METADATA_KEYS, open_database, write_lazy_database,
+                                 write_lazy_database_from_sections, write_mapped_database)
+from utils.packed_keys import make_key, PACKED_BASES, PackedKeySetBuilder
+from utils.sqlite_db import write_sqlite_database
+from utils.volume_table import build_inferred_keys
+
+
+DB_FORMATS = ['lazy', 'pickle', 'mmap', 'sqlite']
+
+# Formatos cujas bases de validação são acompanhadas de filtros de Bloom. Nos demais, a busca binária nas chaves em
+# memória (ou mapeadas) é mais rápida que a consulta ao filtro
+BLOOM_DB_FORMATS = ['sqlite']
+
+# Ordem das bases no arquivo gerado
+DB_NAMES = [
+    'issnl-to-data',
+    'issn-to-issnl',
+    'title-to-issnl',
+    'issn-year-volume',
+    'title-year-volume',
+    'issn-year-volume-lr',
+    'issn-year-volume-lr-ml1',
+    'issn-to-equation',
+    'issn-year-volume-inferred'
+]
 
 
 def clean_issn(issn: str):
@@ -20,20 +52,38 @@ def clean_issn(issn: str):
         return issn
 
 
-def get_db_year_volume(path_db_year_volume, sep='|'):
+def count_rows(rows, stats=None):
+    """
+    Repassa as linhas de um leitor CSV, contabilizando-as.
+
+    :param rows: linhas do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas na chave rows
+    :return: gerador de linhas
+    """
+    if stats is None:
+        stats = {}
+    stats['rows'] = 0
+
+    for row in rows:
+        stats['rows'] += 1
+        yield row
+
+
+def get_db_year_volume(path_db_year_volume, sep='|', stats=None):
     """
     Extrai dicionário de base de validação ISSN-ANO-VOLUME e TITULO-ANO-VOLUME.
 
     :param path_db_year_volume: caminho do arquivo da tabela de dados ISSN-TITULO-ANO-VOLUME
     :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
     :return: tupla (base de validação ISSN-ANO-VOLUME, TITLE-ANO-VOLUME)
     """
-    issn_year_volume = set()
+    issn_year_volume = PackedKeySetBuilder()
     title_year_volume = set()
 
     with open(path_db_year_volume) as f:
         csv_reader = csv.DictReader(f, delimiter=sep)
-        for i in csv_reader:
+        for i in count_rows(csv_reader, stats):
             issn = clean_issn(i.get('ISSN'))
             title = i.get('TITLE')
 
@@ -43,51 +93,53 @@ def get_db_year_volume(path_db_year_volume, sep='|'):
                 year = i.get('YEAR')
                 volume = i.get('VOLUME')
 
-                issn_year_volume.add('-'.join([issn, year, volume]))
+                issn_year_volume.add(issn, year, volume)
 
                 if not title:
                     logging.info('TITLE empty: %s' % i)
                 else:
                     title_year_volume.add('-'.join([title, year, volume]))
 
-    return issn_year_volume, title_year_volume
+    return issn_year_volume.build(), title_year_volume
 
 
-def get_db_year_volume_linear_regression(path_db_year_volume_linear_regression, sep='|'):
+def get_db_year_volume_linear_regression(path_db_year_volume_linear_regression, sep='|', stats=None):
     """
     Extrai dicionário de base de validação ISSN-ANO-VOLUME e ISSN-ANO-VOLUME flexibilizada.
 
     :param path_db_year_volume: caminho do arquivo da tabela de dados ISSN-ANO-VOLUME
     :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
     :return: tupla (base de validação ISSN-ANO-VOLUME LR, ISSN-ANO-VOLUME LR ML1)
     """
-    issn_year_volume = set()
-    issn_year_volume_more_or_less_one = set()
+    issn_year_volume = PackedKeySetBuilder()
+    issn_year_volume_more_or_less_one = PackedKeySetBuilder()
 
     with open(path_db_year_volume_linear_regression) as f:
         csv_reader = csv.DictReader(f, delimiter=sep)
-        for i in csv_reader:
+        for i in count_rows(csv_reader, stats):
             issn = i.get('ISSN')
             year = i.get('YEAR')
 
             rounded_predicted_vol_ideal = i.get('ROUNDED PV')
-            issn_year_volume.add('-'.join([issn, year, rounded_predicted_vol_ideal]))
+            issn_year_volume.add(issn, year, rounded_predicted_vol_ideal)
 
             rounded_predicted_vol_minus_one = i.get('ROUNDED PV - 1')
-            issn_year_volume_more_or_less_one.add('-'.join([issn, year, rounded_predicted_vol_minus_one]))
+            issn_year_volume_more_or_less_one.add(issn, year, rounded_predicted_vol_minus_one)
 
             rounded_predicted_vol_plus_one = i.get('ROUNDED PV + 1')
-            issn_year_volume_more_or_less_one.add('-'.join([issn, year, rounded_predicted_vol_plus_one]))
+            issn_year_volume_more_or_less_one.add(issn, year, rounded_predicted_vol_plus_one)
 
-    return issn_year_volume, issn_year_volume_more_or_less_one
+    return issn_year_volume.build(), issn_year_volume_more_or_less_one.build()
 
 
-def get_db_issnl_and_db_title(path_db_issnl, sep='|'):
+def get_db_issnl_and_db_title(path_db_issnl, sep='|', stats=None):
     """
     Extrai dicionário de base de correção ISSN-L-TO-DATA, TITLE-TO-ISSN-L e ISSN-TO-ISSN-L.
 
     :param path_db_year_volume: caminho do arquivo da tabela de dados ISSN-L-ATRIBUTOS
     :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
     :return: tupla (base de correção ISSN-L-TO-DATA, TITLE-TO-ISSN-L e ISSN-TO-ISSN-L)
     """
     issnl_to_data = {}
@@ -96,49 +148,99 @@ def get_db_issnl_and_db_title(path_db_issnl, sep='|'):
 
     with open(path_db_issnl) as f:
         csv_reader = csv.DictReader(f, delimiter=sep)
-        for i in csv_reader:
-            issnl = i.get('ISSNL', '')
-            main_title = i.get('MAIN_TITLE', '').split('#')
-            main_abbrev_title = i.get('MAIN_ABBREV_TITLE', '').split('#')
-            issns = i.get('ISSNS', '').split('#')
-            alternative_titles = i.get('TITLES', '').split('#')
-
-            if issnl != '' and issnl not in issnl_to_data:
-                issnl_to_data[issnl] = {
-                    'main-title': main_title,
-                    'main-abbrev-title': main_abbrev_title,
-                    'issns': issns,
-                    'alternative-titles': alternative_titles
-                }
-
-                for ti in set(main_title + main_abbrev_title + alternative_titles):
-                    if ti not in title_to_issnl:
-                        title_to_issnl[ti] = set()
-                    title_to_issnl[ti].add(issnl)
-            else:
-                logging.info('ISSN-L %s is already in the list' % issnl)
-
-            for j in issns:
-                if j not in issn_to_issnl:
-                    issn_to_issnl[j] = issnl
-                else:
-                    logging.info('ISSN %s is associated with %s (beyond %s)' % (j, issnl, issn_to_issnl[j]))
+        for i in count_rows(csv_reader, stats):
+            add_issnl_row(i, issnl_to_data, title_to_issnl, issn_to_issnl)
 
     return issnl_to_data, title_to_issnl, issn_to_issnl
 
 
-def get_equations(path_equations, sep='|'):
+def add_issnl_row(row: dict, issnl_to_data: dict, title_to_issnl: dict, issn_to_issnl: dict):
+    """
+    Adiciona uma linha da tabela de dados ISSN-L-ATRIBUTOS às bases ISSN-L-TO-DATA, TITLE-TO-ISSN-L e ISSN-TO-ISSN-L.
+
+    :param row: linha da tabela de dados ISSN-L-ATRIBUTOS
+    :param issnl_to_data: base de correção ISSN-L-TO-DATA
+    :param title_to_issnl: base de correção TITLE-TO-ISSN-L
+    :param issn_to_issnl: base de correção ISSN-TO-ISSN-L
+    """
+    issnl = row.get('ISSNL', '')
+    main_title = row.get('MAIN_TITLE', '').split('#')
+    main_abbrev_title = row.get('MAIN_ABBREV_TITLE', '').split('#')
+    issns = row.get('ISSNS', '').split('#')
+    alternative_titles = row.get('TITLES', '').split('#')
+
+    if issnl != '' and issnl not in issnl_to_data:
+        issnl_to_data[issnl] = {
+            'main-title': main_title,
+            'main-abbrev-title': main_abbrev_title,
+            'issns': issns,
+            'alternative-titles': alternative_titles
+        }
+
+        for ti in set(main_title + main_abbrev_title + alternative_titles):
+            if ti not in title_to_issnl:
+                title_to_issnl[ti] = set()
+            title_to_issnl[ti].add(issnl)
+    else:
+        logging.info('ISSN-L %s is already in the list' % issnl)
+
+    for j in issns:
+        if j not in issn_to_issnl:
+            issn_to_issnl[j] = issnl
+        else:
+            logging.info('ISSN %s is associated with %s (beyond %s)' % (j, issnl, issn_to_issnl[j]))
+
+
+def remove_issnl(issnl: str, issnl_to_data: dict, title_to_issnl: dict, issn_to_issnl: dict):
+    """
+    Remove um ISSN-L das bases ISSN-L-TO-DATA, TITLE-TO-ISSN-L e ISSN-TO-ISSN-L.
+    Títulos que deixam de estar associados a algum ISSN-L são removidos. ISSNs que estavam associados ao ISSN-L passam
+    ao primeiro ISSN-L restante que os contém, como ocorreria ao gerar a base novamente sem ele.
+
+    :param issnl: ISSN-L
+    :param issnl_to_data: base de correção ISSN-L-TO-DATA
+    :param title_to_issnl: base de correção TITLE-TO-ISSN-L
+    :param issn_to_issnl: base de correção ISSN-TO-ISSN-L
+    """
+    data = issnl_to_data.pop(issnl, None)
+    if not data:
+        logging.info('ISSN-L %s is not in the list' % issnl)
+        return
+
+    for ti in set(data['main-title'] + data['main-abbrev-title'] + data['alternative-titles']):
+        issnls = title_to_issnl.get(ti)
+        if issnls is not None:
+            issnls.discard(issnl)
+            if not issnls:
+                del title_to_issnl[ti]
+
+    orphan_issns = set()
+    for j in data['issns']:
+        if issn_to_issnl.get(j) == issnl:
+            del issn_to_issnl[j]
+            orphan_issns.add(j)
+
+    for other_issnl, other_data in issnl_to_data.items():
+        if not orphan_issns:
+            break
+        for j in orphan_issns.intersection(other_data['issns']):
+            issn_to_issnl[j] = other_issnl
+            orphan_issns.discard(j)
+
+
+def get_equations(path_equations, sep='|', stats=None):
     """
     Extrai dicionário de base de predição de volume ISSN-TO-EQUATION.
 
     :param path_equations: caminho do arquivo da tabela de equações
     :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
     :return: dicionário ISSN-TO-EQUATION
     """
     issn_to_equation = {}
     with open(path_equations) as f:
         csv_reader = csv.DictReader(f, delimiter=sep)
-        for i in csv_reader:
+        for i in count_rows(csv_reader, stats):
             issn = i.get('ISSN')
             a = float(i.get('a'))
             b = float(i.get('b'))
@@ -149,47 +251,437 @@ def get_equations(path_equations, sep='|'):
     return issn_to_equation
 
 
-def save(db_data, path_db):
+# Operações aceitas na coluna OPERATION dos arquivos de alterações (modo delta)
+DELTA_OPERATIONS = ['add', 'remove', 'change']
+
+
+def get_operation(row: dict):
+    """
+    Obtém a operação de uma linha de um arquivo de alterações. Linhas sem a coluna OPERATION são tratadas como adições.
+
+    :param row: linha do arquivo de alterações
+    :return: operação ['add', 'remove', 'change'] ou None, caso seja inválida
+    """
+    operation = (row.pop('OPERATION', None) or 'add').strip().lower()
+    if operation not in DELTA_OPERATIONS:
+        logging.error('Invalid operation: %s' % row)
+        return
+    return operation
+
+
+def apply_issnl_delta(path_delta, issnl_to_data, title_to_issnl, issn_to_issnl, sep='|', stats=None):
+    """
+    Aplica às bases ISSN-L-TO-DATA, TITLE-TO-ISSN-L e ISSN-TO-ISSN-L as alterações de um arquivo no formato da tabela
+    ISSN-L-ATRIBUTOS acrescida da coluna OPERATION. Linhas change substituem todos os dados do ISSN-L.
+
+    :param path_delta: caminho do arquivo de alterações
+    :param issnl_to_data: base de correção ISSN-L-TO-DATA
+    :param title_to_issnl: base de correção TITLE-TO-ISSN-L
+    :param issn_to_issnl: base de correção ISSN-TO-ISSN-L
+    :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
+    """
+    with open(path_delta) as f:
+        csv_reader = csv.DictReader(f, delimiter=sep)
+        for i in count_rows(csv_reader, stats):
+            operation = get_operation(i)
+
+            if operation in ('remove', 'change'):
+                remove_issnl(i.get('ISSNL', ''), issnl_to_data, title_to_issnl, issn_to_issnl)
+
+            if operation in ('add', 'change'):
+                add_issnl_row(i, issnl_to_data, title_to_issnl, issn_to_issnl)
+
+
+def apply_year_volume_delta(path_delta, issn_year_volume, title_year_volume, sep='|', stats=None):
+    """
+    Aplica às bases ISSN-ANO-VOLUME e TITULO-ANO-VOLUME as alterações de um arquivo no formato da tabela
+    ISSN-TITULO-ANO-VOLUME acrescida da coluna OPERATION. Uma linha dessa tabela não tem outra identificação além dos
+    próprios valores; por isso, linhas change são rejeitadas e uma alteração deve ser informada como remove e add.
+
+    :param path_delta: caminho do arquivo de alterações
+    :param issn_year_volume: base de validação ISSN-ANO-VOLUME
+    :param title_year_volume: base de validação TITULO-ANO-VOLUME (alterada no próprio objeto)
+    :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
+    :return: base de validação ISSN-ANO-VOLUME atualizada
+    """
+    added, removed = [], []
+
+    with open(path_delta) as f:
+        csv_reader = csv.DictReader(f, delimiter=sep)
+        for i in count_rows(csv_reader, stats):
+            operation = get_operation(i)
+            issn = clean_issn(i.get('ISSN'))
+            title = i.get('TITLE')
+
+            if not operation:
+                continue
+
+            if operation == 'change':
+                logging.error('Change rows are not supported (use remove and add): %s' % i)
+                continue
+
+            if not issn:
+                logging.error('ISSN empty: %s' % i)
+                continue
+
+            year = i.get('YEAR')
+            volume = i.get('VOLUME')
+
+            if operation == 'remove':
+                removed.append(make_key(issn, year, volume))
+                if title:
+                    title_year_volume.discard('-'.join([title, year, volume]))
+            else:
+                added.append(make_key(issn, year, volume))
+                if title:
+                    title_year_volume.add('-'.join([title, year, volume]))
+
+    return issn_year_volume.updated(added, removed)
+
+
+def apply_year_volume_linear_regression_delta(path_delta, issn_year_volume, issn_year_volume_more_or_less_one, sep='|',
+                                               stats=None):
+    """
+    Aplica às bases ISSN-ANO-VOLUME LR e ISSN-ANO-VOLUME LR ML1 as alterações de um arquivo no formato da tabela
+    ISSN-ANO-VOLUME de regressão linear acrescida da coluna OPERATION. Como em apply_year_volume_delta, linhas change
+    são rejeitadas.
+
+    :param path_delta: caminho do arquivo de alterações
+    :param issn_year_volume: base de validação ISSN-ANO-VOLUME LR
+    :param issn_year_volume_more_or_less_one: base de validação ISSN-ANO-VOLUME LR ML1
+    :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
+    :return: tupla (base de validação ISSN-ANO-VOLUME LR, ISSN-ANO-VOLUME LR ML1) atualizadas
+    """
+    added, removed = [], []
+    added_ml1, removed_ml1 = [], []
+
+    with open(path_delta) as f:
+        csv_reader = csv.DictReader(f, delimiter=sep)
+        for i in count_rows(csv_reader, stats):
+            operation = get_operation(i)
+            if not operation:
+                continue
+
+            if operation == 'change':
+                logging.error('Change rows are not supported (use remove and add): %s' % i)
+                continue
+
+            issn = i.get('ISSN')
+            year = i.get('YEAR')
+
+            keys = added if operation == 'add' else removed
+            keys_ml1 = added_ml1 if operation == 'add' else removed_ml1
+
+            keys.append(make_key(issn, year, i.get('ROUNDED PV')))
+            keys_ml1.append(make_key(issn, year, i.get('ROUNDED PV - 1')))
+            keys_ml1.append(make_key(issn, year, i.get('ROUNDED PV + 1')))
+
+    return issn_year_volume.updated(added, removed), issn_year_volume_more_or_less_one.updated(added_ml1, removed_ml1)
+
+
+def apply_equations_delta(path_delta, issn_to_equation, sep='|', stats=None):
+    """
+    Aplica à base ISSN-TO-EQUATION as alterações de um arquivo no formato da tabela de equações acrescida da coluna
+    OPERATION. Linhas add não sobrescrevem equações existentes; linhas change sim.
+
+    :param path_delta: caminho do arquivo de alterações
+    :param issn_to_equation: base de predição de volume ISSN-TO-EQUATION
+    :param sep: delimitador de campo do arquivo
+    :param stats: dicionário que, se informado, recebe a quantidade de linhas lidas
+    """
+    with open(path_delta) as f:
+        csv_reader = csv.DictReader(f, delimiter=sep)
+        for i in count_rows(csv_reader, stats):
+            operation = get_operation(i)
+            issn = i.get('ISSN')
+
+            if operation == 'remove':
+                issn_to_equation.pop(issn, None)
+            elif operation == 'change' or (operation == 'add' and issn not in issn_to_equation):
+                issn_to_equation[issn] = (float(i.get('a')), float(i.get('b')), float(i.get('r2')))
+
+
+def add_bloom_filters(db_data: dict):
+    """
+    Constrói um filtro de Bloom para cada base de validação ISSN-ANO-VOLUME.
+
+    :param db_data: dicionário de bases de correção, que recebe os filtros
+    """
+    for name in PACKED_BASES:
+        started_at = time.time()
+        bloom = build_bloom_filter(db_data[name])
+        db_data[bloom_name(name)] = bloom
+        logging.info('Built %s: %d bits, %d hashes in %.1fs'
+                     % (bloom_name(name), bloom.num_bits, bloom.num_hashes, time.time() - started_at))
+
+
+def save(db_data, path_db, db_format='lazy'):
     """
     Persiste base de correção no disco, em formato binário.
 
-    :param db_data: dados a serem persistidos
+    :param db_data: dados a serem persistidos, em um dicionário ou em SectionFiles (no formato sqlite, recebem também os
+    filtros de Bloom)
     :param path_db: nome do arquivo a ser persistido
+    :param db_format: formato do arquivo (lazy, pickle, mmap ou sqlite)
+    """
+    if db_format in BLOOM_DB_FORMATS:
+        add_bloom_filters(db_data)
+
+    if db_format == 'mmap':
+        write_mapped_database(db_data, path_db)
+    elif db_format == 'sqlite':
+        write_sqlite_database(db_data, path_db, METADATA_KEYS)
+    elif db_format == 'lazy':
+        write_lazy_database(db_data, path_db)
+    else:
+        # O formato pickle é um único objeto, que contém todas as bases
+        with open(path_db, 'wb') as f:
+            pickle.dump(dict(db_data), f)
+
+
+class SectionFiles(MutableMapping):
+    """
+    Bases de correção serializadas com pickle em arquivos separados, desserializadas a cada acesso e não mantidas em
+    memória, para que os formatos mmap e sqlite sejam gravados com uma base carregada por vez. Os demais itens
+    (metadados e filtros de Bloom) são mantidos em memória.
+    """
+
+    def __init__(self, sections: dict, values: dict):
+        self.sections = sections
+        self.values = values
+
+    def __getitem__(self, name):
+        if name in self.sections:
+            with open(self.sections[name], 'rb') as f:
+                return pickle.load(f)
+        return self.values[name]
+
+    def __setitem__(self, name, value):
+        self.values[name] = value
+
+    def __delitem__(self, name):
+        del self.values[name]
+
+    def __contains__(self, name):
+        return name in self.sections or name in self.values
+
+    def __iter__(self):
+        yield from self.sections
+        yield from self.values
+
+    def __len__(self):
+        return len(self.sections) + len(self.values)
+
+
+# Função de extração e nomes das bases geradas para cada arquivo de entrada
+INPUT_PARSERS = {
+    'issnl-to-data': (get_db_issnl_and_db_title, ['issnl-to-data', 'title-to-issnl', 'issn-to-issnl']),
+    'issn-year-volume': (get_db_year_volume, ['issn-year-volume', 'title-year-volume']),
+    'issn-year-volume-lr': (get_db_year_volume_linear_regression, ['issn-year-volume-lr', 'issn-year-volume-lr-ml1']),
+    'issnl-to-equation': (get_equations, ['issn-to-equation']),
+}
+
+
+def build_sections(input_name, path_input, dir_sections):
+    """
+    Extrai as bases de um arquivo de entrada e as persiste, cada uma em um arquivo temporário serializado com pickle.
+    Executada em um processo separado para cada arquivo de entrada.
+
+    :param input_name: nome do arquivo de entrada em INPUT_PARSERS
+    :param path_input: caminho do arquivo de entrada
+    :param dir_sections: diretório dos arquivos temporários
+    :return: tupla (nome do arquivo de entrada, dicionário nome da base -> caminho do arquivo temporário, quantidade de
+    linhas lidas, tempo de extração em segundos)
+    """
+    parser, names = INPUT_PARSERS[input_name]
+
+    started_at = time.time()
+    stats = {}
+
+    bases = parser(path_input, stats=stats)
+    if len(names) == 1:
+        bases = (bases,)
+
+    sections = {}
+    for name, base in zip(names, bases):
+        sections[name] = os.path.join(dir_sections, name + '.pkl')
+        with open(sections[name], 'wb') as f:
+            pickle.dump(base, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return input_name, sections, stats['rows'], time.time() - started_at
+
+
+def build_inferred_keys_section(path_equations_section, path_lr_section, dir_sections):
+    """
+    Pré-calcula a tabela de chaves ISSN-ANO-VOLUME com volume inferido a partir das bases issn-to-equation e
+    issn-year-volume-lr já extraídas e a persiste em um arquivo temporário serializado com pickle.
+
+    :param path_equations_section: arquivo temporário da base issn-to-equation
+    :param path_lr_section: arquivo temporário da base issn-year-volume-lr
+    :param dir_sections: diretório dos arquivos temporários
+    :return: caminho do arquivo temporário da tabela
     """
-    with open(path_db, 'wb') as f:
-        pickle.dump(db_data, f)
+    started_at = time.time()
 
+    with open(path_equations_section, 'rb') as f:
+        issn_to_equation = pickle.load(f)
+    with open(path_lr_section, 'rb') as f:
+        issn_year_volume_lr = pickle.load(f)
 
-def main(path_db_title, path_db_year_volume, path_db_year_volume_lr, path_equations, version):
-    logging.info('Loading title data')
-    issnl_to_data, title_to_issnl, issn_to_issnl = get_db_issnl_and_db_title(path_db_title)
+    inferred_keys = build_inferred_keys(issn_to_equation, issn_year_volume_lr)
 
-    logging.info('Loading year-volume data')
-    issn_year_volume, title_year_volume = get_db_year_volume(path_db_year_volume)
+    path_section = os.path.join(dir_sections, 'issn-year-volume-inferred.pkl')
+    with open(path_section, 'wb') as f:
+        pickle.dump(inferred_keys, f, protocol=pickle.HIGHEST_PROTOCOL)
 
-    logging.info('Loading year-volume from linear regression data')
-    issn_year_volume_lr, issn_year_volume_lr_ml1 = get_db_year_volume_linear_regression(path_db_year_volume_lr)
+    logging.info('Built issn-year-volume-inferred: %d ISSNs in %.1fs' % (len(inferred_keys), time.time() - started_at))
+    return path_section
 
-    logging.info('Loading issnl linear regressions')
-    issn_to_equation = get_equations(path_equations)
 
-    dbs = {
-        'issnl-to-data': issnl_to_data,
-        'issn-to-issnl': issn_to_issnl,
-        'title-to-issnl': title_to_issnl,
-        'issn-year-volume': issn_year_volume,
-        'title-year-volume': title_year_volume,
-        'issn-year-volume-lr': issn_year_volume_lr,
-        'issn-year-volume-lr-ml1': issn_year_volume_lr_ml1,
-        'issn-to-equation': issn_to_equation,
+def main(path_db_title, path_db_year_volume, path_db_year_volume_lr, path_equations, version, db_format='lazy',
+         workers=None):
+    inputs = {
+        'issnl-to-data': path_db_title,
+        'issn-year-volume': path_db_year_volume,
+        'issn-year-volume-lr': path_db_year_volume_lr,
+        'issnl-to-equation': path_equations,
+    }
+
+    metadata = {
         'version': version,
         'creation-date': datetime.now().strftime('%Y-%m-%d')
     }
 
-    save(dbs, 'bc-' + version + '.bin')
+    path_db = 'bc-' + version + '.bin'
+    dir_sections = tempfile.mkdtemp(prefix='bc-' + version + '-', dir=os.path.dirname(os.path.abspath(path_db)))
+
+    try:
+        sections = {}
+
+        # Cada arquivo de entrada é lido e convertido em um processo separado
+        with ProcessPoolExecutor(max_workers=workers or len(inputs)) as executor:
+            futures = [executor.submit(build_sections, k, v, dir_sections) for k, v in inputs.items()]
+
+            for future in futures:
+                input_name, input_sections, rows, seconds = future.result()
+                logging.info('Loaded %s: %d rows in %.1fs (%.0f rows/s)'
+                             % (input_name, rows, seconds, rows / max(seconds, 1e-6)))
+                sections.update(input_sections)
+
+        sections['issn-year-volume-inferred'] = build_inferred_keys_section(
+            sections['issn-to-equation'], sections['issn-year-volume-lr'], dir_sections)
+
+        logging.info('Saving %s' % path_db)
+        if db_format == 'lazy':
+            # As bases já serializadas são copiadas diretamente, sem serem carregadas no processo principal
+            write_lazy_database_from_sections(metadata, [(k, sections[k]) for k in DB_NAMES], path_db)
+        else:
+            # As bases são carregadas uma por vez, à medida que são gravadas (exceto no formato pickle)
+            save(SectionFiles({k: sections[k] for k in DB_NAMES}, metadata), path_db, db_format)
+    finally:
+        shutil.rmtree(dir_sections, ignore_errors=True)
+
+
+def main_delta(path_parent, path_db_title, path_db_year_volume, path_db_year_volume_lr, path_equations, version,
+               db_format='lazy'):
+    """
+    Gera uma nova versão da base de correção a partir de uma versão anterior e de arquivos de alterações.
+    Apenas as bases afetadas pelos arquivos informados são recalculadas; as demais são copiadas da versão anterior.
+
+    As bases de validação guardam apenas as chaves, e não quantas linhas as produzem. Por isso, o resultado pode diferir
+    do de uma geração completa a partir das tabelas atualizadas: uma linha removida das tabelas ISSN-TITULO-ANO-VOLUME
+    ou ISSN-ANO-VOLUME de regressão linear remove suas chaves ISSN-ANO-VOLUME, TITULO-ANO-VOLUME e ML1 mesmo que outras
+    linhas ainda as produzam (por exemplo, o mesmo ISSN, ano e volume com outro título). Nesses casos, as linhas
+    restantes que produzem as chaves devem ser informadas novamente como add, ou a base deve ser gerada por completo.
+    Linhas change de ISSN-L-ATRIBUTOS movem o ISSN-L para o fim da ordem de ISSN-L-TO-DATA.
+
+    :param path_parent: caminho da versão anterior da base de correção
+    :param path_db_title: arquivo de alterações da tabela ISSN-L-ATRIBUTOS (ou None)
+    :param path_db_year_volume: arquivo de alterações da tabela ISSN-TITULO-ANO-VOLUME (ou None)
+    :param path_db_year_volume_lr: arquivo de alterações da tabela ISSN-ANO-VOLUME de regressão linear (ou None)
+    :param path_equations: arquivo de alterações da tabela de equações (ou None)
+    :param version: versão da base gerada
+    :param db_format: formato do arquivo gerado
+    """
+    parent = open_database(path_parent)
+
+    # Bases não afetadas são copiadas ainda serializadas, quando possível
+    dbs = {}
+    for name in DB_NAMES:
+        if name not in parent:
+            continue
+        if isinstance(parent, LazyDatabase) and db_format == 'lazy':
+            dbs[name] = parent.pickled(name)
+        else:
+            dbs[name] = materialize(parent[name])
+
+    def load(*names):
+        return [materialize(dbs[n]) for n in names]
+
+    deltas = [
+        ('issnl-to-data', path_db_title),
+        ('issn-year-volume', path_db_year_volume),
+        ('issn-year-volume-lr', path_db_year_volume_lr),
+        ('issnl-to-equation', path_equations),
+    ]
+
+    for input_name, path_delta in deltas:
+        if not path_delta:
+            continue
+
+        started_at = time.time()
+        stats = {}
+
+        if input_name == 'issnl-to-data':
+            issnl_to_data, title_to_issnl, issn_to_issnl = load('issnl-to-data', 'title-to-issnl', 'issn-to-issnl')
+            apply_issnl_delta(path_delta, issnl_to_data, title_to_issnl, issn_to_issnl, stats=stats)
+            dbs.update({'issnl-to-data': issnl_to_data,
+                        'title-to-issnl': title_to_issnl,
+                        'issn-to-issnl': issn_to_issnl})
+
+        elif input_name == 'issn-year-volume':
+            issn_year_volume, title_year_volume = load('issn-year-volume', 'title-year-volume')
+            issn_year_volume = apply_year_volume_delta(path_delta, issn_year_volume, title_year_volume, stats=stats)
+            dbs.update({'issn-year-volume': issn_year_volume, 'title-year-volume': title_year_volume})
+
+        elif input_name == 'issn-year-volume-lr':
+            issn_year_volume_lr, issn_year_volume_lr_ml1 = apply_year_volume_linear_regression_delta(
+                path_delta, *load('issn-year-volume-lr', 'issn-year-volume-lr-ml1'), stats=stats)
+            dbs.update({'issn-year-volume-lr': issn_year_volume_lr, 'issn-year-volume-lr-ml1': issn_year_volume_lr_ml1})
+
+        else:
+            issn_to_equation, = load('issn-to-equation')
+            apply_equations_delta(path_delta, issn_to_equation, stats=stats)
+            dbs['issn-to-equation'] = issn_to_equation
+
+        seconds = time.time() - started_at
+        logging.info('Applied %s: %d rows in %.1fs (%.0f rows/s)'
+                     % (input_name, stats['rows'], seconds, stats['rows'] / max(seconds, 1e-6)))
+
+    # A tabela de chaves com volume inferido é recalculada se as equações ou a base de regressão linear forem alteradas
+    # (ou se a versão anterior não a possuir)
+    if path_db_year_volume_lr or path_equations or 'issn-year-volume-inferred' not in dbs:
+        started_at = time.time()
+        dbs['issn-year-volume-inferred'] = build_inferred_keys(*load('issn-to-equation', 'issn-year-volume-lr'))
+        logging.info('Built issn-year-volume-inferred: %d ISSNs in %.1fs'
+                     % (len(dbs['issn-year-volume-inferred']), time.time() - started_at))
+
+    dbs.update({
+        'version': version,
+        'creation-date': datetime.now().strftime('%Y-%m-%d'),
+        'parent-version': parent['version']
+    })
+
+    path_db = 'bc-' + version + '.bin'
+    logging.info('Saving %s' % path_db)
+    save(dbs, path_db, db_format)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s %(message)s')
 
     usage = "generate a binary file representing a journal title correction database"
 
@@ -230,6 +722,35 @@ if __name__ == '__main__':
         help='version of the binary file generated'
     )
 
+    parser.add_argument(
+        '-f', '--format',
+        default='lazy',
+        dest='db_format',
+        choices=DB_FORMATS,
+        help='format of the binary file generated (lazy files load each base on first access; mmap files are '
+             'memory-mapped; sqlite files are queried on disk). A full build holds one base at a time in memory while '
+             'saving, except for pickle, which holds all of them; a build with --parent holds all of them except the '
+             'lazy bases copied from the parent'
+    )
+
+    parser.add_argument(
+        '-p', '--parent',
+        default=None,
+        dest='parent',
+        help='path of a previous binary file; when informed, the other input files hold only added, removed or changed '
+             'rows (OPERATION column: add, remove or change; year and volume files accept only add and remove). A '
+             'removed year and volume row also drops keys that other rows still produce; add those rows again or do '
+             'a full build'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        default=None,
+        dest='workers',
+        type=int,
+        help='number of worker processes used to parse the input files (default: one per input file)'
+    )
+
     args = parser.parse_args()
 
     path_db_issnl_to_data = args.il2data
@@ -239,4 +760,9 @@ if __name__ == '__main__':
 
     version = args.version
 
-    main(path_db_issnl_to_data, path_db_year_volume, path_db_year_volume_lr, path_issnl_to_equation, version)
+    if args.parent:
+        main_delta(args.parent, path_db_issnl_to_data, path_db_year_volume, path_db_year_volume_lr,
+                   path_issnl_to_equation, version, args.db_format)
+    else:
+        main(path_db_issnl_to_data, path_db_year_volume, path_db_year_volume_lr, path_issnl_to_equation, version,
+             args.db_format, args.workers)
@@ -0,0 +1,334 @@
+import logging
+import os
+import time
+
+from utils.cache import LRUCache
+from utils.correction_db import log_load, open_database, rss_bytes
+from utils.db_reload import DatabaseReloader, loaded_bases
+from utils.sqlite_db import SqliteDatabase
+from utils.packed_keys import make_key
+from utils.title_index import FUZZY_ENGINES, TitleApproximateIndex
+from utils.volume_table import lookup_inferred_key, NO_VOLUME, NOT_PRECOMPUTED
+from xylose.scielodocument import Citation
+
+
+FUZZY_ENGINE = os.environ.get('FUZZY_ENGINE', 'token')
+JOURNAL_CACHE_SIZE = int(os.environ.get('JOURNAL_CACHE_SIZE', '100000'))
+APPROXIMATE_MAX_DISTANCE = int(os.environ.get('APPROXIMATE_MAX_DISTANCE', '1'))
+
+MIN_CHARS_LENGTH = 6
+MIN_WORDS_COUNT = 2
+
+STATUS_NOT_NORMALIZED = 0
+STATUS_EXACT = 1
+STATUS_EXACT_VALIDATED = 2
+STATUS_EXACT_VALIDATED_LR = 3
+STATUS_EXACT_VALIDATED_LR_ML1 = 4
+STATUS_EXACT_VOLUME_INFERRED_VALIDATED = 5
+STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR = 6
+STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1 = 7
+STATUS_FUZZY_VALIDATED = 8
+STATUS_FUZZY_VALIDATED_LR = 9
+STATUS_FUZZY_VALIDATED_LR_ML1 = 10
+STATUS_FUZZY_VOLUME_INFERRED_VALIDATED = 11
+STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR = 12
+STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1 = 13
+STATUS_APPROXIMATE_VALIDATED = 14
+STATUS_APPROXIMATE_VALIDATED_LR = 15
+STATUS_APPROXIMATE_VALIDATED_LR_ML1 = 16
+STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED = 17
+STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR = 18
+STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR_ML1 = 19
+
+VOLUME_IS_ORIGINAL = 0
+VOLUME_IS_INFERRED = 1
+VOLUME_NOT_USED = -1
+
+
+class JournalMatcher:
+    """
+    Base comum de utils.journal_standardizer.JournalStandardizer e model.old_standardizer.JournalStandardizer: carga e
+    recarga da base de correção, índices de títulos, casamentos de títulos de periódicos e seus caches e extração das
+    chaves ISSN-ANO-VOLUME usadas na validação.
+    """
+
+    # Se True, preload constrói o índice do casamento fuzzy mesmo sem use_fuzzy
+    always_fuzzy = False
+
+    def __init__(self,
+                 path_db,
+                 use_exact=False,
+                 use_fuzzy=False,
+                 fuzzy_engine=FUZZY_ENGINE,
+                 cache_size=JOURNAL_CACHE_SIZE,
+                 use_approximate=False,
+                 max_distance=APPROXIMATE_MAX_DISTANCE,
+                 hot_reload=False,
+                 database_backend='auto'):
+
+        self.use_exact = use_exact
+        self.use_fuzzy = use_fuzzy
+        self.fuzzy_engine = fuzzy_engine
+        self.use_approximate = use_approximate
+        self.max_distance = max_distance
+        self.database_backend = database_backend
+
+        # Caches de título para ISSN-Ls casados e de (título, modo, ano, volume) para resultado validado
+        self.matches_cache = LRUCache(cache_size)
+        self.validation_cache = LRUCache(cache_size)
+
+        # Índices derivados de title-to-issnl, construídos apenas quando um modo que os utiliza é executado
+        self._title_index = None
+        self._approximate_index = None
+
+        if path_db:
+            self.db = self.load_database(path_db)
+
+        # Recarga da base de correção em segundo plano, solicitada por SIGHUP ou pela alteração do arquivo
+        self.reloader = None
+        if path_db and hot_reload:
+            self.reloader = DatabaseReloader(path_db, self.prepare_database)
+            self.reloader.install_signal_handler()
+
+    @property
+    def title_index(self):
+        """
+        Índice de títulos oficiais usado no casamento fuzzy, construído no primeiro uso.
+        """
+        if self._title_index is None:
+            started_at, rss_before = time.time(), rss_bytes()
+            self._title_index = FUZZY_ENGINES[self.fuzzy_engine](self.db['title-to-issnl'])
+            log_load('%s title index' % self.fuzzy_engine, started_at, rss_before)
+        return self._title_index
+
+    @property
+    def approximate_index(self):
+        """
+        Índice de títulos oficiais usado no casamento tolerante a erros de digitação, construído no primeiro uso.
+        """
+        if self._approximate_index is None:
+            started_at, rss_before = time.time(), rss_bytes()
+            self._approximate_index = TitleApproximateIndex(self.db['title-to-issnl'], self.max_distance)
+            log_load('approximate title index', started_at, rss_before)
+        return self._approximate_index
+
+    def prepare_database(self, path_db: str):
+        """
+        Carrega uma nova versão da base de correção sem alterar a versão em uso.
+        As bases e os índices já carregados pela versão em uso são carregados também na nova versão, para que a troca
+        não cause novas cargas durante a normalização.
+
+        :param path_db: caminho do arquivo binário
+        :return: tupla (bases, índice fuzzy, índice aproximado)
+        """
+        db = open_database(path_db, self.database_backend)
+        for name in loaded_bases(self.db):
+            db[name]
+
+        title_index = None
+        if self._title_index is not None:
+            title_index = FUZZY_ENGINES[self.fuzzy_engine](db['title-to-issnl'])
+
+        approximate_index = None
+        if self._approximate_index is not None:
+            approximate_index = TitleApproximateIndex(db['title-to-issnl'], self.max_distance)
+
+        return db, title_index, approximate_index
+
+    def preload(self):
+        """
+        Carrega todas as bases de correção e os índices de títulos dos modos de casamento em uso, que de outro modo seriam
+        carregados no primeiro acesso. Deve ser chamado antes da criação de processos por fork (ver utils.parallel), para
+        que as bases sejam compartilhadas por copy-on-write em vez de carregadas por cada processo.
+        """
+        for name in self.db.keys():
+            self.db[name]
+
+        if self.use_fuzzy or self.always_fuzzy:
+            self.title_index
+        if self.use_approximate:
+            self.approximate_index
+
+    def maybe_swap(self):
+        """
+        Troca a base de correção em uso por uma nova versão já carregada em segundo plano, se houver, e invalida os
+        caches de casamento e de validação. Deve ser chamado entre referências citadas.
+
+        :return: True se houve troca
+        """
+        if self.reloader is None:
+            return False
+
+        state = self.reloader.poll()
+        if state is None:
+            return False
+
+        old_version = self.db.get('version')
+        self.db, self._title_index, self._approximate_index = state
+
+        self.matches_cache.clear()
+        self.validation_cache.clear()
+
+        logging.info('Swapped correction database version %s for %s' % (old_version, self.db.get('version')))
+        return True
+
+    def load_database(self, path_db: str):
+        """
+        Carrega o arquivo binário das bases de correção e validação, no formato indicado por database_backend (ver
+        utils.correction_db): pickle, carga sob demanda por base, mapeado em memória (mmap) ou consultado em SQLite.
+
+        :param path_db: caminho do arquivo binário
+        :return: bases carregadas (dicionário, LazyDatabase, MappedDatabase ou SqliteDatabase)
+        """
+        try:
+            return open_database(path_db, self.database_backend)
+        except ValueError as e:
+            logging.error(e)
+            exit(1)
+        except FileNotFoundError:
+            logging.error('File {0} does not exist'.format(path_db))
+            exit(1)
+
+    def extract_issn_year_volume_keys(self, cit: Citation, issns: set):
+        """
+        Extrai chaves ISSN-YEAR-VOLUME para uma referência citada e lista de ISSNs.
+
+        As chaves canônicas são empacotadas em inteiros (ver utils.packed_keys), evitando a alocação de strings.
+
+        :param cit: referência citada
+        :param issns: set de possíveis ISSNs
+        :return: set de chaves ISSN-ANO-VOLUME
+        """
+        keys = set()
+
+        cit_year = cit.publication_date
+
+        if cit_year:
+            if len(cit_year) > 4:
+                cit_year = cit_year[:4]
+
+            if len(cit_year) == 4 and cit_year.isdigit():
+                cit_vol = cit.volume
+
+                if cit_vol and cit_vol.isdigit():
+                    for i in issns:
+                        keys.add(make_key(i, cit_year, cit_vol))
+                    return keys, VOLUME_IS_ORIGINAL
+                else:
+                    # As chaves com volume inferido são obtidas da tabela pré-calculada por generate_db, quando houver;
+                    # o volume é calculado pela equação apenas para ISSNs e anos não cobertos pela tabela. Anos com
+                    # dígitos não ASCII (aceitos por isdigit, mas não por int) seguem direto para infer_volume
+                    if cit_year.isascii():
+                        inferred_keys = self.db.get('issn-year-volume-inferred', {})
+                        year = int(cit_year)
+                    else:
+                        inferred_keys, year = {}, None
+
+                    for i in issns:
+                        key = lookup_inferred_key(inferred_keys, i, year)
+                        if key is NOT_PRECOMPUTED:
+                            cit_vol_inferred = self.infer_volume(i, cit_year)
+                            if cit_vol_inferred:
+                                keys.add(make_key(i, cit_year, cit_vol_inferred))
+                        elif key != NO_VOLUME:
+                            keys.add(key)
+                    return keys, VOLUME_IS_INFERRED
+
+        return keys, VOLUME_NOT_USED
+
+    def infer_volume(self, issn: str, year: str):
+        """
+        Infere o volume de um periódico a partir de issn-to-equation.
+
+        :param issn: issn para o qual o volume será inferido
+        :return: str do volume inferido arredondado para valor inteiro (se volume inferido for maior que 0)
+        """
+        equation = self.db['issn-to-equation'].get(issn)
+
+        if equation:
+            a, b, r2 = equation
+            volume = a + (b * int(year))
+
+            if volume > 0:
+                return str(round(volume))
+
+    def match_exact(self, journal_title: str):
+        """
+        Procura journal_title de forma exata no dicionário title-to-issnl.
+
+        :param journal_title: título do periódico citado
+        :return: set de ISSN-Ls associados de modo exato ao título do periódico citado
+        """
+        return self.db['title-to-issnl'].get(journal_title, set())
+
+    def match_fuzzy(self, journal_title: str):
+        """
+        Procura journal_title de forma aproximada no dicionário title-to-issnl.
+
+        :param journal_title: título do periódico citado
+        :return: set de ISSN-Ls associados de modo aproximado ao título do periódico citado
+        """
+        matches = set()
+
+        words = journal_title.split(' ')
+
+        # Para a comparação ser possível, é preciso que o título tenha pelo menos MIN_CHARS_LENGTH letras e seja
+        # formado por pelo menos MIN_WORDS_COUNT palavras.
+        if len(journal_title) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
+            # O título oficial deve iniciar com a primeira palavra do título procurado e conter as demais, em ordem
+            for official_title in self.title_index.match(words):
+                matches = matches.union(self.db['title-to-issnl'][official_title])
+        return matches
+
+    def match_approximate(self, journal_title: str):
+        """
+        Procura journal_title de forma tolerante a erros de digitação no dicionário title-to-issnl.
+
+        :param journal_title: título do periódico citado
+        :return: set de ISSN-Ls associados aos títulos oficiais a até max_distance edições do título citado
+        """
+        matches = set()
+
+        words = journal_title.split(' ')
+
+        # Aplica as mesmas restrições de tamanho de match_fuzzy (MIN_CHARS_LENGTH e MIN_WORDS_COUNT)
+        if len(journal_title) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
+            for official_title in self.approximate_index.match(words):
+                matches = matches.union(self.db['title-to-issnl'][official_title])
+        return matches
+
+    def get_matches(self, cleaned_cit_journal_title, mode='exact'):
+        """
+        Obtém os ISSN-Ls casados com um título de periódico citado, consultando antes o cache de casamentos.
+
+        :param cleaned_cit_journal_title: título limpo do periódico citado
+        :param mode: modo de casamento ['exact', 'fuzzy', 'approximate']
+        :return: frozenset de ISSN-Ls casados
+        """
+        cache_key = (cleaned_cit_journal_title, mode)
+
+        matches = self.matches_cache.get(cache_key)
+        if matches is None:
+            if mode == 'fuzzy':
+                matches = frozenset(self.match_fuzzy(cleaned_cit_journal_title))
+            elif mode == 'approximate':
+                matches = frozenset(self.match_approximate(cleaned_cit_journal_title))
+            else:
+                matches = frozenset(self.match_exact(cleaned_cit_journal_title))
+            self.matches_cache.put(cache_key, matches)
+
+        return matches
+
+    def cache_stats(self):
+        """
+        Obtém os contadores dos caches de casamento e de validação e, no backend SQLite, dos caches de leitura.
+
+        :return: dicionário com os contadores de cada cache
+        """
+        stats = {'matches': self.matches_cache.stats(),
+                 'validation': self.validation_cache.stats()}
+
+        if isinstance(self.db, SqliteDatabase):
+            stats['database'] = self.db.cache_stats()
+
+        return stats
@@ -1,78 +1,80 @@
-import logging
 import os
-import pickle
-import re
 
 from datetime import datetime
-from xylose.scielodocument import Citation
+from utils.journal_matcher import (
+    APPROXIMATE_MAX_DISTANCE,
+    FUZZY_ENGINE,
+    JOURNAL_CACHE_SIZE,
+    JournalMatcher,
+    MIN_CHARS_LENGTH,
+    MIN_WORDS_COUNT,
+    STATUS_NOT_NORMALIZED,
+    STATUS_EXACT,
+    STATUS_EXACT_VALIDATED,
+    STATUS_EXACT_VALIDATED_LR,
+    STATUS_EXACT_VALIDATED_LR_ML1,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    STATUS_FUZZY_VALIDATED,
+    STATUS_FUZZY_VALIDATED_LR,
+    STATUS_FUZZY_VALIDATED_LR_ML1,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    STATUS_APPROXIMATE_VALIDATED,
+    STATUS_APPROXIMATE_VALIDATED_LR,
+    STATUS_APPROXIMATE_VALIDATED_LR_ML1,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR,
+    STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR_ML1,
+    VOLUME_IS_ORIGINAL,
+    VOLUME_IS_INFERRED,
+    VOLUME_NOT_USED,
+)
+from utils.packed_keys import split_key
 
 
 DIR_DATA = os.environ.get('DIR_DATA', '/home/rafael/Downloads')
 
-MIN_CHARS_LENGTH = 6
-MIN_WORDS_COUNT = 2
 
-STATUS_NOT_NORMALIZED = 0
-STATUS_EXACT = 1
-STATUS_EXACT_VALIDATED = 2
-STATUS_EXACT_VALIDATED_LR = 3
-STATUS_EXACT_VALIDATED_LR_ML1 = 4
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED = 5
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR = 6
-STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1 = 7
-STATUS_FUZZY_VALIDATED = 8
-STATUS_FUZZY_VALIDATED_LR = 9
-STATUS_FUZZY_VALIDATED_LR_ML1 = 10
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED = 11
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR = 12
-STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1 = 13
+class JournalStandardizer(JournalMatcher):
 
-VOLUME_IS_ORIGINAL = 0
-VOLUME_IS_INFERRED = 1
-VOLUME_NOT_USED = -1
+    # Standardizer executa sempre os casamentos exato e fuzzy
+    always_fuzzy = True
 
+    def __init__(self,
+                 journal_std_path,
+                 use_exact=False,
+                 use_fuzzy=False,
+                 fuzzy_engine=FUZZY_ENGINE,
+                 cache_size=JOURNAL_CACHE_SIZE,
+                 use_approximate=False,
+                 max_distance=APPROXIMATE_MAX_DISTANCE,
+                 hot_reload=False,
+                 database_backend='auto'):
 
-class JournalStandardizer:
-    def __init__(self, journal_std_path, use_exact=False, use_fuzzy=False):
-
-        self.use_exact = use_exact
-        self.use_fuzzy = use_fuzzy
-
-        if journal_std_path:
-            self.db = self.load_database(journal_std_path)
+        super().__init__(journal_std_path, use_exact, use_fuzzy, fuzzy_engine, cache_size, use_approximate,
+                         max_distance, hot_reload, database_backend)
 
     def add_hifen_issn(self, issn: str):
         if issn:
             return issn[:4] + '-' + issn[4:]
         return ''
 
-    def load_database(self, path_db: str):
-        """
-        Carrega na memória o arquivo binário das bases de correção e validação.
-
-        :param path_db: caminho do arquivo binário
-        :return: base carregada em formato de dicionário
-        """
-        try:
-            with open(path_db, 'rb') as f:
-                return pickle.load(f)
-        except FileNotFoundError:
-            logging.error('File {0} does not exist'.format(path_db))
-            exit(1)
-
-    def extract_issnl_from_valid_match(self, valid_match: str):
+    def extract_issnl_from_valid_match(self, valid_match):
         """
         Extrai ISSN-L a partir de uma chave ISSN-ANO-VOLUME.
         Caso o ISSN não exista no dicionário issn-to-issnl, considera o próprio ISSN como ISSN-L.
 
-        :param valid_match: chave validada no formato ISSN-ANO-VOLUME
+        :param valid_match: chave validada no formato ISSN-ANO-VOLUME, empacotada ou em string
         :return: ISSN-L
         """
         if not valid_match:
             return ''
 
-        els_valid_match = valid_match.split('-')
-        if len(valid_match) == 3:
+        els_valid_match = split_key(valid_match)
+        if len(els_valid_match) == 3:
             issn, year, volume = els_valid_match
             issnl = self.db['issn-to-issnl'].get(issn, '')
 
@@ -83,38 +85,6 @@ class JournalStandardizer:
 
         return ''
 
-    def extract_issn_year_volume_keys(self, cit: Citation, issns: set):
-        """
-        Extrai chaves ISSN-YEAR-VOLUME para uma referência citada e lista de ISSNs.
-
-        :param cit: referência citada
-        :param issns: set de possíveis ISSNs
-        :return: set de chaves ISSN-ANO-VOLUME
-        """
-        keys = set()
-
-        cit_year = cit.publication_date
-
-        if cit_year:
-            if len(cit_year) > 4:
-                cit_year = cit_year[:4]
-
-            if len(cit_year) == 4 and cit_year.isdigit():
-                cit_vol = cit.volume
-
-                if cit_vol and cit_vol.isdigit():
-                    for i in issns:
-                        keys.add('-'.join([i, cit_year, cit_vol]))
-                    return keys, VOLUME_IS_ORIGINAL
-                else:
-                    for i in issns:
-                        cit_vol_inferred = self.infer_volume(i, cit_year)
-                        if cit_vol_inferred:
-                            keys.add('-'.join([i, cit_year, cit_vol_inferred]))
-                    return keys, VOLUME_IS_INFERRED
-
-        return keys, VOLUME_NOT_USED
-
     def get_issns(self, matched_issnls: set):
         """
         Obtém todos os ISSNs associados a um set de ISSN-Ls.
@@ -137,7 +107,7 @@ class JournalStandardizer:
         """
         Obtém o status com base no modo de casamento, de volume utilizado e de base de validação utilizada.
 
-        :param match_mode: modo de casamento ['exact', 'fuzzy']
+        :param match_mode: modo de casamento ['exact', 'fuzzy', 'approximate']
         :param mount_mode: modo de obtenção da chave de validação ['VOLUME_IS_ORIGINAL', VOLUME_IS_INFERRED']
         :param db_used: base de validação utilizada ['lr', 'lr-ml1', 'default']
         :return: código de status conforme método utilizado
@@ -150,13 +120,20 @@ class JournalStandardizer:
                     return STATUS_EXACT_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_EXACT_VALIDATED
-            else:
+            elif match_mode == 'fuzzy':
                 if db_used == 'lr':
                     return STATUS_FUZZY_VALIDATED_LR
                 elif db_used == 'lr-ml1':
                     return STATUS_FUZZY_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_FUZZY_VALIDATED
+            elif match_mode == 'approximate':
+                if db_used == 'lr':
+                    return STATUS_APPROXIMATE_VALIDATED_LR
+                elif db_used == 'lr-ml1':
+                    return STATUS_APPROXIMATE_VALIDATED_LR_ML1
+                elif db_used == 'default':
+                    return STATUS_APPROXIMATE_VALIDATED
         elif mount_mode == VOLUME_IS_INFERRED:
             if match_mode == 'exact':
                 if db_used == 'lr':
@@ -165,62 +142,20 @@ class JournalStandardizer:
                     return STATUS_EXACT_VOLUME_INFERRED_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_EXACT_VOLUME_INFERRED_VALIDATED
-            else:
+            elif match_mode == 'fuzzy':
                 if db_used == 'lr':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR
                 elif db_used == 'lr-ml1':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED_LR_ML1
                 elif db_used == 'default':
                     return STATUS_FUZZY_VOLUME_INFERRED_VALIDATED
-
-    def infer_volume(self, issn: str, year: str):
-        """
-        Infere o volume de um periódico a partir de issn-to-equation.
-
-        :param issn: issn para o qual o volume será inferido
-        :return: str do volume inferido arredondado para valor inteiro (se volume inferido for maior que 0)
-        """
-        equation = self.db['issn-to-equation'].get(issn)
-
-        if equation:
-            a, b, r2 = equation
-            volume = a + (b * int(year))
-
-            if volume > 0:
-                return str(round(volume))
-
-    def match_exact(self, journal_title: str):
-        """
-        Procura journal_title de forma exata no dicionário title-to-issnl.
-
-        :param journal_title: título do periódico citado
-        :return: set de ISSN-Ls associados de modo exato ao título do periódico citado
-        """
-        return self.db['title-to-issnl'].get(journal_title, set())
-
-    def match_fuzzy(self, journal_title: str):
-        """
-        Procura journal_title de forma aproximada no dicionário title-to-issnl.
-
-        :param journal_title: título do periódico citado
-        :return: set de ISSN-Ls associados de modo aproximado ao título do periódico citado
-        """
-        matches = set()
-
-        words = journal_title.split(' ')
-
-        # Para a comparação ser possível, é preciso que o título tenha pelo menos MIN_CHARS_LENGTH letras e seja
-        # formado por pelo menos MIN_WORDS_COUNT palavras.
-        if len(journal_title) > MIN_CHARS_LENGTH and len(words) >= MIN_WORDS_COUNT:
-            # O título oficial deve iniciar com a primeira palavra do título procurado
-            pattern = r'[\w|\s]*'.join([word for word in words]) + '[\w|\s]*'
-            title_pattern = re.compile(pattern, re.UNICODE)
-
-            # O título oficial deve iniciar com a primeira palavra do título procurado
-            for official_title in [ot for ot in self.db['title-to-issnl'].keys() if ot.startswith(words[0])]:
-                if title_pattern.fullmatch(official_title):
-                    matches = matches.union(self.db['title-to-issnl'][official_title])
-        return matches
+            elif match_mode == 'approximate':
+                if db_used == 'lr':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR
+                elif db_used == 'lr-ml1':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED_LR_ML1
+                elif db_used == 'default':
+                    return STATUS_APPROXIMATE_VOLUME_INFERRED_VALIDATED
 
     def mount_std_journal_data(self, status: int, key=None, issn_l=None):
         if not issn_l:
@@ -233,7 +168,8 @@ class JournalStandardizer:
                 'official-journal-title': attrs.get('main-title', ''),
                 'official-abbreviated-journal-title': attrs.get('main-abbrev-title', ''),
                 'alternative-journal-titles': attrs.get('alternative-titles', ''),
-                'status': status}
+                'status': status,
+                'database-version': self.db.get('version')}
 
     def validate_match(self, keys, use_lr=False, use_lr_ml1=False):
         """
@@ -259,20 +195,94 @@ class JournalStandardizer:
         return valid_matches
 
     def standardize_journal(self, cit, cleaned_cit_journal_title, mode='exact'):
-        if mode == 'fuzzy':
-            matches = self.match_fuzzy(cleaned_cit_journal_title)
-        else:
-            matches = self.match_exact(cleaned_cit_journal_title)
+        """
+        Normaliza o periódico de uma referência citada.
+        O resultado depende apenas do título limpo, do modo de casamento, do ano e do volume citados, e é memorizado no
+        cache de validação a partir dessa chave.
+
+        :param cit: referência citada
+        :param cleaned_cit_journal_title: título limpo do periódico citado
+        :param mode: modo de casamento ['exact', 'fuzzy', 'approximate']
+        :return: dicionário composto por dados normalizados do periódico
+        """
+        cache_key = (cleaned_cit_journal_title, mode, (cit.publication_date or '')[:4], cit.volume)
+
+        result = self.validation_cache.get(cache_key)
+        if result is None:
+            result = self.match_and_validate(cit, cleaned_cit_journal_title, mode)
+            self.validation_cache.put(cache_key, result)
+
+        status, key, issn_l = result
+        return self.mount_std_journal_data(status, key, issn_l)
+
+    def standardize_journal_group(self, cits: list, cleaned_cit_journal_title, mode='exact'):
+        """
+        Normaliza o periódico de referências citadas com o mesmo título limpo, com resultado idêntico ao de
+        standardize_journal aplicado a cada uma delas. Os ISSN-Ls casados e os ISSNs candidatos são obtidos uma única
+        vez para o grupo, e a validação é feita uma única vez para cada par (ano, volume) citado.
+
+        :param cits: referências citadas
+        :param cleaned_cit_journal_title: título limpo do periódico citado, comum a todas as referências citadas
+        :param mode: modo de casamento ['exact', 'fuzzy', 'approximate']
+        :return: lista de tuplas (status, chave ISSN-ANO-VOLUME validada, ISSN-L), alinhada com cits
+        """
+        year_volume_groups = {}
+        for i, cit in enumerate(cits):
+            year_volume_groups.setdefault(((cit.publication_date or '')[:4], cit.volume), []).append(i)
+
+        results = [None] * len(cits)
+        candidates = None
+        for (year, volume), indexes in year_volume_groups.items():
+            cache_key = (cleaned_cit_journal_title, mode, year, volume)
+
+            result = self.validation_cache.get(cache_key)
+            if result is None:
+                if candidates is None:
+                    candidates = self.get_candidates(cleaned_cit_journal_title, mode)
+                result = self.match_and_validate(cits[indexes[0]], cleaned_cit_journal_title, mode, candidates)
+                self.validation_cache.put(cache_key, result)
+
+            for i in indexes:
+                results[i] = result
+
+        return results
+
+    def get_candidates(self, cleaned_cit_journal_title, mode='exact'):
+        """
+        Obtém os ISSN-Ls casados com um título de periódico citado e, se o casamento precisar ser validado com ano e
+        volume, os ISSNs associados a eles.
+
+        :param cleaned_cit_journal_title: título limpo do periódico citado
+        :param mode: modo de casamento ['exact', 'fuzzy', 'approximate']
+        :return: tupla (frozenset de ISSN-Ls casados, set de ISSNs candidatos à validação)
+        """
+        matches = self.get_matches(cleaned_cit_journal_title, mode)
+
+        # A validação é feita se houve casamento com mais de um ISSN-L ou se é casamento aproximado com um ISSN-L
+        if len(matches) > 1 or (mode != 'exact' and len(matches) == 1):
+            return matches, self.get_issns(matches)
+        return matches, set()
+
+    def match_and_validate(self, cit, cleaned_cit_journal_title, mode='exact', candidates=None):
+        """
+        Casa o título de periódico citado e, se houver mais de um casamento ou se o casamento for aproximado, valida os
+        ISSN-Ls casados com o ano e o volume da referência citada.
+
+        :param cit: referência citada
+        :param cleaned_cit_journal_title: título limpo do periódico citado
+        :param mode: modo de casamento ['exact', 'fuzzy', 'approximate']
+        :param candidates: tupla (ISSN-Ls casados, ISSNs candidatos) obtida por get_candidates, se já calculada
+        :return: tupla (status, chave ISSN-ANO-VOLUME validada, ISSN-L)
+        """
+        matches, possible_issns = candidates or self.get_candidates(cleaned_cit_journal_title, mode)
 
         # Verifica se houve casamento com apenas com um ISSN-L e se é casamento exato
         if len(matches) == 1 and mode == 'exact':
-            return self.mount_std_journal_data(status=STATUS_EXACT, issn_l=matches.pop())
+            return STATUS_EXACT, None, next(iter(matches))
 
         # Verifica se houve casamento com mais de um ISSN-L ou se é casamento aproximado e houve apenas um casamento
-        elif len(matches) > 1 or (mode == 'fuzzy' and len(matches)) == 1:
-            # Carrega todos os ISSNs possiveis associados aos ISSN-Ls casados
-            possible_issns = self.get_issns(matches)
-
+        elif len(matches) > 1 or (mode != 'exact' and len(matches) == 1):
+            # Todos os ISSNs possiveis associados aos ISSN-Ls casados
             if possible_issns:
                 # Monta chaves ISSN-ANO-VOLUME
                 keys, mount_mode = self.extract_issn_year_volume_keys(cit, possible_issns)
@@ -283,7 +293,7 @@ class JournalStandardizer:
 
                     if len(cit_valid_matches) == 1:
                         status = self.get_journal_match_status(mode, mount_mode, 'default')
-                        return self.mount_std_journal_data(status, cit_valid_matches.pop())
+                        return status, cit_valid_matches.pop(), None
 
                     elif len(cit_valid_matches) == 0:
                         # Valida chaves na base de regressão linear
@@ -291,7 +301,7 @@ class JournalStandardizer:
 
                         if len(cit_valid_matches) == 1:
                             status = self.get_journal_match_status(mode, mount_mode, 'lr')
-                            return self.mount_std_journal_data(status, cit_valid_matches.pop())
+                            return status, cit_valid_matches.pop(), None
 
                         elif len(cit_valid_matches) == 0:
                             # Valida chaves na base de regressão linear com volume flexibilizado
@@ -299,6 +309,6 @@ class JournalStandardizer:
 
                             if len(cit_valid_matches) == 1:
                                 status = self.get_journal_match_status(mode, mount_mode, 'lr-ml1')
-                                return self.mount_std_journal_data(status, cit_valid_matches.pop())
+                                return status, cit_valid_matches.pop(), None
 
-        return self.mount_std_journal_data(status=STATUS_NOT_NORMALIZED)
+        return STATUS_NOT_NORMALIZED, None, None
@@ -0,0 +1,299 @@
+import heapq
+
+from array import array
+from bisect import bisect_left
+
+
+# Bases de validação ISSN-ANO-VOLUME armazenadas como inteiros empacotados
+PACKED_BASES = ['issn-year-volume', 'issn-year-volume-lr', 'issn-year-volume-lr-ml1']
+
+# Quantidade de bits de cada componente da chave empacotada (ISSN: 7 dígitos + dígito verificador)
+ISSN_DIGITS_BITS = 24
+ISSN_CHECK_BITS = 4
+YEAR_BITS = 14
+VOLUME_BITS = 21
+
+MAX_VOLUME = (1 << VOLUME_BITS) - 1
+
+# Quantidade de chaves empacotadas ordenadas por vez durante a construção incremental de um PackedKeySet
+BUILDER_CHUNK_SIZE = 1 << 20
+
+
+def pack_key(issn: str, year: str, volume: str):
+    """
+    Empacota uma chave ISSN-ANO-VOLUME em um inteiro de 63 bits.
+    Apenas chaves canônicas são empacotadas: ISSN com 7 dígitos e dígito verificador (0-9 ou X), ano com 4 dígitos e
+    volume numérico sem zeros à esquerda. Assim, o empacotamento é reversível e preserva a igualdade entre strings.
+
+    :param issn: ISSN sem hífen
+    :param year: ano
+    :param volume: volume
+    :return: chave empacotada ou None, caso a chave não seja canônica
+    """
+    if len(issn) != 8 or len(year) != 4 or not volume:
+        return None
+
+    issn_digits = issn[:7]
+    if not issn_digits.isascii() or not issn_digits.isdigit():
+        return None
+
+    check = issn[7]
+    if check == 'X':
+        check = 10
+    elif '0' <= check <= '9':
+        check = ord(check) - 48
+    else:
+        return None
+
+    if not year.isascii() or not year.isdigit():
+        return None
+
+    if not volume.isascii() or not volume.isdigit() or (volume[0] == '0' and volume != '0'):
+        return None
+
+    volume = int(volume)
+    if volume > MAX_VOLUME:
+        return None
+
+    key = (int(issn_digits) << ISSN_CHECK_BITS) | check
+    key = (key << YEAR_BITS) | int(year)
+    return (key << VOLUME_BITS) | volume
+
+
+def unpack_key(key: int):
+    """
+    Desempacota uma chave ISSN-ANO-VOLUME.
+
+    :param key: chave empacotada
+    :return: tupla (ISSN, ano, volume)
+    """
+    volume = key & MAX_VOLUME
+    key >>= VOLUME_BITS
+
+    year = key & ((1 << YEAR_BITS) - 1)
+    key >>= YEAR_BITS
+
+    check = key & ((1 << ISSN_CHECK_BITS) - 1)
+    issn_digits = key >> ISSN_CHECK_BITS
+
+    return '%07d%s' % (issn_digits, 'X' if check == 10 else check), '%04d' % year, str(volume)
+
+
+def make_key(issn: str, year: str, volume: str):
+    """
+    Monta uma chave ISSN-ANO-VOLUME, empacotada se canônica ou em formato de string caso contrário.
+
+    :param issn: ISSN sem hífen
+    :param year: ano
+    :param volume: volume
+    :return: chave empacotada (int) ou chave ISSN-ANO-VOLUME (str)
+    """
+    key = pack_key(issn, year, volume)
+    if key is None:
+        return '-'.join([issn, year, volume])
+    return key
+
+
+def split_key(key):
+    """
+    Separa uma chave ISSN-ANO-VOLUME, empacotada ou em formato de string, em seus componentes.
+
+    :param key: chave empacotada (int) ou chave ISSN-ANO-VOLUME (str)
+    :return: lista [ISSN, ano, volume] (com outra quantidade de elementos se a chave em string for malformada)
+    """
+    if isinstance(key, int):
+        return list(unpack_key(key))
+    return key.split('-')
+
+
+def key_to_str(key):
+    """
+    Converte uma chave ISSN-ANO-VOLUME para o formato de string.
+
+    :param key: chave empacotada (int) ou chave ISSN-ANO-VOLUME (str)
+    :return: chave ISSN-ANO-VOLUME (str)
+    """
+    if isinstance(key, int):
+        return '-'.join(unpack_key(key))
+    return key
+
+
+class PackedKeySet:
+    """
+    Conjunto de chaves ISSN-ANO-VOLUME.
+    Chaves canônicas são guardadas como inteiros empacotados em um array ordenado de 64 bits e consultadas por busca
+    binária; as demais são guardadas como strings em um set auxiliar.
+    """
+
+    def __init__(self, keys=()):
+        packed = set()
+        self.fallback = set()
+
+        for k in keys:
+            k = make_key(*k.split('-', 2)) if k.count('-') == 2 else k
+            if isinstance(k, int):
+                packed.add(k)
+            else:
+                self.fallback.add(k)
+
+        self.packed = array('q', sorted(packed))
+
+    @classmethod
+    def from_sorted(cls, packed: array, fallback: set):
+        """
+        Cria um PackedKeySet a partir de chaves já empacotadas, ordenadas e sem repetição.
+
+        :param packed: array('q') de chaves empacotadas
+        :param fallback: set de chaves não canônicas
+        :return: PackedKeySet
+        """
+        packed_key_set = cls()
+        packed_key_set.packed = packed
+        packed_key_set.fallback = fallback
+        return packed_key_set
+
+    def __len__(self):
+        return len(self.packed) + len(self.fallback)
+
+    def __contains__(self, key):
+        if isinstance(key, int):
+            i = bisect_left(self.packed, key)
+            return i < len(self.packed) and self.packed[i] == key
+
+        packed_key = make_key(*key.split('-', 2)) if key.count('-') == 2 else key
+        if isinstance(packed_key, int):
+            return packed_key in self
+
+        return key in self.fallback
+
+    def __iter__(self):
+        for k in self.packed:
+            yield key_to_str(k)
+        yield from self.fallback
+
+    def updated(self, added=(), removed=()):
+        """
+        Cria um novo PackedKeySet com chaves adicionadas e removidas, intercalando as chaves em uma única passagem.
+        Chaves presentes em added e em removed são mantidas.
+
+        :param added: chaves adicionadas, no formato retornado por make_key
+        :param removed: chaves removidas, no formato retornado por make_key
+        :return: PackedKeySet
+        """
+        added_packed = {k for k in added if isinstance(k, int)}
+        removed_packed = {k for k in removed if isinstance(k, int)} - added_packed
+
+        fallback = (self.fallback - {k for k in removed if not isinstance(k, int)}) | {k for k in added if not isinstance(k, int)}
+
+        packed = array('q')
+        last = None
+        for k in heapq.merge(self.packed, sorted(added_packed)):
+            if k != last and k not in removed_packed:
+                packed.append(k)
+            last = k
+
+        return PackedKeySet.from_sorted(packed, fallback)
+
+
+class PackedKeySetBuilder:
+    """
+    Constrói um PackedKeySet a partir de um fluxo de chaves, sem manter todas as chaves como objetos Python.
+    As chaves empacotadas são acumuladas em arrays de até BUILDER_CHUNK_SIZE itens, ordenados individualmente e
+    intercalados ao final.
+    """
+
+    def __init__(self, chunk_size=BUILDER_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.current = array('q')
+        self.fallback = set()
+
+    def add(self, issn: str, year: str, volume: str):
+        """
+        Adiciona uma chave ISSN-ANO-VOLUME.
+
+        :param issn: ISSN
+        :param year: ano
+        :param volume: volume
+        """
+        key = make_key(issn, year, volume)
+
+        if isinstance(key, int):
+            self.current.append(key)
+            if len(self.current) >= self.chunk_size:
+                self._flush()
+        else:
+            self.fallback.add(key)
+
+    def _flush(self):
+        if self.current:
+            self.chunks.append(array('q', sorted(set(self.current))))
+            self.current = array('q')
+
+    def build(self):
+        """
+        Intercala os arrays ordenados, descartando chaves repetidas.
+
+        :return: PackedKeySet
+        """
+        self._flush()
+
+        packed = array('q')
+        last = None
+        for k in heapq.merge(*self.chunks):
+            if k != last:
+                packed.append(k)
+                last = k
+
+        self.chunks = []
+        return PackedKeySet.from_sorted(packed, self.fallback)
+
+
+def issn_year_ranges(keys: PackedKeySet):
+    """
+    Obtém o primeiro e o último ano de cada ISSN presente em um conjunto de chaves ISSN-ANO-VOLUME.
+    As chaves empacotadas estão ordenadas por ISSN e ano, de modo que cada ISSN ocupa um trecho contíguo do array.
+
+    :param keys: PackedKeySet
+    :return: dicionário ISSN -> tupla (primeiro ano, último ano)
+    """
+    ranges = {}
+
+    def update(issn, first_year, last_year):
+        if issn in ranges:
+            first_year = min(first_year, ranges[issn][0])
+            last_year = max(last_year, ranges[issn][1])
+        ranges[issn] = (first_year, last_year)
+
+    year_mask = (1 << YEAR_BITS) - 1
+    current, first_year, last_year = None, None, None
+    for k in keys.packed:
+        k >>= VOLUME_BITS
+        issn_code, year = k >> YEAR_BITS, k & year_mask
+        if issn_code != current:
+            if current is not None:
+                update(unpack_key(current << (YEAR_BITS + VOLUME_BITS))[0], first_year, last_year)
+            current, first_year = issn_code, year
+        last_year = year
+    if current is not None:
+        update(unpack_key(current << (YEAR_BITS + VOLUME_BITS))[0], first_year, last_year)
+
+    for k in keys.fallback:
+        parts = k.split('-', 2)
+        if len(parts) == 3 and len(parts[1]) == 4 and parts[1].isdigit():
+            update(parts[0], int(parts[1]), int(parts[1]))
+
+    return ranges
+
+
+def pack_validation_bases(db: dict):
+    """
+    Converte as bases de validação ISSN-ANO-VOLUME de um arquivo antigo (sets de strings) para PackedKeySet.
+
+    :param db: bases de correção
+    :return: bases de correção com as bases de validação empacotadas
+    """
+    for name in PACKED_BASES:
+        if isinstance(db.get(name), set):
+            db[name] = PackedKeySet(db[name])
+    return db
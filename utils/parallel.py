@@ -0,0 +1,128 @@
+import gc
+import multiprocessing
+import os
+
+from collections import deque
+from concurrent.futures import as_completed, FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+STANDARDIZE_WORKERS = int(os.environ.get('STANDARDIZE_WORKERS', '1'))
+
+# Quantidade máxima de lotes enviados ao pool e ainda não coletados, por processo
+MAX_PENDING_BATCHES_PER_WORKER = 2
+
+# Função aplicada aos lotes pelos processos do pool. É definida antes do fork e herdada pelos processos, para que a
+# função e o que ela referencia (como as bases de correção) não sejam serializados a cada lote
+_task = None
+
+
+def _run_task(batch):
+    return _task(batch)
+
+
+def _ready():
+    return os.getpid()
+
+
+class ForkPool:
+    """
+    Pool de processos criados por fork que aplicam func a lotes.
+
+    Os processos são criados na entrada do bloco with, depois que as bases de correção foram carregadas pelo processo
+    principal, de modo que as páginas de memória são compartilhadas por copy-on-write em vez de copiadas ou
+    recarregadas; os objetos existentes são retirados da coleta de lixo (gc.freeze) para que ela não altere essas
+    páginas. Apenas os lotes e os resultados são serializados. O pool deve ser criado antes de iniciar outras threads
+    (como as de utils.pipeline.Pipeline) e antes de criar clientes MongoDB, que mantêm conexões abertas e threads de
+    monitoramento: um fork de um processo com várias threads pode deixar nos processos filhos travas que pertenciam a
+    outras threads.
+
+    Com workers igual a 1, os lotes são tratados no próprio processo.
+    """
+
+    def __init__(self, func, workers=STANDARDIZE_WORKERS):
+        self.func = func
+        self.workers = workers
+        self.executor = None
+
+    def __enter__(self):
+        global _task
+
+        if self.workers <= 1:
+            return self
+
+        _task = self.func
+        gc.freeze()
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+
+        # Força a criação dos processos agora, e não na primeira submissão de um lote
+        for future in [self.executor.submit(_ready) for i in range(self.workers)]:
+            future.result()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _task
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+            self.executor = None
+            gc.unfreeze()
+            _task = None
+
+    def map(self, batches, ordered=True):
+        """
+        Aplica func a cada lote. Os lotes são lidos de batches à medida que os resultados são coletados, com no máximo
+        MAX_PENDING_BATCHES_PER_WORKER lotes pendentes por processo, o que limita a memória ocupada.
+
+        :param batches: iterável de lotes
+        :param ordered: se True, os resultados são entregues na ordem dos lotes; caso contrário, à medida que ficam
+        prontos
+        :return: gerador de resultados de func
+        """
+        if self.executor is None:
+            for batch in batches:
+                yield self.func(batch)
+            return
+
+        executor = self.executor
+        max_pending = self.workers * MAX_PENDING_BATCHES_PER_WORKER
+
+        if ordered:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(_run_task, batch))
+                if len(pending) >= max_pending:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+        else:
+            pending = set()
+            for batch in batches:
+                pending.add(executor.submit(_run_task, batch))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            for future in as_completed(pending):
+                yield future.result()
+
+
+def chunks(items, size: int):
+    """
+    Agrupa os itens de um iterável em lotes.
+
+    :param items: iterável
+    :param size: quantidade de itens por lote
+    :return: gerador de listas de itens
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
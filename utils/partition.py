@@ -0,0 +1,124 @@
+import argparse
+import logging
+
+
+# Critérios de particionamento da janela de documentos
+PARTITION_KEYS = ['date', 'id', 'collection']
+
+
+def parse_partition(value: str):
+    """
+    Converte o texto i/N, informado na linha de comando, na partição i (de 1 a N) de N partições.
+
+    :param value: texto no formato i/N
+    :return: tupla (i, N)
+    """
+    try:
+        index, count = (int(v) for v in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('partition must be i/N, such as 1/4')
+
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError('partition index must be between 1 and %d' % count)
+    return index, count
+
+
+def date_partition(from_date, until_date, index: int, count: int):
+    """
+    Obtém o filtro da partição index de count subintervalos de mesma duração da janela de datas.
+
+    :param from_date: data inicial da janela
+    :param until_date: data final da janela
+    :param index: partição, de 1 a count
+    :param count: quantidade de partições
+    :return: filtro MongoDB
+    """
+    step = (until_date - from_date) / count
+
+    processing_date = {}
+    if index > 1:
+        processing_date['$gte'] = from_date + step * (index - 1)
+    if index < count:
+        processing_date['$lt'] = from_date + step * index
+    return {'processing_date': processing_date} if processing_date else {}
+
+
+def id_partition(collection, query: dict, index: int, count: int):
+    """
+    Obtém o filtro da partição index de count intervalos de _id com quantidades aproximadamente iguais de documentos.
+    Os limites são os _id nas posições k * total / count da ordem de _id, de modo que execuções em outros hosts obtêm os
+    mesmos limites enquanto a coleção não muda.
+
+    :param collection: coleção de documentos do ArticleMeta
+    :param query: consulta da janela de datas
+    :param index: partição, de 1 a count
+    :param count: quantidade de partições
+    :return: filtro MongoDB
+    """
+    total = collection.count_documents(query)
+
+    def boundary(k):
+        for doc in collection.find(query, {'_id': 1}, sort=[('_id', 1)], skip=k * total // count, limit=1):
+            return doc['_id']
+
+    document_id = {}
+    if index > 1:
+        document_id['$gte'] = boundary(index - 1)
+    if index < count:
+        document_id['$lt'] = boundary(index)
+
+    # Partições vazias, se houver menos documentos que partições
+    if None in document_id.values():
+        return {'_id': {'$in': []}}
+    return {'_id': document_id} if document_id else {}
+
+
+def collection_partition(collection, query: dict, index: int, count: int):
+    """
+    Obtém o filtro da partição index de count grupos de coleções SciELO. As coleções são distribuídas, da maior para a
+    menor, à partição com menos documentos até então.
+
+    :param collection: coleção de documentos do ArticleMeta
+    :param query: consulta da janela de datas
+    :param index: partição, de 1 a count
+    :param count: quantidade de partições
+    :return: filtro MongoDB
+    """
+    sizes = {acronym: collection.count_documents({'$and': [query, {'collection': acronym}]})
+             for acronym in collection.distinct('collection', query)}
+
+    partitions = [[] for i in range(count)]
+    loads = [0] * count
+    for acronym in sorted(sizes, key=lambda a: (-sizes[a], a)):
+        lightest = loads.index(min(loads))
+        partitions[lightest].append(acronym)
+        loads[lightest] += sizes[acronym]
+
+    logging.info('Partition %d/%d: collections %s (%d documents)'
+                 % (index, count, ', '.join(partitions[index - 1]), loads[index - 1]))
+    return {'collection': {'$in': partitions[index - 1]}}
+
+
+def partition_filter(collection, query: dict, from_date, until_date, index: int, count: int, key='date'):
+    """
+    Obtém o filtro que restringe a janela de datas a uma de suas partições.
+
+    :param collection: coleção de documentos do ArticleMeta
+    :param query: consulta da janela de datas
+    :param from_date: data inicial da janela
+    :param until_date: data final da janela
+    :param index: partição, de 1 a count
+    :param count: quantidade de partições
+    :param key: critério de particionamento (date, id ou collection)
+    :return: filtro MongoDB
+    """
+    if count == 1:
+        return {}
+
+    if key == 'date':
+        return date_partition(from_date, until_date, index, count)
+    if key == 'id':
+        return id_partition(collection, query, index, count)
+    if key == 'collection':
+        return collection_partition(collection, query, index, count)
+    raise ValueError('Invalid partition key %s' % key)
@@ -0,0 +1,216 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', '4'))
+PIPELINE_STATS_INTERVAL = float(os.environ.get('PIPELINE_STATS_INTERVAL', '60'))
+
+# Intervalo, em segundos, em que uma etapa bloqueada em uma fila verifica se outra etapa falhou
+QUEUE_POLL_INTERVAL = 0.5
+
+# Marcador de fim dos itens de uma fila
+END = object()
+
+
+class PipelineAborted(Exception):
+    """
+    Interrompe uma etapa do pipeline quando outra etapa falha.
+    """
+
+
+class PipelineStage:
+    """
+    Contadores de uma etapa do pipeline: itens tratados e tempo ocupado, que exclui o tempo de espera nas filas.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+
+    def stats(self):
+        return {'items': self.items, 'busy-seconds': round(self.busy, 3)}
+
+
+class PipelineQueue(queue.Queue):
+    """
+    Fila limitada entre duas etapas do pipeline, que registra a maior profundidade observada.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.max_depth = 0
+
+    def _put(self, item):
+        super()._put(item)
+        self.max_depth = max(self.max_depth, len(self.queue))
+
+    def stats(self):
+        return {'depth': self.qsize(), 'max-depth': self.max_depth, 'maxsize': self.maxsize}
+
+
+class Pipeline:
+    """
+    Executa em paralelo as etapas de leitura, normalização e escrita: a leitura dos lotes em uma thread, a normalização
+    na thread principal (que pode distribuir os lotes entre os processos de um utils.parallel.ForkPool, criado antes de
+    run) e a escrita dos resultados em outra thread. As etapas são ligadas por filas limitadas: uma etapa mais rápida é
+    bloqueada quando a fila seguinte está cheia, de modo que E/S e CPU se sobrepõem e a memória ocupada pelos lotes em
+    trânsito é limitada.
+
+    Uma falha em qualquer etapa interrompe as demais e é relançada por run.
+    """
+
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE, stats_interval=PIPELINE_STATS_INTERVAL):
+        self.read_queue = PipelineQueue(queue_size)
+        self.write_queue = PipelineQueue(queue_size)
+        self.stages = {name: PipelineStage(name) for name in ('read', 'standardize', 'write')}
+
+        self.stats_interval = stats_interval
+        self.logged_at = time.perf_counter()
+
+        self.error = None
+        self.failed = threading.Event()
+
+        # Tempo de espera da etapa de normalização na fila de leitura, descontado do tempo ocupado
+        self.input_wait = 0.0
+
+    def _fail(self, error: BaseException):
+        if self.error is None:
+            self.error = error
+        self.failed.set()
+
+    def _put(self, q: queue.Queue, item):
+        while not self.failed.is_set():
+            try:
+                q.put(item, timeout=QUEUE_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+        raise PipelineAborted()
+
+    def _get(self, q: queue.Queue):
+        while not self.failed.is_set():
+            try:
+                return q.get(timeout=QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        raise PipelineAborted()
+
+    def _read(self, batches):
+        stage = self.stages['read']
+        try:
+            batches = iter(batches)
+            while True:
+                started_at = time.perf_counter()
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    break
+                stage.busy += time.perf_counter() - started_at
+                stage.items += 1
+
+                self._put(self.read_queue, batch)
+            self._put(self.read_queue, END)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def _inputs(self):
+        while True:
+            started_at = time.perf_counter()
+            batch = self._get(self.read_queue)
+            self.input_wait += time.perf_counter() - started_at
+
+            if batch is END:
+                return
+            yield batch
+
+    def _write(self, write, close):
+        stage = self.stages['write']
+        try:
+            while True:
+                result = self._get(self.write_queue)
+                if result is END:
+                    break
+
+                started_at = time.perf_counter()
+                write(result)
+                stage.busy += time.perf_counter() - started_at
+                stage.items += 1
+
+            if close:
+                started_at = time.perf_counter()
+                close()
+                stage.busy += time.perf_counter() - started_at
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+
+    def run(self, batches, standardize, write, close=None):
+        """
+        Executa o pipeline até que todos os lotes sejam lidos, normalizados e escritos.
+
+        :param batches: iterável de lotes, percorrido pela thread de leitura
+        :param standardize: função que recebe um iterável de lotes e retorna um iterável de resultados
+        :param write: função chamada pela thread de escrita com cada resultado
+        :param close: função chamada pela thread de escrita depois do último resultado
+        """
+        reader = threading.Thread(target=self._read, args=(batches,), name='pipeline-reader', daemon=True)
+        writer = threading.Thread(target=self._write, args=(write, close), name='pipeline-writer', daemon=True)
+        reader.start()
+        writer.start()
+
+        stage = self.stages['standardize']
+        results = None
+        try:
+            results = iter(standardize(self._inputs()))
+            while True:
+                started_at, input_wait = time.perf_counter(), self.input_wait
+                try:
+                    result = next(results)
+                except StopIteration:
+                    break
+                stage.busy += time.perf_counter() - started_at - (self.input_wait - input_wait)
+                stage.items += 1
+
+                self._put(self.write_queue, result)
+                self.maybe_log_stats()
+            self._put(self.write_queue, END)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Encerra a normalização interrompida (por exemplo, utils.parallel.ForkPool.map)
+            if hasattr(results, 'close'):
+                results.close()
+
+        reader.join()
+        writer.join()
+        self.log_stats()
+
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        """
+        Obtém os contadores das etapas e das filas do pipeline.
+
+        :return: dicionário com itens e tempo ocupado de cada etapa e profundidades de cada fila
+        """
+        stats = {name: stage.stats() for name, stage in self.stages.items()}
+        stats['queues'] = {'read': self.read_queue.stats(), 'write': self.write_queue.stats()}
+        return stats
+
+    def log_stats(self):
+        logging.info('Pipeline %s' % self.stats())
+        self.logged_at = time.perf_counter()
+
+    def maybe_log_stats(self):
+        if time.perf_counter() - self.logged_at >= self.stats_interval:
+            self.log_stats()
@@ -0,0 +1,233 @@
+import unicodedata
+
+from html import unescape
+from xylose.tools import get_date
+
+
+# Campos dos documentos do ArticleMeta lidos pela normalização: referências citadas, coleção e PID (e, nos registros
+# antigos, a coleção em v992), além dos campos de ordenação da leitura e dos checkpoints
+ARTICLE_META_PROJECTION = {
+    'citations': 1,
+    'collection': 1,
+    'article.v880': 1,
+    'article.v992': 1,
+    'title.v992': 1,
+    'processing_date': 1
+}
+
+
+def html_decode(text):
+    """
+    Decodifica entidades HTML e remove caracteres de controle, como xylose.scielodocument.html_decode, sem percorrer os
+    caracteres de textos que não contêm entidades nem caracteres não imprimíveis.
+
+    :param text: texto
+    :return: texto decodificado (ou o próprio valor, se não for um texto)
+    """
+    if not isinstance(text, str):
+        return text
+
+    if '&' in text:
+        text = unescape(text)
+    if text.isprintable():
+        return text
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] != 'C')
+
+
+def _first(data: dict, field: str, subfield='_'):
+    return data[field][0][subfield]
+
+
+def _person_authors(data: dict, field: str):
+    authors = []
+    for author in data.get(field, []):
+        author_dict = {}
+        if 's' in author:
+            author_dict['surname'] = html_decode(author['s'])
+        if 'n' in author:
+            author_dict['given_names'] = html_decode(author['n'])
+        if author_dict:
+            authors.append(author_dict)
+
+    if authors:
+        return authors
+
+
+class RawCitation:
+    """
+    Referência citada lida diretamente do registro ISIS (campos v*) de um documento do ArticleMeta. Expõe apenas os
+    atributos usados por Standardizer, com a mesma semântica dos de xylose.scielodocument.Citation, sem o restante do
+    modelo de objetos de xylose nem os avisos de depreciação emitidos a cada acesso a authors.
+    """
+
+    __slots__ = ('data', 'publication_type')
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.publication_type = self._publication_type()
+
+    def _publication_type(self):
+        data = self.data
+        if 'v30' in data:
+            return 'article'
+        elif 'v53' in data:
+            return 'conference'
+        elif 'v18' in data:
+            if 'v51' in data:
+                return 'thesis'
+            return 'book'
+        elif 'v150' in data:
+            return 'patent'
+        elif 'v37' in data:
+            return 'link'
+        return 'undefined'
+
+    @property
+    def source(self):
+        if self.publication_type == 'article' and 'v30' in self.data:
+            return html_decode(_first(self.data, 'v30'))
+
+        if self.publication_type in ('book', 'conference') and 'v18' in self.data:
+            return html_decode(_first(self.data, 'v18'))
+
+    @property
+    def publication_date(self):
+        data = self.data
+        if 'v65' in data:
+            return get_date(_first(data, 'v65'))
+
+        if self.publication_type == 'thesis' and 'v45' in data:
+            thesis_date = get_date(_first(data, 'v45'))
+            if thesis_date:
+                return thesis_date
+
+        if self.publication_type == 'conference' and 'v55' in data:
+            conference_date = get_date(_first(data, 'v55'))
+            if conference_date:
+                return conference_date
+
+    @property
+    def volume(self):
+        if self.publication_type in ('article', 'book') and 'v31' in self.data:
+            return _first(self.data, 'v31')
+
+    @property
+    def issue(self):
+        if self.publication_type == 'article' and 'v32' in self.data:
+            return _first(self.data, 'v32')
+
+    @property
+    def analytic_authors(self):
+        return _person_authors(self.data, 'v10')
+
+    @property
+    def monographic_authors(self):
+        return _person_authors(self.data, 'v16')
+
+    @property
+    def authors(self):
+        return (self.analytic_authors or []) + (self.monographic_authors or [])
+
+    def title(self):
+        """
+        Obtém o título da referência citada: o do artigo, da tese, do trabalho em evento ou da página, conforme o tipo.
+        """
+        if self.publication_type == 'thesis':
+            field = 'v18'
+        elif self.publication_type in ('article', 'conference', 'link'):
+            field = 'v12'
+        else:
+            return ''
+
+        if field in self.data:
+            return html_decode(_first(self.data, field)) or ''
+        return ''
+
+    @property
+    def chapter_title(self):
+        if self.publication_type == 'book' and 'v12' in self.data:
+            return html_decode(_first(self.data, 'v12'))
+
+    @property
+    def publisher(self):
+        if 'v62' in self.data:
+            return html_decode(_first(self.data, 'v62'))
+
+    @property
+    def publisher_address(self):
+        data = self.data
+        address = []
+        if 'v66' in data:
+            address.append(html_decode(_first(data, 'v66')))
+            if 'e' in data['v66'][0]:
+                address.append(html_decode(_first(data, 'v66', 'e')))
+
+        if 'v67' in data:
+            address.append(html_decode(_first(data, 'v67')))
+
+        if address:
+            return '; '.join(address)
+
+    @property
+    def start_page(self):
+        data = self.data
+        if 'v514' in data:
+            return html_decode(data['v514'][0].get('f', None))
+
+        if 'v14' not in data:
+            return None
+
+        return html_decode(_first(data, 'v14').split('-')[0])
+
+    @property
+    def end_page(self):
+        data = self.data
+        if 'v514' in data:
+            return html_decode(data['v514'][0].get('l', None))
+
+        if 'v14' not in data:
+            return None
+
+        pages = _first(data, 'v14').split('-')
+        if len(pages) != 2:
+            return None
+
+        return html_decode(pages[1])
+
+
+def document_citations(document: dict):
+    """
+    Obtém as referências citadas de um documento do ArticleMeta, como Article.citations.
+
+    :param document: documento do ArticleMeta (dicionário)
+    :return: lista de RawCitation ou None, se o documento não tiver referências citadas
+    """
+    citations = [RawCitation(c) for c in document.get('citations') or []]
+    if citations:
+        return citations
+
+
+def document_collection(document: dict):
+    """
+    Obtém o acrônimo da coleção de um documento do ArticleMeta, como Article.collection_acronym.
+
+    :param document: documento do ArticleMeta (dicionário)
+    :return: acrônimo da coleção
+    """
+    if 'collection' in document:
+        return document['collection']
+
+    for record in ('article', 'title'):
+        if 'v992' in document.get(record, {}):
+            v992 = document[record]['v992']
+            return v992[0]['_'] if isinstance(v992, list) else v992
+
+
+def document_pid(document: dict):
+    """
+    Obtém o PID de um documento do ArticleMeta, como Article.publisher_id.
+
+    :param document: documento do ArticleMeta (dicionário)
+    :return: PID
+    """
+    return document['article']['v880'][0]['_']
@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+
+from utils.bloom_filter import bloom_name, BloomFilter
+from utils.cache import LRUCache
+from utils.packed_keys import key_to_str, make_key, PackedKeySet
+from utils.volume_table import keys_from_list
+
+
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', '10000'))
+
+# Assinatura dos arquivos SQLite
+SQLITE_DB_MAGIC = b'SQLite format 3\x00'
+
+# Tipo de cada base: dicionários com valores em JSON, dicionários com valores em texto, conjuntos de strings,
+# conjuntos de chaves ISSN-ANO-VOLUME empacotadas ou filtros de Bloom
+SQLITE_BASE_KINDS = {
+    'issnl-to-data': 'json',
+    'issn-to-issnl': 'text',
+    'title-to-issnl': 'json',
+    'issn-year-volume': 'packed',
+    'title-year-volume': 'set',
+    'issn-year-volume-lr': 'packed',
+    'issn-year-volume-lr-ml1': 'packed',
+    'issn-to-equation': 'json',
+    'issn-year-volume-inferred': 'json',
+    'issn-year-volume-bloom': 'bloom',
+    'issn-year-volume-lr-bloom': 'bloom',
+    'issn-year-volume-lr-ml1-bloom': 'bloom',
+}
+
+# Conversão dos valores lidos em JSON para os tipos originais de cada base
+SQLITE_DECODERS = {
+    'title-to-issnl': set,
+    'issn-to-equation': tuple,
+    'issn-year-volume-inferred': keys_from_list,
+}
+
+# Sentinela que representa, no cache, chaves ausentes na base
+MISSING = object()
+
+
+def table_name(name: str):
+    """
+    Obtém o nome da tabela SQLite de uma base.
+
+    :param name: nome da base
+    :return: nome da tabela
+    """
+    return name.replace('-', '_')
+
+
+def write_sqlite_database(db_data: dict, path_db: str, metadata_keys=('version', 'creation-date', 'parent-version')):
+    """
+    Persiste as bases de correção em um arquivo SQLite, com uma tabela indexada por chave primária para cada base.
+
+    Dicionários são gravados em tabelas (key, value), com o valor em texto ou em JSON; conjuntos são gravados em
+    tabelas (key); conjuntos de chaves ISSN-ANO-VOLUME empacotadas são gravados em uma tabela de chaves inteiras e em uma
+    tabela auxiliar com as chaves não canônicas; filtros de Bloom são gravados em uma única linha.
+
+    :param db_data: dicionário de bases de correção
+    :param path_db: nome do arquivo a ser persistido
+    :param metadata_keys: metadados gravados na tabela metadata
+    """
+    if os.path.exists(path_db):
+        os.remove(path_db)
+
+    conn = sqlite3.connect(path_db)
+    with conn:
+        conn.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+        conn.executemany('INSERT INTO metadata VALUES (?, ?)', [(k, db_data[k]) for k in metadata_keys if k in db_data])
+
+        for name, kind in SQLITE_BASE_KINDS.items():
+            if name not in db_data:
+                continue
+
+            base = db_data[name]
+            table = table_name(name)
+
+            if kind == 'json':
+                conn.execute('CREATE TABLE %s (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID' % table)
+                conn.executemany('INSERT INTO %s VALUES (?, ?)' % table,
+                                 ((k, json.dumps(v, default=list)) for k, v in base.items()))
+            elif kind == 'text':
+                conn.execute('CREATE TABLE %s (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID' % table)
+                conn.executemany('INSERT INTO %s VALUES (?, ?)' % table, base.items())
+            elif kind == 'set':
+                conn.execute('CREATE TABLE %s (key TEXT PRIMARY KEY) WITHOUT ROWID' % table)
+                conn.executemany('INSERT INTO %s VALUES (?)' % table, ((k,) for k in base))
+            elif kind == 'bloom':
+                conn.execute('CREATE TABLE %s (num_bits INTEGER, num_hashes INTEGER, bits BLOB)' % table)
+                conn.execute('INSERT INTO %s VALUES (?, ?, ?)' % table, (base.num_bits, base.num_hashes, bytes(base.bits)))
+            else:
+                if not isinstance(base, PackedKeySet):
+                    base = PackedKeySet(base)
+                conn.execute('CREATE TABLE %s (key INTEGER PRIMARY KEY)' % table)
+                conn.executemany('INSERT INTO %s VALUES (?)' % table, ((k,) for k in base.packed))
+                conn.execute('CREATE TABLE %s_fallback (key TEXT PRIMARY KEY) WITHOUT ROWID' % table)
+                conn.executemany('INSERT INTO %s_fallback VALUES (?)' % table, ((k,) for k in base.fallback))
+    conn.close()
+
+
+class SqliteConnection:
+    """
+    Conexão somente leitura com o arquivo SQLite, reaberta automaticamente em processos criados por fork.
+    """
+
+    def __init__(self, path_db: str):
+        self.path_db = path_db
+        self.pid = None
+        self.conn = None
+
+    def execute(self, query: str, params=()):
+        if self.pid != os.getpid():
+            self.conn = sqlite3.connect('file:%s?mode=ro' % self.path_db, uri=True, check_same_thread=False)
+            self.pid = os.getpid()
+        return self.conn.execute(query, params)
+
+
+class SqliteTable:
+    """
+    Base de correção consultada no arquivo SQLite, com um cache LRU de leitura à frente.
+    """
+
+    def __init__(self, connection: SqliteConnection, name: str, cache_size=SQLITE_CACHE_SIZE):
+        self.connection = connection
+        self.name = name
+        self.kind = SQLITE_BASE_KINDS[name]
+        self.table = table_name(name)
+        self.decode = SQLITE_DECODERS.get(name)
+        self.cache = LRUCache(cache_size)
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM %s' % self.table).fetchone()[0]
+
+    def _lookup(self, key):
+        if self.kind == 'set':
+            row = self.connection.execute('SELECT 1 FROM %s WHERE key = ?' % self.table, (key,)).fetchone()
+            return True if row else MISSING
+
+        row = self.connection.execute('SELECT value FROM %s WHERE key = ?' % self.table, (key,)).fetchone()
+        if row is None:
+            return MISSING
+
+        if self.kind == 'text':
+            return row[0]
+
+        value = json.loads(row[0])
+        if self.decode:
+            value = self.decode(value)
+        return value
+
+    def get(self, key, default=None):
+        value = self.cache.get(key)
+        if value is None:
+            value = self._lookup(key)
+            self.cache.put(key, value)
+
+        if value is MISSING:
+            return default
+        # Valores mutáveis são copiados para que alterações feitas pelo chamador não afetem o cache
+        if isinstance(value, set):
+            return set(value)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def keys(self):
+        for row in self.connection.execute('SELECT key FROM %s ORDER BY key' % self.table):
+            yield row[0]
+
+    def __iter__(self):
+        return self.keys()
+
+    def items(self):
+        for k, v in self.connection.execute('SELECT key, value FROM %s ORDER BY key' % self.table):
+            if self.kind == 'json':
+                v = json.loads(v)
+                if self.decode:
+                    v = self.decode(v)
+            yield k, v
+
+
+class SqlitePackedTable:
+    """
+    Base de validação ISSN-ANO-VOLUME empacotada (ver utils.packed_keys) consultada no arquivo SQLite, com um cache LRU
+    de leitura à frente.
+    """
+
+    def __init__(self, connection: SqliteConnection, name: str, cache_size=SQLITE_CACHE_SIZE, bloom=None):
+        self.connection = connection
+        self.table = table_name(name)
+        self.cache = LRUCache(cache_size)
+        self.bloom = bloom
+
+    def __len__(self):
+        packed = self.connection.execute('SELECT COUNT(*) FROM %s' % self.table).fetchone()[0]
+        fallback = self.connection.execute('SELECT COUNT(*) FROM %s_fallback' % self.table).fetchone()[0]
+        return packed + fallback
+
+    def __contains__(self, key):
+        if isinstance(key, str) and key.count('-') == 2:
+            key = make_key(*key.split('-', 2))
+
+        found = self.cache.get(key)
+        if found is None:
+            # Chaves descartadas pelo filtro de Bloom não são consultadas no arquivo nem ocupam o cache
+            if self.bloom is not None and key not in self.bloom:
+                return False
+
+            table = self.table if isinstance(key, int) else self.table + '_fallback'
+            found = self.connection.execute('SELECT 1 FROM %s WHERE key = ?' % table, (key,)).fetchone() is not None
+            self.cache.put(key, found)
+        return found
+
+    def __iter__(self):
+        for k in self.packed_keys():
+            yield key_to_str(k)
+        yield from self.fallback_keys()
+
+    def packed_keys(self):
+        for row in self.connection.execute('SELECT key FROM %s ORDER BY key' % self.table):
+            yield row[0]
+
+    def fallback_keys(self):
+        for row in self.connection.execute('SELECT key FROM %s_fallback' % self.table):
+            yield row[0]
+
+
+class SqliteDatabase:
+    """
+    Bases de correção consultadas em um arquivo SQLite, sem serem carregadas em memória.
+    """
+
+    def __init__(self, path_db: str, cache_size=SQLITE_CACHE_SIZE):
+        self.connection = SqliteConnection(path_db)
+        self.cache_size = cache_size
+
+        self.metadata = dict(self.connection.execute('SELECT key, value FROM metadata').fetchall())
+        self.names = [r[0] for r in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+        self.tables = {}
+
+    def __contains__(self, name):
+        return name in self.metadata or table_name(name) in self.names
+
+    def __getitem__(self, name):
+        if name in self.metadata:
+            return self.metadata[name]
+
+        if name not in self.tables:
+            if name not in SQLITE_BASE_KINDS or table_name(name) not in self.names:
+                raise KeyError(name)
+
+            if SQLITE_BASE_KINDS[name] == 'packed':
+                # O filtro de Bloom da base, se houver, é mantido em memória e descarta chaves ausentes sem consultas
+                self.tables[name] = SqlitePackedTable(self.connection, name, self.cache_size, self.get(bloom_name(name)))
+            elif SQLITE_BASE_KINDS[name] == 'bloom':
+                num_bits, num_hashes, bits = self.connection.execute('SELECT * FROM %s' % table_name(name)).fetchone()
+                self.tables[name] = BloomFilter(num_bits, num_hashes, bits)
+            else:
+                self.tables[name] = SqliteTable(self.connection, name, self.cache_size)
+        return self.tables[name]
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def keys(self):
+        return list(self.metadata) + [n for n in SQLITE_BASE_KINDS if table_name(n) in self.names]
+
+    def cache_stats(self):
+        """
+        Obtém os contadores dos caches de leitura de cada base.
+
+        :return: dicionário com os contadores de cada cache
+        """
+        return {n: t.cache.stats() for n, t in self.tables.items() if not isinstance(t, BloomFilter)}
@@ -1,6 +1,9 @@
+import os
+
 from datetime import datetime
 from xylose.scielodocument import Citation
-from utils.citation_utils import clean_author, clean_end_page, citation_id
+from utils.cache import LRUCache
+from utils.citation_utils import clean_author_name, clean_end_page, citation_id
 from utils.field_processor import (
     preprocess_journal_title,
     preprocess_publication_date,
@@ -9,13 +12,58 @@ from utils.field_processor import (
     preprocess_volume
 )
 from utils.journal_standardizer import STATUS_NOT_NORMALIZED
+from utils.string_processor import apply_distinct
+
+
+STANDARDIZER_MEMO_SIZE = int(os.environ.get('STANDARDIZER_MEMO_SIZE', '0'))
+STANDARDIZER_MEMO_MAX_MB = float(os.environ.get('STANDARDIZER_MEMO_MAX_MB', '64'))
+
+# Campos cujos valores normalizados são memorizados quando os caches de normalização estão ativos
+MEMO_FIELDS = ['journal-title', 'title', 'publisher', 'publisher-address', 'author']
+
+# Sentinela que representa, nos caches de normalização, valores ainda não normalizados
+MISSING = object()
+
+
+def preprocess_lower(text):
+    return preprocess_default(text).lower()
+
+
+def clean_author_name_lower(surname, given_names):
+    return clean_author_name(surname, given_names).lower()
+
+
+def publication_kind(citation: Citation):
+    """
+    Obtém o tipo de normalização de uma referência citada.
+
+    :param citation: referência citada
+    :return: 'article', 'chapter', 'book' ou None (referência citada não normalizada)
+    """
+    if citation.publication_type == 'article':
+        return 'article'
+    elif citation.publication_type == 'book':
+        if citation.chapter_title:
+            return 'chapter'
+        return 'book'
 
 
 class Standardizer:
-    def __init__(self, journal_standardizer):
+    def __init__(self, journal_standardizer, memo_size=STANDARDIZER_MEMO_SIZE, memo_max_mb=STANDARDIZER_MEMO_MAX_MB):
         self.jstd = journal_standardizer
 
+        # Caches opcionais dos valores normalizados de campos muito repetidos (títulos, editoras, autores), um por
+        # campo, com memo_size itens e memo_max_mb MB divididos igualmente entre os campos; desativados com memo_size
+        # igual a 0
+        self.memos = {}
+        if memo_size > 0:
+            max_bytes = int(memo_max_mb * 2 ** 20 / len(MEMO_FIELDS))
+            self.memos = {f: LRUCache(memo_size, max_bytes) for f in MEMO_FIELDS}
+
     def standardize(self, citation: Citation, collection: str):
+        # Troca a base de correção entre referências citadas, caso uma nova versão tenha sido carregada
+        self.jstd.maybe_swap()
+
         cit_std = {'_id': citation_id(citation, collection),
                    'update-date': datetime.now()}
 
@@ -29,6 +77,89 @@ class Standardizer:
 
         return cit_std
 
+    def standardize_many(self, citations: list, collection: str):
+        """
+        Normaliza uma lista de referências citadas de uma coleção, com resultado idêntico ao de standardize aplicado a
+        cada uma delas. Cada campo é tratado em lote: os valores de todas as referências citadas são deduplicados,
+        tratados uma única vez e distribuídos de volta; os periódicos são casados uma única vez por título limpo e
+        validados uma única vez por título, ano e volume (ver _standardize_journals).
+
+        :param citations: lista de referências citadas
+        :param collection: acrônimo da coleção
+        :return: lista de referências citadas normalizadas, alinhada com citations
+        """
+        self.jstd.maybe_swap()
+
+        results = []
+        indexes = {}
+        for i, citation in enumerate(citations):
+            results.append({'_id': citation_id(citation, collection), 'update-date': datetime.now()})
+
+            kind = publication_kind(citation)
+            if kind:
+                indexes.setdefault(kind, []).append(i)
+
+        for kind, kind_indexes in indexes.items():
+            kind_citations = [citations[i] for i in kind_indexes]
+
+            columns = []
+            for key, getter, normalizer in self._fields(kind):
+                values = [getter(c) for c in kind_citations]
+                if key == 'std_journal':
+                    columns.append((key, self._standardize_journals(kind_citations, values)))
+                elif key in ('std_authors', 'std_book_authors'):
+                    columns.append((key, self._standardize_authors_many(values)))
+                elif key == 'std_pages':
+                    columns.append((key, [dict(v) for v in apply_distinct(normalizer, values)]))
+                else:
+                    columns.append((key, apply_distinct(normalizer, values)))
+
+            for j, i in enumerate(kind_indexes):
+                results[i]['publication_type'] = kind
+                for key, column in columns:
+                    results[i][key] = column[j]
+
+        return results
+
+    def _fields(self, kind: str):
+        """
+        Obtém os campos normalizados de um tipo de referência citada, na ordem de standardize_article,
+        standardize_chapter e standardize_book.
+
+        :param kind: tipo de referência citada ['article', 'chapter', 'book']
+        :return: lista de tuplas (nome do campo, função que extrai o valor da referência citada, função de tratamento)
+        """
+        pages = lambda p: self._standardize_pages(*p)
+
+        if kind == 'article':
+            return [
+                ('std_journal', lambda c: c.source, None),
+                ('std_authors', lambda c: c.authors, None),
+                ('std_publication_date', lambda c: c.publication_date, self._standardize_date),
+                ('std_title', lambda c: c.title(), self._standardize_title),
+                ('std_volume', lambda c: c.volume, self._standardize_volume),
+                ('std_pages', lambda c: (c.start_page, c.end_page), pages),
+                ('std_issue', lambda c: c.issue, self._standardize_issue)
+            ]
+        elif kind == 'chapter':
+            return [
+                ('std_authors', lambda c: c.authors, None),
+                ('std_title', lambda c: c.chapter_title, self._standardize_title),
+                ('std_book_authors', lambda c: c.monographic_authors, None),
+                ('std_book_title', lambda c: c.title(), self._standardize_title),
+                ('std_date', lambda c: c.publication_date, self._standardize_date),
+                ('std_pages', lambda c: (c.start_page, c.end_page), pages),
+                ('std_publisher', lambda c: c.publisher, self._standardize_publisher),
+                ('std_publisher_address', lambda c: c.publisher_address, self._standardize_publisher_address)
+            ]
+        return [
+            ('std_authors', lambda c: c.authors, None),
+            ('std_date', lambda c: c.publication_date, self._standardize_date),
+            ('std_title', lambda c: c.title(), self._standardize_title),
+            ('std_publisher', lambda c: c.publisher, self._standardize_publisher),
+            ('std_publisher_address', lambda c: c.publisher_address, self._standardize_publisher_address)
+        ]
+
     def standardize_article(self, citation: Citation):
         return {
             'publication_type': 'article',
@@ -64,23 +195,117 @@ class Standardizer:
             'std_publisher_address': self._standardize_publisher_address(citation.publisher_address)
         }
 
-    def _standardize_journal(self, citation: Citation):
-        cleaned_journal_title = preprocess_journal_title(citation.source, discard_invalid_chars=True, toggle_upper=True)
+    def memo_stats(self):
+        """
+        Obtém os contadores dos caches de normalização de cada campo.
+
+        :return: dicionário com os contadores de cada cache (vazio se os caches estiverem desativados)
+        """
+        return {f: m.stats() for f, m in self.memos.items()}
+
+    def _memoized(self, field: str, func, *args):
+        memo = self.memos.get(field)
+        if memo is None:
+            return func(*args)
+
+        value = memo.get(args, MISSING)
+        if value is MISSING:
+            value = func(*args)
+            memo.put(args, value)
+        return value
+
+    def _clean_journal_title(self, journal_title):
+        return self._memoized('journal-title', preprocess_journal_title, journal_title, True, True)
+
+    def _clean_author(self, author):
+        if not author:
+            return ''
+        return self._memoized('author', clean_author_name_lower, author.get('surname', ''),
+                              author.get('given_names', ''))
+
+    def _standardize_journal(self, citation: Citation, cleaned_journal_title=None):
+        if cleaned_journal_title is None:
+            cleaned_journal_title = self._clean_journal_title(citation.source)
+
         std_journal = self.jstd.standardize_journal(citation, cleaned_journal_title, 'exact')
 
         if std_journal['status'] == STATUS_NOT_NORMALIZED:
             std_journal = self.jstd.standardize_journal(citation, cleaned_journal_title, 'fuzzy')
 
+        if std_journal['status'] == STATUS_NOT_NORMALIZED and self.jstd.use_approximate:
+            std_journal = self.jstd.standardize_journal(citation, cleaned_journal_title, 'approximate')
+
         std_journal['cited-journal-title'] = cleaned_journal_title
 
         return std_journal
 
+    def _standardize_journals(self, citations: list, journal_titles: list):
+        """
+        Normaliza os periódicos de uma lista de referências citadas, com resultado idêntico ao de _standardize_journal
+        aplicado a cada uma delas. As referências citadas são agrupadas pelo título limpo, e cada modo de casamento é
+        aplicado uma única vez a cada grupo, apenas às referências citadas ainda não normalizadas.
+
+        :param citations: lista de referências citadas
+        :param journal_titles: títulos de periódicos citados, alinhados com citations
+        :return: lista de dicionários de dados normalizados dos periódicos, alinhada com citations
+        """
+        cleaned_journal_titles = apply_distinct(self._clean_journal_title, journal_titles)
+
+        title_groups = {}
+        for i, cleaned_journal_title in enumerate(cleaned_journal_titles):
+            title_groups.setdefault(cleaned_journal_title, []).append(i)
+
+        modes = ['exact', 'fuzzy'] + (['approximate'] if self.jstd.use_approximate else [])
+
+        results = [None] * len(citations)
+        for cleaned_journal_title, indexes in title_groups.items():
+            for mode in modes:
+                group_results = self.jstd.standardize_journal_group([citations[i] for i in indexes],
+                                                                    cleaned_journal_title, mode)
+
+                not_normalized = []
+                for i, result in zip(indexes, group_results):
+                    results[i] = result
+                    if result[0] == STATUS_NOT_NORMALIZED:
+                        not_normalized.append(i)
+
+                indexes = not_normalized
+                if not indexes:
+                    break
+
+        std_journals = []
+        for result, cleaned_journal_title in zip(results, cleaned_journal_titles):
+            std_journal = self.jstd.mount_std_journal_data(*result)
+            std_journal['cited-journal-title'] = cleaned_journal_title
+            std_journals.append(std_journal)
+        return std_journals
+
+    def _standardize_authors_many(self, authors_lists: list):
+        names = [(a.get('surname', ''), a.get('given_names', ''))
+                 for authors in authors_lists if authors for a in authors if a]
+        cleaned_names = dict(zip(names, apply_distinct(lambda n: self._memoized('author', clean_author_name_lower, *n),
+                                                       names)))
+
+        std_authors_lists = []
+        for authors in authors_lists:
+            std_authors = []
+
+            if authors:
+                for a in authors:
+                    cleaned_author = cleaned_names[(a.get('surname', ''), a.get('given_names', ''))] if a else ''
+                    if cleaned_author:
+                        std_authors.append(cleaned_author)
+
+            std_authors_lists.append(std_authors)
+
+        return std_authors_lists
+
     def _standardize_authors(self, authors):
         std_authors = []
 
         if authors:
             for a in authors:
-                cleaned_author = clean_author(a)
+                cleaned_author = self._clean_author(a)
                 if cleaned_author:
                     std_authors.append(cleaned_author)
 
@@ -113,10 +338,10 @@ class Standardizer:
         return preprocess_issue(issue)
 
     def _standardize_title(self, title):
-        return preprocess_default(title).lower()
+        return self._memoized('title', preprocess_lower, title)
 
     def _standardize_publisher(self, publisher):
-        return preprocess_default(publisher).lower()
+        return self._memoized('publisher', preprocess_lower, publisher)
 
     def _standardize_publisher_address(self, publisher_address):
-        return preprocess_default(publisher_address).lower()
+        return self._memoized('publisher-address', preprocess_lower, publisher_address)
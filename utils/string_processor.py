@@ -7,6 +7,34 @@ parenthesis_pattern = re.compile(r'[-a-zA-ZÀ-ÖØ-öø-ÿ|0-9]*\([-a-zA-ZÀ-Ö
 doi_pattern = re.compile(r'\d{2}\.\d+/.*$')
 special_chars = ['@', '&']
 special_words = ['IMPRESSO', 'ONLINE', 'CDROM', 'PRINT', 'ELECTRONIC']
+special_words_pattern = re.compile('|'.join(special_words))
+
+
+def make_alpha_num_space_table(include_special_chars=False, case=None):
+    """
+    Cria tabela de str.translate equivalente a alpha_num_space (seguida de str.upper ou str.lower, se solicitado)
+    para textos ASCII.
+    :param include_special_chars: booleano que indica se os caracteres especiais devem ou não ser mantidos
+    :param case: 'upper', 'lower' ou None, para manter a caixa dos caracteres
+    :return: tabela de tradução dos caracteres ASCII
+    """
+    table = {}
+    for i in range(128):
+        character = chr(i)
+        if character.isalnum() or character.isspace() or (include_special_chars and character in special_chars):
+            if case == 'upper':
+                table[i] = character.upper()
+            elif case == 'lower':
+                table[i] = character.lower()
+        else:
+            table[i] = ' '
+    return table
+
+
+# Tabelas de str.translate usadas no tratamento de títulos de periódicos
+invalid_chars_table = {i: None for i in range(32)}
+invalid_chars_table.update({11: ' ', 127: None})
+journal_title_upper_table = make_alpha_num_space_table(include_special_chars=True, case='upper')
 
 
 def remove_invalid_chars(text):
@@ -61,6 +89,22 @@ def remove_double_spaces(text):
     return text.strip()
 
 
+def apply_distinct(func, values, *args, **kwargs):
+    """
+    Aplica func uma única vez a cada valor distinto de values e distribui os resultados na ordem original.
+    :param func: função de tratamento de um valor
+    :param values: lista de valores (por exemplo, um mesmo campo de várias referências citadas)
+    :param args: demais argumentos posicionais de func
+    :param kwargs: demais argumentos nomeados de func
+    :return: lista de valores tratados, alinhada com values
+    """
+    results = {}
+    for v in values:
+        if v not in results:
+            results[v] = func(v, *args, **kwargs)
+    return [results[v] for v in values]
+
+
 def preprocess_author_name(text):
     """
     Procedimento que trata nome de autor.
@@ -86,6 +130,46 @@ def preprocess_doi(text):
         return doi[0]
 
 
+def translate_journal_title(text, title_special_words, title_special_words_pattern, table,
+                            use_remove_invalid_chars=False, title_parenthesis_pattern=parenthesis_pattern):
+    """
+    Trata título de periódico com tabelas de str.translate, em resultado idêntico ao das etapas descritas em
+    preprocess_journal_title.
+    Caracteres inválidos são removidos por tradução; os dados entre parênteses e as palavras especiais são removidos
+    apenas se o título contiver parênteses ou alguma das palavras (procuradas por uma única expressão regular); acentos
+    são removidos apenas de títulos não ASCII; a manutenção de caracteres alpha, numéricos e espaços e a mudança de
+    caixa são feitas em uma única tradução; e os espaços duplos são removidos por um único split/join.
+    :param text: título do periódico a ser tratado
+    :param title_special_words: palavras especiais, removidas na ordem da lista
+    :param title_special_words_pattern: expressão regular que encontra qualquer uma das palavras especiais
+    :param table: tabela de tradução criada por make_alpha_num_space_table
+    :param use_remove_invalid_chars: boolenano que indica se deve ou não ser aplicada remoção de caracteres inválidos
+    :param title_parenthesis_pattern: expressão regular que encontra dados entre parênteses
+    :return: título tratado do periódico
+    """
+    text = html.unescape(text)
+
+    # Caracteres inválidos não são imprimíveis; a tradução é feita apenas se houver algum caractere não imprimível
+    if use_remove_invalid_chars and not text.isprintable():
+        text = text.translate(invalid_chars_table)
+
+    if '(' in text:
+        parenthesis_search = title_parenthesis_pattern.search(text)
+        while parenthesis_search is not None:
+            text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
+            parenthesis_search = title_parenthesis_pattern.search(text)
+
+    # A remoção sequencial das palavras especiais é mantida, pois a remoção de uma palavra pode formar outra
+    if title_special_words_pattern.search(text):
+        for sw in title_special_words:
+            text = text.replace(sw, '')
+
+    if not text.isascii():
+        text = remove_accents(text)
+
+    return ' '.join(filter(None, text.translate(table).split(' '))).strip()
+
+
 def preprocess_journal_title(text, use_remove_invalid_chars=False):
     """
     Procedimento para tratar título de periódico.
@@ -102,20 +186,14 @@ def preprocess_journal_title(text, use_remove_invalid_chars=False):
     :param use_remove_invalid_chars: boolenano que indica se deve ou não ser aplicada remoção de caracteres inválidos
     :return: título tratado do periódico
     """
-    # Trata conteúdo HTML
-    text = html.unescape(text)
+    return translate_journal_title(text, special_words, special_words_pattern, journal_title_upper_table,
+                                   use_remove_invalid_chars)
 
-    # Caso solicitado, remove caracteres inválidos
-    if use_remove_invalid_chars:
-        text = remove_invalid_chars(text)
 
-    # Remove parenteses e conteúdo interno
-    parenthesis_search = re.search(parenthesis_pattern, text)
-    while parenthesis_search is not None:
-        text = text[:parenthesis_search.start()] + text[parenthesis_search.end():]
-        parenthesis_search = re.search(parenthesis_pattern, text)
-
-    # Remove palavras especiais
-    for sw in special_words:
-        text = text.replace(sw, '')
-    return remove_double_spaces(alpha_num_space(remove_accents(text), include_special_chars=True)).upper()
+def preprocess_author_name_batch(texts):
+    """
+    Trata uma lista de nomes de autores, aplicando preprocess_author_name uma vez a cada nome distinto.
+    :param texts: lista de nomes de autores
+    :return: lista de nomes tratados, alinhada com texts
+    """
+    return apply_distinct(preprocess_author_name, texts)
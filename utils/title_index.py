@@ -0,0 +1,406 @@
+import re
+
+from array import array
+from bisect import bisect_left
+
+
+# Maior caractere Unicode, usado como sentinela para localizar o fim de uma faixa de prefixos
+MAX_CHAR = chr(0x10FFFF)
+
+# Tamanho dos n-gramas usados para localizar as palavras do vocabulário que contêm uma palavra citada
+GRAM_SIZE = 3
+
+# Caracteres que não podem ocorrer entre as palavras citadas, conforme o padrão [\w|\s]* do casamento aproximado
+PATTERN_INVALID_GAP_CHAR = re.compile(r'[^\w|\s]', re.UNICODE)
+
+# Caracteres com significado especial em expressões regulares
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
+
+# Tamanho mínimo das palavras comparadas de modo tolerante a erros de digitação; palavras menores devem casar exatamente
+APPROXIMATE_MIN_WORD_LENGTH = 4
+
+# Quantidade máxima de palavras citadas cujas palavras do vocabulário associadas são memorizadas
+TOKEN_IDS_CACHE_SIZE = 100000
+
+
+def fuzzy_pattern(words: list):
+    """
+    Monta a expressão regular do casamento aproximado: as palavras citadas devem ocorrer, em ordem, no título oficial,
+    separadas apenas por caracteres alfanuméricos, espaços ou barras verticais.
+
+    :param words: palavras do título citado
+    :return: expressão regular compilada
+    """
+    return re.compile(r'[\w|\s]*'.join(words) + r'[\w|\s]*', re.UNICODE)
+
+
+def match_ordered_words(words: list, title: str, invalid_positions=()):
+    """
+    Verifica, sem expressões regulares, se title casa com fuzzy_pattern(words).
+
+    Se o título não possui caracteres inválidos entre palavras, basta localizar cada palavra citada após o fim da anterior
+    (a primeira deve iniciar o título). Caso contrário, as ocorrências de cada palavra são testadas com retrocesso,
+    desde que o trecho entre elas não contenha um caractere inválido.
+
+    :param words: palavras do título citado
+    :param title: título oficial
+    :param invalid_positions: posições ordenadas dos caracteres de title que não casam com [\w|\s]
+    :return: True se as palavras citadas ocorrem, em ordem, no título oficial
+    """
+    if not title.startswith(words[0]):
+        return False
+
+    if not invalid_positions:
+        pos = len(words[0])
+        for word in words[1:]:
+            pos = title.find(word, pos)
+            if pos < 0:
+                return False
+            pos += len(word)
+        return True
+
+    return _match_ordered_words_from(words, 1, len(words[0]), title, invalid_positions)
+
+
+def _match_ordered_words_from(words: list, i: int, pos: int, title: str, invalid_positions):
+    k = bisect_left(invalid_positions, pos)
+    limit = invalid_positions[k] if k < len(invalid_positions) else len(title)
+
+    if i == len(words):
+        return limit == len(title)
+
+    start = title.find(words[i], pos)
+    while 0 <= start <= limit:
+        if _match_ordered_words_from(words, i + 1, start + len(words[i]), title, invalid_positions):
+            return True
+        start = title.find(words[i], start + 1)
+
+    return False
+
+
+def edit_distance(a: str, b: str, max_distance: int):
+    """
+    Calcula a distância de edição (Levenshtein) entre a e b, interrompendo o cálculo quando ela excede max_distance.
+
+    :param a: palavra
+    :param b: palavra
+    :param max_distance: distância máxima de interesse
+    :return: distância de edição ou max_distance + 1, caso ela seja maior que max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current_row = [i]
+        for j, cb in enumerate(b, 1):
+            current_row.append(min(previous_row[j] + 1, current_row[j - 1] + 1, previous_row[j - 1] + (ca != cb)))
+
+        if min(current_row) > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+
+    return min(previous_row[-1], max_distance + 1)
+
+
+def deletes(word: str, max_distance: int):
+    """
+    Obtém as variações de word formadas pela remoção de até max_distance caracteres, incluindo a própria palavra.
+
+    :param word: palavra
+    :param max_distance: quantidade máxima de caracteres removidos
+    :return: set de variações de word
+    """
+    variations = {word}
+
+    level = {word}
+    for _ in range(max_distance):
+        level = set(w[:i] + w[i + 1:] for w in level for i in range(len(w)))
+        variations.update(level)
+
+    return variations
+
+
+class TitlePrefixIndex:
+    """
+    Índice de prefixos sobre os títulos oficiais de title-to-issnl.
+
+    Mantém os títulos em um array ordenado, de modo que os títulos que iniciam com um dado prefixo ocupam uma faixa
+    contígua do array, localizada por busca binária. Para os poucos títulos com caracteres que não casam com [\w|\s],
+    guarda as posições desses caracteres, usadas por match_ordered_words.
+    """
+
+    def __init__(self, title_to_issnl):
+        self.titles = sorted(title_to_issnl.keys())
+
+        self.invalid_positions = {}
+        for title in self.titles:
+            positions = tuple(m.start() for m in PATTERN_INVALID_GAP_CHAR.finditer(title))
+            if positions:
+                self.invalid_positions[title] = positions
+
+    def __len__(self):
+        return len(self.titles)
+
+    def range(self, prefix: str):
+        """
+        Obtém a faixa do array ordenado ocupada pelos títulos que iniciam com prefix.
+
+        :param prefix: prefixo procurado
+        :return: tupla (início, fim) da faixa de títulos
+        """
+        start = bisect_left(self.titles, prefix)
+
+        end = bisect_left(self.titles, prefix + MAX_CHAR, start)
+        while end < len(self.titles) and self.titles[end].startswith(prefix):
+            end += 1
+
+        return start, end
+
+    def startswith(self, prefix: str):
+        """
+        Obtém os títulos oficiais que iniciam com prefix.
+
+        :param prefix: prefixo procurado
+        :return: lista de títulos oficiais que iniciam com prefix
+        """
+        start, end = self.range(prefix)
+        return self.titles[start:end]
+
+    def candidates(self, words: list):
+        """
+        Obtém os títulos oficiais candidatos a casar com as palavras de um título citado.
+
+        :param words: palavras do título citado
+        :return: lista de títulos oficiais que iniciam com a primeira palavra citada
+        """
+        return self.startswith(words[0])
+
+    def match(self, words: list):
+        """
+        Obtém os títulos oficiais em que as palavras citadas ocorrem, em ordem, sendo a primeira delas o início do título.
+
+        :param words: palavras do título citado
+        :return: lista de títulos oficiais casados
+        """
+        # Palavras com caracteres especiais são interpretadas como expressão regular, tal como no padrão original
+        if REGEX_SPECIAL_CHARS.intersection(''.join(words)):
+            title_pattern = fuzzy_pattern(words)
+            return [t for t in self.startswith(words[0]) if title_pattern.fullmatch(t)]
+
+        first_word_length = len(words[0])
+        next_words = words[1:]
+
+        matched_titles = []
+        for title in self.candidates(words):
+            if title in self.invalid_positions:
+                if match_ordered_words(words, title, self.invalid_positions[title]):
+                    matched_titles.append(title)
+                continue
+
+            # Os candidatos já iniciam com a primeira palavra; basta localizar as demais, em ordem
+            pos = first_word_length
+            for word in next_words:
+                pos = title.find(word, pos)
+                if pos < 0:
+                    break
+                pos += len(word)
+            else:
+                matched_titles.append(title)
+
+        return matched_titles
+
+
+class TitleTokenIndex(TitlePrefixIndex):
+    """
+    Índice invertido de palavras sobre os títulos oficiais de title-to-issnl.
+
+    Cada palavra dos títulos oficiais aponta para a lista ordenada (posting list) dos identificadores dos títulos que a
+    contêm. Como uma palavra citada pode ser apenas parte de uma palavra oficial (e.g. REV em REVISTA), as palavras do
+    vocabulário que contêm uma palavra citada são localizadas por um índice de n-gramas sobre o vocabulário.
+    """
+
+    def __init__(self, title_to_issnl):
+        super().__init__(title_to_issnl)
+
+        token_to_titles = {}
+        for i, title in enumerate(self.titles):
+            for token in set(title.split(' ')):
+                if token:
+                    token_to_titles.setdefault(token, array('I')).append(i)
+
+        self.tokens = sorted(token_to_titles)
+        self.postings = [token_to_titles[t] for t in self.tokens]
+
+        self.grams = {}
+        for i, token in enumerate(self.tokens):
+            for g in set(token[j:j + GRAM_SIZE] for j in range(len(token) - GRAM_SIZE + 1)):
+                self.grams.setdefault(g, array('I')).append(i)
+
+        self.token_ids_cache = {}
+
+    def token_ids(self, word: str):
+        """
+        Obtém os identificadores das palavras do vocabulário que contêm word e o tamanho somado de suas posting lists.
+        Como as palavras citadas se repetem muito (e.g. REV, BRAS, SAUDE), os resultados são memorizados.
+
+        :param word: palavra citada
+        :return: tupla (identificadores de palavras, tamanho somado das posting lists) ou None, caso word seja curta
+        demais para ser indexada
+        """
+        if len(word) < GRAM_SIZE:
+            return None
+
+        cached = self.token_ids_cache.get(word)
+        if cached is not None:
+            return cached
+
+        ids = ()
+        grams = [self.grams.get(g) for g in set(word[j:j + GRAM_SIZE] for j in range(len(word) - GRAM_SIZE + 1))]
+        if None not in grams:
+            grams.sort(key=len)
+            candidate_ids = set(grams[0])
+            for g in grams[1:]:
+                candidate_ids.intersection_update(g)
+            ids = tuple(i for i in candidate_ids if word in self.tokens[i])
+
+        if len(self.token_ids_cache) >= TOKEN_IDS_CACHE_SIZE:
+            self.token_ids_cache.clear()
+        self.token_ids_cache[word] = ids, sum(len(self.postings[i]) for i in ids)
+
+        return self.token_ids_cache[word]
+
+    def candidates(self, words: list):
+        """
+        Obtém os títulos oficiais candidatos a casar com as palavras de um título citado, intersectando as posting lists
+        de cada palavra citada, da menor para a maior, restritas à faixa de títulos que iniciam com a primeira palavra.
+        Quando o conjunto de candidatos fica menor que a próxima posting list, as palavras restantes são verificadas
+        diretamente nos títulos candidatos.
+
+        :param words: palavras do título citado
+        :return: lista de títulos oficiais que contêm todas as palavras citadas e iniciam com a primeira delas
+        """
+        start, end = self.range(words[0])
+        if start == end:
+            return []
+
+        # A primeira palavra já é garantida pela faixa de prefixos
+        lists = []
+        for word in set(words[1:]):
+            token_ids = self.token_ids(word)
+            if token_ids is not None:
+                ids, size = token_ids
+                if not ids:
+                    return []
+                lists.append((size, word, ids))
+        lists.sort()
+
+        candidates = None
+        for size, word, ids in lists:
+            if candidates is None and size >= end - start:
+                candidates = set(i for i in range(start, end) if word in self.titles[i])
+            elif candidates is None:
+                candidates = set(i for t in ids for i in self.postings[t] if start <= i < end)
+            elif len(candidates) <= size:
+                candidates = set(i for i in candidates if word in self.titles[i])
+            else:
+                candidates.intersection_update(i for t in ids for i in self.postings[t])
+
+            if not candidates:
+                return []
+
+        if candidates is None:
+            return self.titles[start:end]
+
+        return [self.titles[i] for i in sorted(candidates)]
+
+
+class TitleApproximateIndex:
+    """
+    Índice de casamento tolerante a erros de digitação sobre os títulos oficiais de title-to-issnl.
+
+    Um título oficial casa com o título citado se ambos possuem a mesma quantidade de palavras e a soma das distâncias de
+    edição entre as palavras correspondentes não excede max_distance. Palavras com menos de APPROXIMATE_MIN_WORD_LENGTH
+    caracteres devem casar exatamente.
+
+    As palavras do vocabulário próximas a uma palavra citada são obtidas por um dicionário de remoções simétricas
+    (symmetric delete): cada palavra do vocabulário é indexada por todas as suas variações com até max_distance
+    caracteres removidos, de modo que a consulta custa apenas as buscas das variações da palavra citada.
+    """
+
+    def __init__(self, title_to_issnl, max_distance: int):
+        self.max_distance = max_distance
+        self.titles = sorted(title_to_issnl.keys())
+
+        self.postings = {}
+        for i, title in enumerate(self.titles):
+            for token in set(title.split(' ')):
+                self.postings.setdefault(token, array('I')).append(i)
+
+        self.deletes = {}
+        for token in self.postings:
+            if len(token) >= APPROXIMATE_MIN_WORD_LENGTH:
+                for variation in deletes(token, max_distance):
+                    self.deletes.setdefault(variation, []).append(token)
+
+    def similar_tokens(self, word: str):
+        """
+        Obtém as palavras do vocabulário a até max_distance edições de word.
+
+        :param word: palavra citada
+        :return: dicionário de palavras do vocabulário e respectivas distâncias a word
+        """
+        if len(word) < APPROXIMATE_MIN_WORD_LENGTH:
+            return {word: 0} if word in self.postings else {}
+
+        tokens = set()
+        for variation in deletes(word, self.max_distance):
+            tokens.update(self.deletes.get(variation, ()))
+
+        similar = {}
+        for token in tokens:
+            distance = edit_distance(word, token, self.max_distance)
+            if distance <= self.max_distance:
+                similar[token] = distance
+
+        return similar
+
+    def match(self, words: list):
+        """
+        Obtém os títulos oficiais a até max_distance edições das palavras citadas.
+        Os candidatos são os títulos da menor união de posting lists entre as palavras citadas.
+
+        :param words: palavras do título citado
+        :return: lista de títulos oficiais casados
+        """
+        similar = []
+        for word in words:
+            tokens = self.similar_tokens(word)
+            if not tokens:
+                return []
+            similar.append(tokens)
+
+        smallest = min(similar, key=lambda tokens: sum(len(self.postings[t]) for t in tokens))
+        candidates = set(i for t in smallest for i in self.postings[t])
+
+        matched_titles = []
+        for i in sorted(candidates):
+            title_words = self.titles[i].split(' ')
+            if len(title_words) != len(words):
+                continue
+
+            total_distance = 0
+            for title_word, tokens in zip(title_words, similar):
+                total_distance += tokens.get(title_word, self.max_distance + 1)
+                if total_distance > self.max_distance:
+                    break
+            else:
+                matched_titles.append(self.titles[i])
+
+        return matched_titles
+
+
+FUZZY_ENGINES = {
+    'prefix': TitlePrefixIndex,
+    'token': TitleTokenIndex,
+}
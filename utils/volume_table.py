@@ -0,0 +1,80 @@
+from array import array
+
+from utils.packed_keys import issn_year_ranges, pack_key
+
+
+# Valor que indica, na tabela, um ano cujo volume inferido não é positivo
+NO_VOLUME = -1
+
+# Sentinela que indica que a chave de um ISSN e ano não foi pré-calculada
+NOT_PRECOMPUTED = object()
+
+
+def build_inferred_keys(issn_to_equation: dict, issn_year_volume_lr):
+    """
+    Pré-calcula, para cada ISSN, as chaves ISSN-ANO-VOLUME com o volume inferido por issn-to-equation, ao longo dos anos
+    cobertos pela base ISSN-ANO-VOLUME de regressão linear (gerada a partir das mesmas equações).
+
+    Os volumes são calculados exatamente como em JournalStandardizer.infer_volume e as chaves são empacotadas (ver
+    utils.packed_keys) em um array de inteiros de 64 bits por ISSN, indexado pelo ano a partir do primeiro ano; anos
+    sem volume positivo recebem NO_VOLUME. ISSNs cujas chaves não podem ser empacotadas não são incluídos.
+
+    :param issn_to_equation: base de predição de volume ISSN-TO-EQUATION
+    :param issn_year_volume_lr: base de validação ISSN-ANO-VOLUME LR
+    :return: dicionário ISSN -> tupla (primeiro ano, array de chaves empacotadas)
+    """
+    inferred_keys = {}
+
+    for issn, (first_year, last_year) in issn_year_ranges(issn_year_volume_lr).items():
+        equation = issn_to_equation.get(issn)
+        if not equation:
+            continue
+
+        a, b, r2 = equation
+        keys = array('q')
+        for year in range(first_year, last_year + 1):
+            volume = a + (b * year)
+            if volume > 0:
+                try:
+                    key = pack_key(issn, '%04d' % year, str(round(volume)))
+                except (OverflowError, ValueError):
+                    key = None
+                if key is None:
+                    break
+                keys.append(key)
+            else:
+                keys.append(NO_VOLUME)
+        else:
+            inferred_keys[issn] = (first_year, keys)
+
+    return inferred_keys
+
+
+def keys_from_list(value: list):
+    """
+    Converte um item da tabela lido em JSON, [primeiro ano, [chaves]], para o formato original.
+
+    :param value: lista [primeiro ano, lista de chaves empacotadas]
+    :return: tupla (primeiro ano, array de chaves empacotadas)
+    """
+    return value[0], array('q', value[1])
+
+
+def lookup_inferred_key(inferred_keys, issn: str, year: int):
+    """
+    Obtém a chave ISSN-ANO-VOLUME pré-calculada de um ISSN em um ano.
+
+    :param inferred_keys: tabela gerada por build_inferred_keys
+    :param issn: ISSN
+    :param year: ano
+    :return: chave empacotada, NO_VOLUME se o volume inferido não for positivo ou NOT_PRECOMPUTED
+    """
+    item = inferred_keys.get(issn)
+    if item is None:
+        return NOT_PRECOMPUTED
+
+    first_year, keys = item
+    i = year - first_year
+    if i < 0 or i >= len(keys):
+        return NOT_PRECOMPUTED
+    return keys[i]